@@ -11,6 +11,11 @@ from .sanpshots import (
     PickupInfoSnapshot
 )
 from .drafts import JobReferenceDraft
+from .caches import GeocodeCache, RouteDistanceCache
+from .geodata import PostcodeCentroid, FactoryPostcodeDistance
+from .ledger import FactoryDayLoad, FactoryLoad, CapacityReservation
+from .sequences import IdSequence
+from .profiles import FlashingProfile
 
 admin.site.register(StoredFlashing)
 admin.site.register(Specification)
@@ -28,4 +33,36 @@ admin.site.register(SpecificationSnapshot)
 admin.site.register(DeliveryInfoSnapshot)
 admin.site.register(PickupInfoSnapshot)
 
-admin.site.register(JobReferenceDraft)
\ No newline at end of file
+admin.site.register(JobReferenceDraft)
+
+admin.site.register(GeocodeCache)
+admin.site.register(RouteDistanceCache)
+admin.site.register(PostcodeCentroid)
+admin.site.register(FactoryPostcodeDistance)
+
+admin.site.register(FactoryDayLoad)
+admin.site.register(FactoryLoad)
+admin.site.register(CapacityReservation)
+
+admin.site.register(IdSequence)
+
+
+
+@admin.register(FlashingProfile)
+class FlashingProfileAdmin(admin.ModelAdmin):
+    """
+    Read only, profiles are shared by flashings, templates and paid order
+    snapshots and keyed by a digest of their shape.
+    """
+
+    list_display = ["digest", "girth", "fold_count", "crush_count", "is_valid", "created_at"]
+    readonly_fields = [field.name for field in FlashingProfile._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+
+
+class GeocodeCache(models.Model):
+    # Normalized address text, see geocoding.normalize_address
+    query = models.CharField(max_length=255, unique=True)
+
+    longitude = models.FloatField()
+    latitude = models.FloatField()
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Geocode for '{self.query}'"
+
+
+class RouteDistanceCache(models.Model):
+    # Coordinates are rounded to 5 decimals (~1m) before being stored
+    from_longitude = models.FloatField()
+    from_latitude = models.FloatField()
+    to_longitude = models.FloatField()
+    to_latitude = models.FloatField()
+
+    distance_km = models.PositiveIntegerField()
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["from_longitude", "from_latitude", "to_longitude", "to_latitude"],
+                name="unique_route_distance",
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f"Route ({self.from_longitude}, {self.from_latitude}) -> "
+            f"({self.to_longitude}, {self.to_latitude}): {self.distance_km} km"
+        )
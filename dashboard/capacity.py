@@ -0,0 +1,175 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from factory.calendar import get_calendar
+from .ledger import FactoryDayLoad, FactoryLoad, CapacityReservation
+
+# Working days looked at when searching for free dates
+SEARCH_DAYS = getattr(settings, "CAPACITY_SEARCH_DAYS", 60)
+
+ACTIVE_STATUSES = {"pending", "in_progress"}
+CANCELLED_STATUS = "cancelled"
+
+
+def _holds_day(status):
+    return status is not None and status != CANCELLED_STATUS
+
+
+def _is_active(status):
+    return status in ACTIVE_STATUSES
+
+
+def _shift(reservation, old_status, new_status):
+    """Move the counters from accounting `old_status` to `new_status`."""
+    day = _holds_day(new_status) - _holds_day(old_status)
+    if day:
+        FactoryDayLoad.objects.bulk_create(
+            [FactoryDayLoad(factory_id=reservation.factory_id, date=reservation.date)],
+            ignore_conflicts=True,
+        )
+        FactoryDayLoad.objects.filter(
+            factory_id=reservation.factory_id, date=reservation.date
+        ).update(
+            orders=F("orders") + day,
+            flashings=F("flashings") + day * reservation.flashings,
+            weight_kg=F("weight_kg") + day * reservation.weight_kg,
+        )
+
+    active = _is_active(new_status) - _is_active(old_status)
+    if active:
+        FactoryLoad.objects.bulk_create(
+            [FactoryLoad(factory_id=reservation.factory_id)], ignore_conflicts=True
+        )
+        FactoryLoad.objects.filter(factory_id=reservation.factory_id).update(
+            active_orders=F("active_orders") + active
+        )
+
+
+def reserve(order, factory, date, flashings, weight_kg):
+    """
+    Books a new order on the ledger. Paid orders are always booked, limits
+    are enforced before payment (see is_feasible and accepts_orders).
+    """
+    with transaction.atomic():
+        reservation = CapacityReservation.objects.create(
+            order=order,
+            factory=factory,
+            date=date,
+            flashings=flashings,
+            weight_kg=weight_kg,
+            status=order.status,
+        )
+        _shift(reservation, None, order.status)
+    return reservation
+
+
+def sync_status(order):
+    """Applies an order status change to the counters, once."""
+    with transaction.atomic():
+        reservation = (
+            CapacityReservation.objects.select_for_update()
+            .filter(order=order)
+            .first()
+        )
+        if reservation is None or reservation.status == order.status:
+            return
+
+        _shift(reservation, reservation.status, order.status)
+        reservation.status = order.status
+        reservation.save(update_fields=["status"])
+
+
+def release(reservation):
+    """Takes a deleted reservation off the counters."""
+    _shift(reservation, reservation.status, None)
+
+
+_local = threading.local()
+
+
+@contextmanager
+def suspended_releases():
+    """
+    Reservations deleted inside the block aren't released from the
+    counters, for callers that rebuild the counters themselves.
+    """
+    previous = getattr(_local, "suspended", False)
+    _local.suspended = True
+    try:
+        yield
+    finally:
+        _local.suspended = previous
+
+
+def releases_suspended():
+    return getattr(_local, "suspended", False)
+
+
+def _fits(factory, load, flashings, weight_kg):
+    if load is None:
+        orders, booked_flashings, booked_weight = 0, 0, 0
+    else:
+        orders, booked_flashings, booked_weight = load
+
+    if orders + 1 > factory.daily_order_limit:
+        return False
+    if (
+        factory.daily_flashing_limit is not None
+        and booked_flashings + flashings > factory.daily_flashing_limit
+    ):
+        return False
+    if (
+        factory.daily_weight_limit_kg is not None
+        and booked_weight + weight_kg > float(factory.daily_weight_limit_kg)
+    ):
+        return False
+    return True
+
+
+def _load_values(factory):
+    return FactoryDayLoad.objects.filter(factory=factory).values_list(
+        "orders", "flashings", "weight_kg"
+    )
+
+
+def is_feasible(factory, date, flashings=0, weight_kg=0):
+    """Whether the day still has room for one more order of this size."""
+    load = _load_values(factory).filter(date=date).first()
+    return _fits(factory, load, flashings, weight_kg)
+
+
+def accepts_orders(factory):
+    """Whether the factory is under max_concurrent_orders."""
+    active = (
+        FactoryLoad.objects.filter(factory=factory)
+        .values_list("active_orders", flat=True)
+        .first()
+    )
+    return (active or 0) < factory.max_concurrent_orders
+
+
+def feasible_dates(factory, start, flashings=0, weight_kg=0, count=5):
+    """
+    The first `count` working days from `start` with room for an order of
+    this size, read from the day counters of the search window only.
+    """
+    days = get_calendar(factory).working_days_from(start, SEARCH_DAYS)
+    if not days:
+        return []
+
+    rows = FactoryDayLoad.objects.filter(
+        factory=factory, date__gte=days[0], date__lte=days[-1]
+    ).values_list("date", "orders", "flashings", "weight_kg")
+    loads = {row[0]: row[1:] for row in rows}
+
+    dates = []
+    for day in days:
+        if _fits(factory, loads.get(day), flashings, weight_kg):
+            dates.append(day)
+            if len(dates) == count:
+                break
+    return dates
@@ -0,0 +1,183 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .models import Order
+from .sanpshots import (
+    StoredFlashingSnapshot,
+    MaterialSnapshot,
+    SpecificationSnapshot,
+    JobReferenceSnapshot,
+    PaymentSnapshot,
+    DeliveryInfoSnapshot,
+    PickupInfoSnapshot,
+)
+from .pricing import from_cents
+from . import capacity
+
+logger = logging.getLogger(__name__)
+
+
+class OrderSnapshotBuilder:
+    """
+    Turns a paid cart into an order and its immutable snapshots.
+
+    The cart graph is loaded once (through cart.pricing) and every snapshot
+    table is written with a single bulk insert, all inside one transaction,
+    so a failure never leaves a partial order behind. The duration of each
+    phase is kept in `timings` (seconds) and logged.
+    """
+
+    def __init__(self, cart, session, payment_intent):
+        self.cart = cart
+        self.session = session
+        self.payment_intent = payment_intent
+        self.timings = {}
+
+    @contextmanager
+    def _phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def build(self):
+        cart = self.cart
+
+        with self._phase("load"):
+            pricing = cart.pricing
+            job_reference = cart.job_reference
+
+        with transaction.atomic():
+            with self._phase("order"):
+                order = Order.objects.create(client=cart.client)
+
+                PaymentSnapshot.objects.create(
+                    order=order,
+                    method="stripe",
+                    transaction_id=self.payment_intent.id,
+                    stripe_session_id=self.session.id,
+                    total_amount=from_cents(self.payment_intent.amount),
+                    gst_ratio=pricing.gst_ratio,
+                )
+
+                JobReferenceSnapshot.objects.create(
+                    order=order,
+                    code=job_reference.code,
+                    project_name=job_reference.project_name,
+                )
+
+            with self._phase("flashings"):
+                flash_snapshots = StoredFlashingSnapshot.objects.bulk_create(
+                    [
+                        StoredFlashingSnapshot(
+                            order=order,
+                            code=flash.code,
+                            position=flash.position,
+                            start_crush_fold=flash.start_crush_fold,
+                            end_crush_fold=flash.end_crush_fold,
+                            color_side_dir=flash.color_side_dir,
+                            tapered=flash.tapered,
+                            # The shape is shared, only the pointer is copied
+                            profile_id=flash.profile_id,
+                            total_girth=pricing.prices[flash.id]["girth"],
+                        )
+                        for flash in pricing.flashings
+                    ]
+                )
+
+            with self._phase("materials"):
+                materials = []
+                for flash, snapshot in zip(pricing.flashings, flash_snapshots):
+                    variant = flash.material
+                    group = variant.group
+                    material = group.material
+
+                    materials.append(
+                        MaterialSnapshot(
+                            flashing=snapshot,
+                            variant_type=material.variant_type,
+                            name=material.name,
+                            variant_label=variant.label,
+                            variant_value=variant.value,
+                            base_price=group.base_price,
+                            price_per_fold=group.price_per_fold,
+                            price_per_100girth=group.price_per_100girth,
+                            price_per_crush_fold=group.price_per_crush_fold,
+                            sample_weight=group.sample_weight,
+                            sample_weight_sq_meter=group.sample_weight_sq_meter,
+                        )
+                    )
+                MaterialSnapshot.objects.bulk_create(materials)
+
+            with self._phase("specifications"):
+                specs = []
+                for flash, snapshot in zip(pricing.flashings, flash_snapshots):
+                    spec_prices = pricing.prices[flash.id]["specs"]
+                    for spec in flash.specifications.all():
+                        specs.append(
+                            SpecificationSnapshot(
+                                flashing=snapshot,
+                                quantity=spec.quantity,
+                                length=spec.length,
+                                weight=spec_prices[spec.id]["weight"],
+                                cost=from_cents(spec_prices[spec.id]["cost_cents"]),
+                            )
+                        )
+                SpecificationSnapshot.objects.bulk_create(specs)
+
+            with self._phase("fulfillment"):
+                self._create_fulfillment(order, pricing)
+
+            with self._phase("capacity"):
+                capacity.reserve(
+                    order,
+                    cart.client.factory,
+                    cart.delivery_date,
+                    len(pricing.flashings),
+                    pricing.total_delivery_weight,
+                )
+
+        logger.info(
+            "Order %s snapshots built (%s flashings): %s",
+            order.id,
+            len(flash_snapshots),
+            ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in self.timings.items()),
+        )
+
+        return order
+
+    def _create_fulfillment(self, order, pricing):
+        cart = self.cart
+
+        if cart.delivery_type == "delivery":
+            addr = cart.address
+            del_m = pricing.delivery_method
+            DeliveryInfoSnapshot.objects.create(
+                order=order,
+                cost=from_cents(pricing.delivery_cost_cents),
+                date=cart.delivery_date,
+                title=addr.title,
+                street_address=addr.street_address,
+                suburb=addr.suburb,
+                state=addr.state,
+                postcode=addr.postcode,
+                distance_to_factory=addr.distance_to_factory,
+                recipient_name=addr.recipient_name,
+                recipient_phone=addr.recipient_phone,
+                _dm_type=del_m.method_type,
+                _dm_name=del_m.name,
+                _dm_description=del_m.description,
+                _dm_base_cost=del_m.base_cost,
+                _dm_cost_per_kg=del_m.cost_per_kg,
+                _dm_cost_per_km=del_m.cost_per_km,
+            )
+
+        elif cart.delivery_type == "pickup":
+            PickupInfoSnapshot.objects.create(order=order, date=cart.delivery_date)
+
+        else:
+            raise ValueError(f"Unknown delivery type: {cart.delivery_type}")
@@ -0,0 +1,85 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+from .nodepack import PackedNodes, is_packed, pack_nodes
+from .utils import node_chain
+
+# Turned on, valid chains are written packed. Rows are readable either way,
+# so it can be switched back and forth without migrating the data.
+PACK_NODES = getattr(settings, "PACK_FLASHING_NODES", False)
+
+
+class NodesEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        if isinstance(o, PackedNodes):
+            return o.tolist()
+        return super().default(o)
+
+
+class NodesField(models.BinaryField):
+    """
+    Flashing nodes, stored in a binary column.
+
+    Nodes are written as JSON text. With PACK_FLASHING_NODES, valid chains
+    are written in the packed format of nodepack instead and read back as
+    PackedNodes, which only builds the JSON shape when it's needed. Nodes
+    that can't be packed are always stored as JSON and read as plain lists.
+    """
+
+    description = "Flashing nodes"
+    default_error_messages = {
+        "invalid": "Value must be valid JSON or packed nodes.",
+    }
+
+    def decode(self, value):
+        if isinstance(value, str):
+            return json.loads(value)
+        if is_packed(value):
+            return PackedNodes(bytes(value))
+        return json.loads(bytes(value))
+
+    def encode(self, value):
+        if isinstance(value, PackedNodes):
+            return value.data
+
+        if PACK_NODES and isinstance(value, list):
+            try:
+                packed = pack_nodes(value, node_chain(value))
+            except ValidationError:
+                packed = None
+            if packed is not None:
+                return packed
+
+        return json.dumps(value, cls=NodesEncoder).encode()
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return self.decode(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, (list, PackedNodes)):
+            return value
+        try:
+            return self.decode(value)
+        except ValueError:
+            raise ValidationError(self.error_messages["invalid"], code="invalid")
+
+    def get_default(self):
+        # BinaryField falls back to b"", which isn't a list of nodes
+        if self.has_default():
+            return super().get_default()
+        return None
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None or hasattr(value, "as_sql"):
+            return value
+        return connection.Database.Binary(self.encode(value))
+
+    def value_to_string(self, obj):
+        # JSON instead of base64, so fixtures stay readable
+        return json.dumps(self.value_from_object(obj), cls=NodesEncoder)
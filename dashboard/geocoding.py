@@ -0,0 +1,148 @@
+import re
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .caches import GeocodeCache, RouteDistanceCache
+from . import utils
+
+GEOCODE_CACHE_TTL = timedelta(days=getattr(settings, "GEOCODE_CACHE_TTL_DAYS", 90))
+ROUTE_CACHE_TTL = timedelta(days=getattr(settings, "ROUTE_CACHE_TTL_DAYS", 30))
+
+# Process wide hit/miss counters, see cache_stats()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+class SingleFlight:
+    """
+    Makes concurrent calls with the same key share one execution: the first
+    caller runs the function, the others wait for it and get its result (or
+    its exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+
+        if not leader:
+            _count("shared")
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn(*args)
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+_flight = SingleFlight()
+
+
+def normalize_address(text):
+    text = text.lower().replace(",", " ")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _round_point(point):
+    return round(point[0], 5), round(point[1], 5)
+
+
+def cached_geocode(text):
+    """Fresh cached (lon, lat) of an address, or None."""
+    cached = GeocodeCache.objects.filter(
+        query=normalize_address(text),
+        created_at__gte=timezone.now() - GEOCODE_CACHE_TTL,
+    ).first()
+    if cached:
+        _count("geocode_hits")
+        return cached.longitude, cached.latitude
+
+    _count("geocode_misses")
+    return None
+
+
+def store_geocode(text, point):
+    GeocodeCache.objects.update_or_create(
+        query=normalize_address(text),
+        defaults={"longitude": point[0], "latitude": point[1], "created_at": timezone.now()},
+    )
+
+
+def geocode(text):
+    """Cached version of utils.geocode_text, returns (lon, lat)."""
+    point = cached_geocode(text)
+    if point is not None:
+        return point
+
+    return _flight.do(("geocode", normalize_address(text)), _fetch_geocode, text)
+
+
+def _fetch_geocode(text):
+    point = utils.geocode_text(text)
+    store_geocode(text, point)
+    return point
+
+
+def route_distance_km(start, end):
+    """Cached version of utils.route_distance_km between two (lon, lat) points."""
+    start = _round_point(start)
+    end = _round_point(end)
+    key = {
+        "from_longitude": start[0],
+        "from_latitude": start[1],
+        "to_longitude": end[0],
+        "to_latitude": end[1],
+    }
+
+    cached = RouteDistanceCache.objects.filter(
+        created_at__gte=timezone.now() - ROUTE_CACHE_TTL, **key
+    ).first()
+    if cached:
+        _count("route_hits")
+        return cached.distance_km
+
+    _count("route_misses")
+    return _flight.do(("route", start, end), _fetch_route, start, end, key)
+
+
+def _fetch_route(start, end, key):
+    distance = utils.route_distance_km(start, end)
+
+    RouteDistanceCache.objects.update_or_create(
+        defaults={"distance_km": distance, "created_at": timezone.now()}, **key
+    )
+    return distance
+
+
+def driving_distance_km(from_address, to_address):
+    """Driving distance in kilometers between two addresses, cached on both steps."""
+    return route_distance_km(geocode(from_address), geocode(to_address))
@@ -0,0 +1,36 @@
+from django.db import models
+
+from factory.models import Factory
+from .utils import AustraliaStateChoices
+
+
+class PostcodeCentroid(models.Model):
+    postcode = models.PositiveIntegerField(unique=True)
+    state = models.CharField(max_length=3, choices=AustraliaStateChoices.choices)
+
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+
+    def __str__(self):
+        return f"{self.postcode} {self.state} ({self.latitude}, {self.longitude})"
+
+
+class FactoryPostcodeDistance(models.Model):
+    """Estimated road distance from a factory to every known postcode."""
+
+    factory = models.ForeignKey(
+        Factory, on_delete=models.CASCADE, related_name="postcode_distances"
+    )
+    postcode = models.PositiveIntegerField()
+
+    distance_km = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["factory", "postcode"], name="unique_factory_postcode"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.factory} -> {self.postcode}: {self.distance_km} km"
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import string
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .sequences import IdSequence
+
+# IDs taken from the counter per round trip, kept by the process
+BLOCK_SIZE = getattr(settings, "ID_BLOCK_SIZE", 20)
+
+FEISTEL_ROUNDS = 4
+
+# 100000-999999 first, as the IDs have always looked
+NUMERIC_SPACE = 900_000
+NUMERIC_BITS = 20
+
+# Then a letter followed by 5 base36 characters, which never collides with
+# the numeric IDs
+ALPHABET = string.digits + string.ascii_uppercase
+TAIL_SPACE = 36**5
+ALPHANUMERIC_SPACE = 26 * TAIL_SPACE
+ALPHANUMERIC_BITS = 32
+
+
+def _key(name):
+    secret = getattr(settings, "ID_PERMUTATION_KEY", None) or settings.SECRET_KEY or ""
+    return hashlib.sha256(f"{secret}:{name}".encode()).digest()
+
+
+def _feistel(value, bits, key):
+    half = bits // 2
+    mask = (1 << half) - 1
+    left, right = value >> half, value & mask
+
+    for r in range(FEISTEL_ROUNDS):
+        digest = hashlib.blake2b(
+            right.to_bytes(4, "big") + bytes([r]), key=key, digest_size=4
+        ).digest()
+        left, right = right, left ^ (int.from_bytes(digest, "big") & mask)
+
+    return (left << half) | right
+
+
+def permute(value, space, bits, key):
+    """
+    Keyed bijection of [0, space). The Feistel network permutes [0, 2**bits),
+    values landing outside the space are walked along their cycle until they
+    come back in.
+    """
+    value = _feistel(value, bits, key)
+    while value >= space:
+        value = _feistel(value, bits, key)
+    return value
+
+
+def format_id(counter, key):
+    """The public ID of the counter-th allocation."""
+    if counter < NUMERIC_SPACE:
+        return str(100000 + permute(counter, NUMERIC_SPACE, NUMERIC_BITS, key))
+
+    counter -= NUMERIC_SPACE
+    if counter >= ALPHANUMERIC_SPACE:
+        raise RuntimeError("ID space exhausted")
+
+    value = permute(counter, ALPHANUMERIC_SPACE, ALPHANUMERIC_BITS, key)
+    head, tail = divmod(value, TAIL_SPACE)
+
+    chars = []
+    for _ in range(5):
+        tail, digit = divmod(tail, 36)
+        chars.append(ALPHABET[digit])
+    return string.ascii_uppercase[head] + "".join(reversed(chars))
+
+
+def _reserve(model, size):
+    """Takes `size` counter values from the model's sequence, returns their IDs."""
+    name = model._meta.label_lower
+
+    # No savepoint needed, the caller's transaction (if any) covers it
+    with transaction.atomic(savepoint=False):
+        sequences = IdSequence.objects.filter(name=name)
+        if not sequences.update(next_value=F("next_value") + size):
+            IdSequence.objects.bulk_create(
+                [IdSequence(name=name, legacy=model._default_manager.exists())],
+                ignore_conflicts=True,
+            )
+            sequences.update(next_value=F("next_value") + size)
+
+        end, legacy = sequences.values_list("next_value", "legacy").get()
+
+    key = _key(name)
+    ids = [format_id(c, key) for c in range(end - size, end)]
+
+    # Random IDs handed out before the sequence existed, one query per block
+    if legacy:
+        taken = set(
+            model._default_manager.filter(pk__in=ids).values_list("pk", flat=True)
+        )
+        ids = [i for i in ids if i not in taken]
+
+    return ids
+
+
+_blocks = {}
+_lock = threading.Lock()
+
+
+def allocate_id(model):
+    """
+    Non-sequential, collision-free ID for a new row of `model`, without
+    checking the table.
+
+    Outside a transaction a block of BLOCK_SIZE IDs is reserved and used up
+    by this process. Inside one only the needed ID is taken: a rolled back
+    block would otherwise be handed out again to another process.
+    """
+    if connection.in_atomic_block:
+        ids = []
+        while not ids:
+            ids = _reserve(model, 1)
+        return ids[0]
+
+    name = model._meta.label_lower
+    pid = os.getpid()
+
+    with _lock:
+        block_pid, block = _blocks.get(name, (None, None))
+        # A block inherited through fork() is shared with the parent
+        if block_pid != pid or not block:
+            block = deque()
+            while not block:
+                block.extend(_reserve(model, BLOCK_SIZE))
+            _blocks[name] = (pid, block)
+        return block.popleft()
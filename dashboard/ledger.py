@@ -0,0 +1,59 @@
+from django.db import models
+
+from factory.models import Factory
+
+
+class FactoryDayLoad(models.Model):
+    """Orders, flashings and weight booked on a factory for one fulfillment date."""
+
+    factory = models.ForeignKey(
+        Factory, on_delete=models.CASCADE, related_name="day_loads"
+    )
+    date = models.DateField()
+
+    orders = models.IntegerField(default=0)
+    flashings = models.IntegerField(default=0)
+    weight_kg = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["factory", "date"], name="unique_factory_day")
+        ]
+
+    def __str__(self):
+        return f"{self.factory} on {self.date}: {self.orders} orders"
+
+
+class FactoryLoad(models.Model):
+    """Orders of a factory that are pending or in progress."""
+
+    factory = models.OneToOneField(Factory, on_delete=models.CASCADE, related_name="load")
+
+    active_orders = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.factory}: {self.active_orders} active orders"
+
+
+class CapacityReservation(models.Model):
+    """
+    What an order adds to the counters above. `status` is the order status
+    the counters currently account for, so a status change only applies the
+    difference.
+    """
+
+    order = models.OneToOneField(
+        "dashboard.Order", on_delete=models.CASCADE, related_name="capacity"
+    )
+    factory = models.ForeignKey(
+        Factory, on_delete=models.CASCADE, related_name="capacity_reservations"
+    )
+    date = models.DateField()
+
+    flashings = models.PositiveIntegerField()
+    weight_kg = models.FloatField()
+
+    status = models.CharField(max_length=50)
+
+    def __str__(self):
+        return f"Order {self.order_id} on {self.date}"
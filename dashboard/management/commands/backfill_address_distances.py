@@ -0,0 +1,82 @@
+# dashboard/management/commands/backfill_address_distances.py
+import asyncio
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from dashboard.models import Address
+from dashboard.geocoding import geocode, cached_geocode, store_geocode
+from dashboard.ors import AsyncORSClient, get_client
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute missing or estimated address distances, geocoding addresses "
+        "concurrently and asking ORS for one distance matrix per factory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=8)
+
+    def handle(self, *args, **options):
+        addresses = Address.objects.filter(
+            Q(distance_to_factory=0) | Q(distance_is_estimate=True)
+        ).select_related("job_reference__client__factory")
+
+        by_factory = defaultdict(list)
+        for address in addresses:
+            factory = address.job_reference.client.factory
+            if factory is not None:
+                by_factory[factory].append(address)
+
+        updated = []
+        for factory, factory_addresses in by_factory.items():
+            updated += self._backfill(factory, factory_addresses, options["concurrency"])
+
+        Address.objects.bulk_update(
+            updated, ["distance_to_factory", "distance_is_estimate"], batch_size=500
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {len(updated)} addresses."))
+
+    def _backfill(self, factory, addresses, concurrency):
+        origin = geocode(factory.full_address)
+
+        # Cache reads and writes stay on this thread, only ORS calls run
+        # concurrently
+        points = {a.pk: cached_geocode(a.full_address) for a in addresses}
+        missing = [a for a in addresses if points[a.pk] is None]
+
+        if missing:
+            results = asyncio.run(
+                AsyncORSClient(concurrency=concurrency).geocode_many(
+                    [a.full_address for a in missing]
+                )
+            )
+            for address, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    self.stdout.write(
+                        self.style.WARNING(f"Address {address.pk}: {result}")
+                    )
+                    continue
+                store_geocode(address.full_address, result)
+                points[address.pk] = result
+
+        located = [a for a in addresses if points[a.pk] is not None]
+        if not located:
+            return []
+
+        distances = get_client().matrix_distances_km(
+            origin, [points[a.pk] for a in located]
+        )
+
+        updated = []
+        for address, distance in zip(located, distances):
+            if distance is None:
+                continue
+            address.distance_to_factory = distance
+            address.distance_is_estimate = False
+            updated.append(address)
+
+        return updated
@@ -0,0 +1,51 @@
+# dashboard/management/commands/backfill_flashing_geometry.py
+from django.core.management.base import BaseCommand
+
+from dashboard.models import StoredFlashing
+from dashboard.profiles import FlashingProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute girth, fold count, crush count and validity for flashing "
+        "profiles, then the completeness of every stored flashing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every profile, not only the ones without geometry",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        queryset = FlashingProfile.objects.order_by("pk")
+        if not options["all"]:
+            queryset = queryset.filter(girth__isnull=True)
+
+        batch_size = options["batch_size"]
+        batch = []
+        updated = 0
+
+        for profile in queryset.iterator(chunk_size=batch_size):
+            profile.refresh_derived()
+            batch.append(profile)
+
+            if len(batch) >= batch_size:
+                FlashingProfile.objects.bulk_update(batch, FlashingProfile.DERIVED_FIELDS)
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            FlashingProfile.objects.bulk_update(batch, FlashingProfile.DERIVED_FIELDS)
+            updated += len(batch)
+
+        flashings = StoredFlashing.refresh_completeness(StoredFlashing.objects.all())
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated geometry of {updated} profiles and completeness of "
+                f"{flashings} flashings."
+            )
+        )
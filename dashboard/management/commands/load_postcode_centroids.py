@@ -0,0 +1,75 @@
+# dashboard/management/commands/load_postcode_centroids.py
+import csv
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.geodata import PostcodeCentroid
+from dashboard.utils import AustraliaStateChoices
+
+LATITUDE_COLUMNS = ("latitude", "lat")
+LONGITUDE_COLUMNS = ("longitude", "long", "lon", "lng")
+
+
+class Command(BaseCommand):
+    help = (
+        "Load Australian postcode centroids from a CSV with postcode, state, "
+        "latitude and longitude columns (one or more rows per postcode)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path")
+
+    def _column(self, header, names):
+        for name in names:
+            if name in header:
+                return name
+        raise CommandError(f"CSV needs one of the columns: {', '.join(names)}")
+
+    def handle(self, *args, **options):
+        states = set(AustraliaStateChoices.values)
+        points = defaultdict(list)
+
+        with open(options["csv_path"], newline="") as f:
+            reader = csv.DictReader(f)
+            header = {h.strip().lower() for h in reader.fieldnames or []}
+            lat_col = self._column(header, LATITUDE_COLUMNS)
+            lon_col = self._column(header, LONGITUDE_COLUMNS)
+            self._column(header, ("postcode",))
+            self._column(header, ("state",))
+
+            for row in reader:
+                row = {k.strip().lower(): (v or "").strip() for k, v in row.items()}
+                try:
+                    postcode = int(row["postcode"])
+                    lat = float(row[lat_col])
+                    lon = float(row[lon_col])
+                except ValueError:
+                    continue
+
+                state = row["state"].upper()
+                if state not in states or (lat == 0 and lon == 0):
+                    continue
+
+                points[postcode].append((state, lat, lon))
+
+        # A postcode covers several localities, use the mean of their points
+        centroids = [
+            PostcodeCentroid(
+                postcode=postcode,
+                state=rows[0][0],
+                latitude=sum(r[1] for r in rows) / len(rows),
+                longitude=sum(r[2] for r in rows) / len(rows),
+            )
+            for postcode, rows in points.items()
+        ]
+
+        PostcodeCentroid.objects.bulk_create(
+            centroids,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["postcode"],
+            update_fields=["state", "latitude", "longitude"],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Loaded {len(centroids)} postcode centroids."))
@@ -0,0 +1,35 @@
+# dashboard/management/commands/pack_flashing_nodes.py
+from django.core.management.base import BaseCommand
+
+from dashboard.profiles import FlashingProfile
+from dashboard.nodepack import PackedNodes
+
+
+class Command(BaseCommand):
+    help = "Rewrite profile nodes still stored as JSON in the packed binary format"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        batch = []
+        rewritten = 0
+
+        queryset = FlashingProfile.objects.only("pk", "nodes").order_by("pk")
+        for profile in queryset.iterator(chunk_size=batch_size):
+            # Packed rows load as PackedNodes, JSON ones as lists
+            if isinstance(profile.nodes, PackedNodes) or not profile.nodes:
+                continue
+            batch.append(profile)
+
+            if len(batch) >= batch_size:
+                FlashingProfile.objects.bulk_update(batch, ["nodes"])
+                rewritten += len(batch)
+                batch = []
+
+        if batch:
+            FlashingProfile.objects.bulk_update(batch, ["nodes"])
+            rewritten += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rewrote nodes of {rewritten} profiles."))
@@ -0,0 +1,30 @@
+# dashboard/management/commands/precompute_factory_distances.py
+from django.core.management.base import BaseCommand
+
+from factory.models import Factory
+from dashboard.postcodes import precompute_factory_distances
+
+
+class Command(BaseCommand):
+    help = "Precompute estimated road distances from factories to every postcode"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--factory", help="Only this factory id")
+
+    def handle(self, *args, **options):
+        factories = Factory.objects.all()
+        if options["factory"]:
+            factories = factories.filter(pk=options["factory"])
+
+        for factory in factories:
+            count = precompute_factory_distances(factory)
+            if count:
+                self.stdout.write(
+                    self.style.SUCCESS(f"{factory.name}: {count} postcode distances.")
+                )
+            else:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{factory.name}: no centroid for postcode {factory.postcode}, skipped."
+                    )
+                )
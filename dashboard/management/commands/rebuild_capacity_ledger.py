@@ -0,0 +1,89 @@
+# dashboard/management/commands/rebuild_capacity_ledger.py
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from dashboard.models import Order
+from dashboard.ledger import FactoryDayLoad, FactoryLoad, CapacityReservation
+from dashboard.capacity import ACTIVE_STATUSES, CANCELLED_STATUS, suspended_releases
+
+
+class Command(BaseCommand):
+    help = "Rebuild the factory capacity ledger from the existing orders"
+
+    def handle(self, *args, **options):
+        orders = (
+            Order.objects.select_related("client", "delivery", "pickup")
+            .annotate(
+                flashing_count=Count("flashings", distinct=True),
+                weight=Sum("flashings__specifications__weight"),
+            )
+            .filter(client__factory__isnull=False)
+        )
+
+        reservations = []
+        days = defaultdict(lambda: [0, 0, 0.0])
+        active = Counter()
+
+        for order in orders:
+            fulfillment = order.fulfillment
+            if fulfillment is None or fulfillment.date is None:
+                continue
+
+            factory_id = order.client.factory_id
+            weight = float(order.weight or 0)
+            reservations.append(
+                CapacityReservation(
+                    order=order,
+                    factory_id=factory_id,
+                    date=fulfillment.date,
+                    flashings=order.flashing_count,
+                    weight_kg=weight,
+                    status=order.status,
+                )
+            )
+
+            if order.status != CANCELLED_STATUS:
+                day = days[(factory_id, fulfillment.date)]
+                day[0] += 1
+                day[1] += order.flashing_count
+                day[2] += weight
+            if order.status in ACTIVE_STATUSES:
+                active[factory_id] += 1
+
+        with transaction.atomic():
+            # Releasing each reservation from counters that are dropped next
+            # would cost an UPDATE per row
+            with suspended_releases():
+                CapacityReservation.objects.all().delete()
+            FactoryDayLoad.objects.all().delete()
+            FactoryLoad.objects.all().delete()
+
+            CapacityReservation.objects.bulk_create(reservations, batch_size=500)
+            FactoryDayLoad.objects.bulk_create(
+                [
+                    FactoryDayLoad(
+                        factory_id=factory_id,
+                        date=date,
+                        orders=orders,
+                        flashings=flashings,
+                        weight_kg=weight,
+                    )
+                    for (factory_id, date), (orders, flashings, weight) in days.items()
+                ],
+                batch_size=500,
+            )
+            FactoryLoad.objects.bulk_create(
+                [
+                    FactoryLoad(factory_id=factory_id, active_orders=count)
+                    for factory_id, count in active.items()
+                ]
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Booked {len(reservations)} orders on {len(days)} factory days."
+            )
+        )
@@ -0,0 +1,61 @@
+# dashboard/management/commands/sync_sqlite_replicas.py
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from yar_ff_django.db import BUSY_TIMEOUT, sync_stamp_path
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database to the SQLite read replicas"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep syncing every this many seconds instead of once",
+        )
+
+    def handle(self, *args, **options):
+        primary = connections.settings[DEFAULT_DB_ALIAS]["NAME"]
+        replicas = {
+            alias: connections.settings[alias]["NAME"]
+            for alias in getattr(settings, "DATABASE_REPLICAS", ())
+            if connections.settings[alias]["ENGINE"].endswith("sqlite3")
+        }
+        if not replicas:
+            raise CommandError("No SQLite replicas configured, see SQLITE_REPLICAS.")
+
+        while True:
+            for alias, name in replicas.items():
+                started = time.time()
+                self.sync(primary, name)
+                self.stdout.write(
+                    self.style.SUCCESS(f"Synced {alias} in {time.time() - started:.2f}s.")
+                )
+
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    def sync(self, primary, replica):
+        # Readers of a WAL database don't block its writers, the whole copy
+        # is taken in one step from a consistent snapshot
+        started = time.time()
+        source = sqlite3.connect(primary, timeout=BUSY_TIMEOUT / 1000)
+        target = sqlite3.connect(replica, timeout=BUSY_TIMEOUT / 1000)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+        # Lag is measured from when the snapshot was taken
+        stamp = sync_stamp_path(replica)
+        stamp.touch()
+        os.utime(stamp, (started, started))
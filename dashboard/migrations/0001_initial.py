@@ -0,0 +1,634 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:32
+
+import dashboard.utils
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("factory", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeliveryInfoSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.CharField(
+                        editable=False,
+                        max_length=6,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "cost",
+                    models.DecimalField(decimal_places=2, editable=False, max_digits=8),
+                ),
+                ("date", models.DateField(editable=False, null=True)),
+                ("title", models.CharField(max_length=100)),
+                ("street_address", models.CharField(max_length=200)),
+                ("suburb", models.CharField(max_length=100)),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("NSW", "New South Wales"),
+                            ("VIC", "Victoria"),
+                            ("QLD", "Queensland"),
+                            ("WA", "Western Australia"),
+                            ("SA", "South Australia"),
+                            ("TAS", "Tasmania"),
+                            ("ACT", "Australian Capital Territory"),
+                            ("NT", "Northern Territory"),
+                        ],
+                        max_length=3,
+                    ),
+                ),
+                ("postcode", models.PositiveIntegerField()),
+                ("distance_to_factory", models.PositiveIntegerField()),
+                ("recipient_name", models.CharField(max_length=50)),
+                ("recipient_phone", models.CharField(max_length=50)),
+                ("_dm_type", models.CharField(editable=False, max_length=20)),
+                ("_dm_name", models.CharField(max_length=100)),
+                (
+                    "_dm_description",
+                    models.TextField(blank=True, editable=False, null=True),
+                ),
+                (
+                    "_dm_base_cost",
+                    models.DecimalField(decimal_places=2, editable=False, max_digits=8),
+                ),
+                (
+                    "_dm_cost_per_kg",
+                    models.DecimalField(decimal_places=2, editable=False, max_digits=6),
+                ),
+                (
+                    "_dm_cost_per_km",
+                    models.DecimalField(decimal_places=2, editable=False, max_digits=6),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DriverInfoSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.CharField(
+                        editable=False,
+                        max_length=6,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                    ),
+                ),
+                ("name", models.CharField(max_length=50)),
+                ("phone", models.PositiveIntegerField()),
+                (
+                    "delivery_info",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="driver",
+                        to="dashboard.deliveryinfosnapshot",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="JobReference",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("code", models.PositiveIntegerField()),
+                ("project_name", models.CharField(max_length=50)),
+                (
+                    "client",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="job_references",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("client", "code")},
+            },
+        ),
+        migrations.CreateModel(
+            name="Address",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("title", models.CharField(max_length=100)),
+                ("street_address", models.CharField(max_length=200)),
+                ("suburb", models.CharField(max_length=100)),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("NSW", "New South Wales"),
+                            ("VIC", "Victoria"),
+                            ("QLD", "Queensland"),
+                            ("WA", "Western Australia"),
+                            ("SA", "South Australia"),
+                            ("TAS", "Tasmania"),
+                            ("ACT", "Australian Capital Territory"),
+                            ("NT", "Northern Territory"),
+                        ],
+                        max_length=3,
+                    ),
+                ),
+                ("postcode", models.PositiveIntegerField()),
+                ("distance_to_factory", models.PositiveIntegerField(default=0)),
+                ("recipient_name", models.CharField(max_length=50)),
+                ("recipient_phone", models.PositiveIntegerField()),
+                (
+                    "job_reference",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="addresses",
+                        to="dashboard.jobreference",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="JobReferenceDraft",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("code", models.PositiveIntegerField(null=True)),
+                ("project_name", models.CharField(max_length=50, null=True)),
+                ("title", models.CharField(max_length=100, null=True)),
+                ("street_address", models.CharField(max_length=200, null=True)),
+                ("suburb", models.CharField(max_length=100, null=True)),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("NSW", "New South Wales"),
+                            ("VIC", "Victoria"),
+                            ("QLD", "Queensland"),
+                            ("WA", "Western Australia"),
+                            ("SA", "South Australia"),
+                            ("TAS", "Tasmania"),
+                            ("ACT", "Australian Capital Territory"),
+                            ("NT", "Northern Territory"),
+                        ],
+                        max_length=3,
+                        null=True,
+                    ),
+                ),
+                ("postcode", models.PositiveIntegerField(null=True)),
+                ("recipient_name", models.CharField(max_length=50, null=True)),
+                ("recipient_phone", models.CharField(max_length=50, null=True)),
+                (
+                    "client",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="draf_job_reference",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Order",
+            fields=[
+                (
+                    "id",
+                    models.CharField(
+                        editable=False,
+                        max_length=6,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("in_progress", "In Progress"),
+                            ("delivered", "Delivered"),
+                            ("cancelled", "Cancelled"),
+                            ("complete", "Complete"),
+                        ],
+                        default="pending",
+                        max_length=50,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "client",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="orders",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="JobReferenceSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("code", models.PositiveIntegerField()),
+                ("project_name", models.CharField(max_length=50)),
+                (
+                    "order",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="job_reference",
+                        to="dashboard.order",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="deliveryinfosnapshot",
+            name="order",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="delivery",
+                to="dashboard.order",
+            ),
+        ),
+        migrations.CreateModel(
+            name="PaymentSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(editable=False, primary_key=True, serialize=False),
+                ),
+                ("transaction_id", models.CharField(max_length=100, unique=True)),
+                ("stripe_session_id", models.CharField(max_length=100, unique=True)),
+                (
+                    "method",
+                    models.CharField(
+                        choices=[
+                            ("visa", "Visa"),
+                            ("paypal", "PayPal"),
+                            ("stripe", "Stripe"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "date",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                ("total_amount", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("gst_ratio", models.DecimalField(decimal_places=2, max_digits=3)),
+                (
+                    "order",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="payment_history",
+                        to="dashboard.order",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PickupInfoSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.CharField(
+                        editable=False,
+                        max_length=6,
+                        primary_key=True,
+                        serialize=False,
+                        unique=True,
+                    ),
+                ),
+                ("date", models.DateField(editable=False, null=True)),
+                (
+                    "order",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pickup",
+                        to="dashboard.order",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StoredFlashing",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("code", models.CharField(max_length=50)),
+                ("position", models.CharField(max_length=50, null=True)),
+                ("start_crush_fold", models.BooleanField(default=False)),
+                ("end_crush_fold", models.BooleanField(default=False)),
+                ("color_side_dir", models.BooleanField(default=False)),
+                ("tapered", models.BooleanField(default=False)),
+                (
+                    "nodes",
+                    models.JSONField(validators=[dashboard.utils.validate_nodes]),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "client",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="flashings",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "material",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="ordered_flashings",
+                        to="factory.materialvariant",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Specification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.IntegerField()),
+                ("length", models.FloatField()),
+                (
+                    "flashing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="specifications",
+                        to="dashboard.storedflashing",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Cart",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "delivery_type",
+                    models.CharField(
+                        choices=[("delivery", "Delivery"), ("pickup", "Pickup")],
+                        default="delivery",
+                        editable=False,
+                        max_length=20,
+                    ),
+                ),
+                ("delivery_date", models.DateField(null=True)),
+                (
+                    "stripe_session_id",
+                    models.CharField(max_length=100, null=True, unique=True),
+                ),
+                (
+                    "address",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="dashboard.address",
+                    ),
+                ),
+                (
+                    "client",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cart",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "flashings",
+                    models.ManyToManyField(
+                        related_name="cart", to="dashboard.storedflashing"
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StoredFlashingSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("code", models.CharField(editable=False, max_length=50)),
+                (
+                    "position",
+                    models.CharField(editable=False, max_length=50, null=True),
+                ),
+                ("start_crush_fold", models.BooleanField()),
+                ("end_crush_fold", models.BooleanField()),
+                ("color_side_dir", models.BooleanField()),
+                ("tapered", models.BooleanField()),
+                (
+                    "nodes",
+                    models.JSONField(validators=[dashboard.utils.validate_nodes]),
+                ),
+                ("total_girth", models.FloatField()),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="flashings",
+                        to="dashboard.order",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SpecificationSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.IntegerField(editable=False)),
+                ("length", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("cost", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("weight", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "flashing",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="specifications",
+                        to="dashboard.storedflashingsnapshot",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="MaterialSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "variant_type",
+                    models.CharField(
+                        choices=[("color", "Color"), ("thickness", "Thickness")],
+                        default="color",
+                        max_length=10,
+                    ),
+                ),
+                ("name", models.CharField(max_length=50)),
+                ("variant_label", models.CharField(max_length=50)),
+                ("variant_value", models.CharField(max_length=50)),
+                ("base_price", models.FloatField()),
+                ("price_per_fold", models.FloatField()),
+                ("price_per_100girth", models.FloatField()),
+                ("price_per_crush_fold", models.FloatField()),
+                ("sample_weight", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "sample_weight_sq_meter",
+                    models.DecimalField(decimal_places=2, default=1.0, max_digits=5),
+                ),
+                (
+                    "flashing",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="material",
+                        to="dashboard.storedflashingsnapshot",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Template",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=30)),
+                ("start_crush_fold", models.BooleanField(default=False)),
+                ("end_crush_fold", models.BooleanField(default=False)),
+                ("color_side_dir", models.BooleanField(default=False)),
+                ("tapered", models.BooleanField(default=False)),
+                (
+                    "nodes",
+                    models.JSONField(validators=[dashboard.utils.validate_nodes]),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                (
+                    "client",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="templates",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
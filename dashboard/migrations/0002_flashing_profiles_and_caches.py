@@ -0,0 +1,322 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:33
+
+import dashboard.fields
+import dashboard.utils
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0001_initial"),
+        ("factory", "0002_capacity_and_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FlashingProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "digest",
+                    models.CharField(editable=False, max_length=64, unique=True),
+                ),
+                (
+                    "nodes",
+                    dashboard.fields.NodesField(
+                        validators=[dashboard.utils.validate_nodes]
+                    ),
+                ),
+                ("start_crush_fold", models.BooleanField(default=False)),
+                ("end_crush_fold", models.BooleanField(default=False)),
+                ("girth", models.FloatField(editable=False, null=True)),
+                ("fold_count", models.IntegerField(default=0, editable=False)),
+                (
+                    "crush_count",
+                    models.PositiveSmallIntegerField(default=0, editable=False),
+                ),
+                ("is_valid", models.BooleanField(default=False, editable=False)),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="GeocodeCache",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("query", models.CharField(max_length=255, unique=True)),
+                ("longitude", models.FloatField()),
+                ("latitude", models.FloatField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="IdSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("next_value", models.PositiveBigIntegerField(default=0)),
+                ("legacy", models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PostcodeCentroid",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("postcode", models.PositiveIntegerField(unique=True)),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("NSW", "New South Wales"),
+                            ("VIC", "Victoria"),
+                            ("QLD", "Queensland"),
+                            ("WA", "Western Australia"),
+                            ("SA", "South Australia"),
+                            ("TAS", "Tasmania"),
+                            ("ACT", "Australian Capital Territory"),
+                            ("NT", "Northern Territory"),
+                        ],
+                        max_length=3,
+                    ),
+                ),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="address",
+            name="distance_is_estimate",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="storedflashing",
+            name="is_complete",
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name="CapacityReservation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("flashings", models.PositiveIntegerField()),
+                ("weight_kg", models.FloatField()),
+                ("status", models.CharField(max_length=50)),
+                (
+                    "factory",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="capacity_reservations",
+                        to="factory.factory",
+                    ),
+                ),
+                (
+                    "order",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="capacity",
+                        to="dashboard.order",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="FactoryLoad",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("active_orders", models.IntegerField(default=0)),
+                (
+                    "factory",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="load",
+                        to="factory.factory",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="storedflashing",
+            name="profile",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="%(class)ss",
+                to="dashboard.flashingprofile",
+            ),
+        ),
+        migrations.AddField(
+            model_name="storedflashingsnapshot",
+            name="profile",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="%(class)ss",
+                to="dashboard.flashingprofile",
+            ),
+        ),
+        migrations.AddField(
+            model_name="template",
+            name="profile",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="%(class)ss",
+                to="dashboard.flashingprofile",
+            ),
+        ),
+        migrations.CreateModel(
+            name="RouteDistanceCache",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("from_longitude", models.FloatField()),
+                ("from_latitude", models.FloatField()),
+                ("to_longitude", models.FloatField()),
+                ("to_latitude", models.FloatField()),
+                ("distance_km", models.PositiveIntegerField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=(
+                            "from_longitude",
+                            "from_latitude",
+                            "to_longitude",
+                            "to_latitude",
+                        ),
+                        name="unique_route_distance",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="FactoryDayLoad",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("orders", models.IntegerField(default=0)),
+                ("flashings", models.IntegerField(default=0)),
+                ("weight_kg", models.FloatField(default=0)),
+                (
+                    "factory",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="day_loads",
+                        to="factory.factory",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("factory", "date"), name="unique_factory_day"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="FactoryPostcodeDistance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("postcode", models.PositiveIntegerField()),
+                ("distance_km", models.PositiveIntegerField()),
+                (
+                    "factory",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="postcode_distances",
+                        to="factory.factory",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("factory", "postcode"), name="unique_factory_postcode"
+                    )
+                ],
+            },
+        ),
+    ]
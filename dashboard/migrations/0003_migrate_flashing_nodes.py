@@ -0,0 +1,100 @@
+from django.db import migrations
+from django.db.models import Case, Exists, OuterRef, Value, When
+
+from dashboard.profiles import profile_digest, shape_geometry
+
+SHAPED_MODELS = ("StoredFlashing", "Template", "StoredFlashingSnapshot")
+BATCH_SIZE = 500
+
+
+def nodes_to_profiles(apps, schema_editor):
+    """
+    Points every flashing, template and snapshot at the profile of its
+    nodes and crush folds, before the nodes columns are dropped.
+    """
+    FlashingProfile = apps.get_model("dashboard", "FlashingProfile")
+
+    for model_name in SHAPED_MODELS:
+        model = apps.get_model("dashboard", model_name)
+        rows = (
+            model.objects.filter(profile__isnull=True)
+            .values_list("pk", "nodes", "start_crush_fold", "end_crush_fold")
+            .iterator(chunk_size=BATCH_SIZE)
+        )
+
+        shapes = {}
+        digests = {}
+        for pk, nodes, start_crush_fold, end_crush_fold in rows:
+            if not nodes:
+                continue
+            digest = profile_digest(nodes, start_crush_fold, end_crush_fold)
+            digests[pk] = digest
+            shapes.setdefault(digest, (nodes, start_crush_fold, end_crush_fold))
+
+        FlashingProfile.objects.bulk_create(
+            [
+                FlashingProfile(
+                    digest=digest,
+                    nodes=nodes,
+                    start_crush_fold=start_crush_fold,
+                    end_crush_fold=end_crush_fold,
+                    **shape_geometry(nodes, start_crush_fold, end_crush_fold),
+                )
+                for digest, (nodes, start_crush_fold, end_crush_fold) in shapes.items()
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+        profile_ids = {}
+        digest_list = list(shapes)
+        for i in range(0, len(digest_list), BATCH_SIZE):
+            profile_ids.update(
+                FlashingProfile.objects.filter(
+                    digest__in=digest_list[i : i + BATCH_SIZE]
+                ).values_list("digest", "pk")
+            )
+
+        model.objects.bulk_update(
+            [model(pk=pk, profile_id=profile_ids[digest]) for pk, digest in digests.items()],
+            ["profile"],
+            batch_size=BATCH_SIZE,
+        )
+
+    # Same as StoredFlashing.completeness(), which historical models don't have
+    StoredFlashing = apps.get_model("dashboard", "StoredFlashing")
+    Specification = apps.get_model("dashboard", "Specification")
+    StoredFlashing.objects.update(
+        is_complete=Case(
+            When(
+                Exists(
+                    FlashingProfile.objects.filter(pk=OuterRef("profile_id"), is_valid=True)
+                )
+                & Exists(Specification.objects.filter(flashing=OuterRef("pk"))),
+                then=Value(True),
+            ),
+            default=Value(False),
+        )
+    )
+
+
+def profiles_to_nodes(apps, schema_editor):
+    for model_name in SHAPED_MODELS:
+        model = apps.get_model("dashboard", model_name)
+        rows = model.objects.filter(profile__isnull=False).select_related("profile")
+        model.objects.bulk_update(
+            [model(pk=row.pk, nodes=list(row.profile.nodes)) for row in rows.iterator()],
+            ["nodes"],
+            batch_size=BATCH_SIZE,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0002_flashing_profiles_and_caches"),
+    ]
+
+    operations = [
+        migrations.RunPython(nodes_to_profiles, profiles_to_nodes),
+    ]
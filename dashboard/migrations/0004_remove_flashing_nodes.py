@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0003_migrate_flashing_nodes"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="storedflashing",
+            name="nodes",
+        ),
+        migrations.RemoveField(
+            model_name="storedflashingsnapshot",
+            name="nodes",
+        ),
+        migrations.RemoveField(
+            model_name="template",
+            name="nodes",
+        ),
+    ]
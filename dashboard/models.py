@@ -1,21 +1,26 @@
 from django.db import models
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.contrib.auth import get_user_model
-from django.db.models import Q, F
+from django.db.models import Q, F, Case, When, Value, Exists, OuterRef
+import threading
 import uuid
+from contextlib import contextmanager
 from datetime import timedelta
 
-from factory.models import MaterialVariant, DeliveryMethod
+from factory.models import MaterialVariant
+from factory.delivery import best_delivery_method
+from factory.calendar import get_calendar
 from .utils import (
-    validate_nodes,
     calculate_total_girth,
     validate_material_snapshot,
-    generate_six_digit_id,
-    two_days_from_now,
 )
-from .tasks import trigger_async_geocode_distance, geocode_async
+from .pricing import price_flashings, CartPricingContext
+from .profiles import FlashingProfile, ProfiledShape
+from .postcodes import estimate_distance_km
+from .ids import allocate_id
+from . import capacity
 
-import math
 
 User = get_user_model()
 
@@ -28,48 +33,51 @@ class Specification(models.Model):
     quantity = models.IntegerField()
     length = models.FloatField()
 
+    def _price(self):
+        # Prices the whole flashing, for many specs price their flashings
+        # once with price_flashings instead
+        if self.pk is None:
+            return None
+        return price_flashings([self.flashing])[self.flashing_id]["specs"][self.pk]
+
     @property
     def weight(self):
-        calc_weight = self.flashing.material.calculate_weight
-        girth = self.flashing.total_girth
-        return round(calc_weight(girth, self.length) * self.quantity, 2)
+        """Weight in kg, None until the spec is saved."""
+        price = self._price()
+        return None if price is None else price["weight"]
 
     @property
     def cost(self):
-        try:
-            mat_group = self.flashing.material.group
-            total_girth = math.ceil(self.flashing.total_girth / 100.0)
-            crush_num = int(self.flashing.start_crush_fold) + int(
-                self.flashing.end_crush_fold
-            )
-            fold_num = len(self.flashing.nodes) - 2
-
-            base_price = mat_group.base_price
-            price_fold = mat_group.price_per_fold * fold_num
-            price_girth = mat_group.price_per_100girth * total_girth
-            price_crush = mat_group.price_per_crush_fold * crush_num
-
-            c = base_price + price_fold + price_girth + price_crush
-
-            # print(
-            #     "calculated prices: ",
-            #     (base_price, mat_group.base_price, 1),
-            #     (price_fold, mat_group.price_per_fold, fold_num),
-            #     (price_girth, mat_group.price_per_100girth, total_girth),
-            #     (price_crush, mat_group.price_per_crush_fold, crush_num),
-            #     (c),
-            #     sep="\n",
-            # )
-
-            return float(c) * float(self.length / 1000) * float(self.quantity)
-        except:
-            return 0
+        """Cost in dollars, None until the spec is saved."""
+        price = self._price()
+        return None if price is None else price["cost"]
 
     def __str__(self):
         return f"Spec {self.id} for Flashing {self.flashing.id}"
 
 
-class StoredFlashing(models.Model):
+_local = threading.local()
+
+
+@contextmanager
+def deferred_completeness():
+    """
+    Specifications saved or deleted inside the block don't refresh
+    is_complete of their flashing, the caller refreshes it once after.
+    """
+    previous = getattr(_local, "deferred", False)
+    _local.deferred = True
+    try:
+        yield
+    finally:
+        _local.deferred = previous
+
+
+def completeness_deferred():
+    return getattr(_local, "deferred", False)
+
+
+class StoredFlashing(ProfiledShape):
     # TODO: The flashing id will be generated on frontend and will be indexed using it,
     #      so I think we need it here to temporary
     # flashing_id = models.CharField(max_length=10, unique=True, primary_key=True)
@@ -88,49 +96,80 @@ class StoredFlashing(models.Model):
     color_side_dir = models.BooleanField(default=False)
     tapered = models.BooleanField(default=False)
 
-    # Nodes or data
-    nodes = models.JSONField(validators=[validate_nodes])
+    # Nodes, girth, fold and crush counts come from the shared profile
 
     @property
     def total_girth(self):
-        if self.nodes:
+        if self.girth is None and self.nodes:
             return calculate_total_girth(self.nodes)
-        else:
-            return None
+        return self.girth
 
     @property
     def total_cost(self):
-        return sum(spec.cost for spec in self.specifications.all())
+        return price_flashings([self])[self.id]["cost"]
 
     created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
-    @property
-    def is_complete(self):
-        required_fields = [
-            "material",
-            "nodes",
-            "total_girth",
-            "specifications",
-        ]
-
-        for field in required_fields:
-            if getattr(self, field) in [None, "", []]:
-                return False
+    # A material, valid nodes and at least one specification. Kept up to
+    # date on save and when specifications change (see signals), so carts
+    # can drop incomplete flashings in one query.
+    is_complete = models.BooleanField(default=False, db_index=True, editable=False)
+
+    @classmethod
+    def completeness(cls):
+        """is_complete of a row as an SQL expression."""
+        return Case(
+            When(
+                Exists(
+                    FlashingProfile.objects.filter(pk=OuterRef("profile_id"), is_valid=True)
+                )
+                & Exists(Specification.objects.filter(flashing=OuterRef("pk"))),
+                then=Value(True),
+            ),
+            default=Value(False),
+        )
 
-        if not self.specifications.exists():
-            return False
+    @classmethod
+    def refresh_completeness(cls, flashings):
+        """Recomputes is_complete of the flashings (a queryset or pks) in one UPDATE."""
+        if not isinstance(flashings, models.QuerySet):
+            flashings = cls.objects.filter(pk__in=flashings)
+        return flashings.update(is_complete=cls.completeness())
+
+    def update_is_complete(self):
+        complete = bool(
+            self.material_id
+            and self.profile_id
+            and self.profile.is_valid
+            and self.specifications.exists()
+        )
+        StoredFlashing.objects.filter(pk=self.pk).update(is_complete=complete)
+        self.is_complete = complete
+        return complete
 
-        try:
-            validate_nodes(self.nodes)
-        except Exception:
-            return False
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_completeness_source = instance._completeness_source()
+        return instance
 
-        return True
+    def _completeness_source(self):
+        return (self.__dict__.get("profile_id"), self.__dict__.get("material_id"))
 
     @property
     def total_weight(self):
-        return round(sum(spec.weight for spec in self.specifications.all()), 2)
+        return price_flashings([self])[self.id]["weight"]
+
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        super().save(*args, **kwargs)
+
+        # A new flashing has no specifications yet, so it can't be complete
+        loaded = getattr(self, "_loaded_completeness_source", None)
+        if not creating and loaded != self._completeness_source():
+            self.update_is_complete()
+        self._loaded_completeness_source = self._completeness_source()
 
     def __str__(self):
         return f"Flashing {self.id} for client {self.client.email}"
@@ -157,27 +196,28 @@ class Cart(models.Model):
 
     address = models.ForeignKey("Address", on_delete=models.SET_NULL, null=True)
 
+    @cached_property
+    def pricing(self):
+        return CartPricingContext(self)
+
     @property
     def delivery_method(self):
-        if self.delivery_type == self.DeliveryTypeChoices.DELIVERY:
-            self.address.best_delivery_method
-        else: return None
+        return self.pricing.delivery_method
 
     @property
     def delivery_cost(self):
-        if self.delivery_type == self.DeliveryTypeChoices.DELIVERY:
-            d = self.delivery_method
-            return (
-                float(d.base_cost)
-                + float(d.cost_per_kg) * self.total_delivery_weight
-                + float(d.cost_per_km) * self.address.distance_to_factory
-            )
-        else:
-            return None
+        return self.pricing.delivery_cost
 
     @property
     def estimated_delivery_date(self):
-        return two_days_from_now()
+        """Earliest working day the cart can be delivered or picked up on."""
+        delivery_days = 0
+        if self.delivery_type == self.DeliveryTypeChoices.DELIVERY and self.address:
+            delivery_days = self.address.delivery_days_for(
+                self.total_delivery_weight, factory_id=self.client.factory_id
+            )
+
+        return get_calendar(self.client.factory).earliest_delivery_date(delivery_days)
 
     @property
     def job_reference(self):
@@ -187,47 +227,34 @@ class Cart(models.Model):
 
     @property
     def flashings_cost(self):
-        return sum(flash.total_cost for flash in self.flashings.all())
+        return self.pricing.flashings_cost
 
     @property
     def gst_ratio(self):
-        return self.client.factory.gst_ratio
+        return self.pricing.gst_ratio
 
     @property
     def total_amount(self):
-        return round(
-            (self.flashings_cost + float(self.delivery_cost or 0)) * (self.gst_ratio + 1), 2
-        )
+        return self.pricing.total_amount
+
+    @property
+    def total_amount_cents(self):
+        return self.pricing.total_amount_cents
 
     @property
     def total_delivery_weight(self):
-        return round(sum(flash.total_weight for flash in self.flashings.all()), 2)
+        return self.pricing.total_delivery_weight
 
-    # TODO The address should not be checked when pickup
     @property
     def is_complete(self):
-        if not self.flashings.exists():
-            return False
-
-        if not self.address:
-            return False
-
-        if not self.delivery_date:
-            return False
-
-        if self.flashings_cost <= 0:
-            return False
-
-        if not (0 <= self.gst_ratio <= 1):
-            return False
-
-        return True
+        return self.pricing.is_complete
 
     def _cleanup_incomplete_flashings(self):
-        # Remove incomplete flashings after save (m2m requires PK)
-        incomplete = [f for f in self.flashings.all() if not f.is_complete]
-        if len(incomplete) > 0:
-            self.flashings.remove(*incomplete)
+        # Remove incomplete flashings after save (m2m requires PK), in one
+        # DELETE on the m2m table
+        self.flashings.through.objects.filter(
+            cart=self, storedflashing__is_complete=False
+        ).delete()
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
@@ -235,6 +262,9 @@ class Cart(models.Model):
         # Post-save operations that require PK (m2m operations)
         self._cleanup_incomplete_flashings()
 
+        # Contents or delivery details may have changed, price again on demand
+        self.__dict__.pop("pricing", None)
+
     def __str__(self):
         return f"Cart for client {self.client_id}"
 
@@ -275,14 +305,25 @@ class Order(models.Model):
     created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True, editable=False)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.id:
-            self.id = generate_six_digit_id()
-            while Order.objects.filter(id=self.id).exists():
-                self.id = generate_six_digit_id()
+            self.id = allocate_id(Order)
 
         super().save(*args, **kwargs)
 
+        # New orders are booked by the checkout, here only status changes
+        if getattr(self, "_loaded_status", self.status) != self.status:
+            capacity.sync_status(self)
+        # Also after the first save, changes of an order created in this
+        # process are synced too
+        self._loaded_status = self.status
+
     def __str__(self):
         return f"Order {self.id} for client {self.client.email}"
 
@@ -321,37 +362,49 @@ class Address(models.Model):
     postcode = models.PositiveIntegerField()
 
     distance_to_factory = models.PositiveIntegerField(default=0)
+    # True while distance_to_factory only holds the offline postcode estimate
+    distance_is_estimate = models.BooleanField(default=False)
 
     recipient_name = models.CharField(max_length=50)
     recipient_phone = models.PositiveIntegerField()
 
-    # TODO This property should be synced to distance_to_factory and trigger_async_geocode_distance()
+    # distance_to_factory starts as a postcode estimate (see save) and is
+    # refined by the compute_address_distance background job
     @property
     def best_delivery_method(self):
-        if self.distance_to_factory:
-            return (
-                DeliveryMethod.objects.filter(
-                    is_active=True, max_distance_km__gt=self.distance_to_factory
-                )
-                .order_by("priority")
-                .first()
-            )
-        else:
-            return None
+        return self.delivery_method_for()
+
+    def delivery_method_for(self, weight_kg=0, factory_id=None):
+        """Best method of the client's factory for this address and a load weight."""
+        if factory_id is None:
+            factory_id = self.job_reference.client.factory_id
+        return best_delivery_method(factory_id, self.distance_to_factory, weight_kg)
+
+    def delivery_days_for(self, weight_kg=0, factory_id=None):
+        """Working days the delivery itself takes, 0 when the factory doesn't deliver it."""
+        method = self.delivery_method_for(weight_kg, factory_id=factory_id)
+        if method is None or method.method_type != "factory":
+            return 0
+        return method.estimate_delivery_days(
+            float(self.distance_to_factory), float(weight_kg)
+        )
 
     @property
     def full_address(self):
         return f"{self.street_address}, {self.suburb}, {self.state} {self.postcode}, Australia"
 
     def save(self, *args, **kwargs):
-        if self.pk is None:
-            # trigger_async_geocode_distance(self)
-            geocode_async(self)
+        if self.pk is None and not self.distance_to_factory:
+            factory = self.job_reference.client.factory
+            estimate = estimate_distance_km(factory, self.postcode) if factory else None
+            if estimate is not None:
+                self.distance_to_factory = estimate
+                self.distance_is_estimate = True
 
         super().save(*args, **kwargs)
 
 
-class Template(models.Model):
+class Template(ProfiledShape):
     client = models.ForeignKey(User, on_delete=models.CASCADE, related_name="templates")
     name = models.CharField(max_length=30)
 
@@ -360,8 +413,6 @@ class Template(models.Model):
     color_side_dir = models.BooleanField(default=False)
     tapered = models.BooleanField(default=False)
 
-    nodes = models.JSONField(validators=[validate_nodes])
-
     created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
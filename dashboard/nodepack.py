@@ -0,0 +1,214 @@
+import struct
+
+import numpy as np
+
+# Packed nodes start with a NUL byte, which JSON text never does
+MAGIC = b"\x00FN"
+VERSION = 1
+
+HEADER = struct.Struct("<3sBI")  # magic, version, node count
+
+NODE_KEYS = (
+    "node_id",
+    "left",
+    "top",
+    "prev_node_id",
+    "next_node_id",
+    "next_line_bside_length",
+)
+
+# Per node flags, so decoding gives back the exact JSON that was packed
+LEFT_INT = 1
+TOP_INT = 2
+BSIDE_INT = 4
+HAS_BSIDE = 8
+BSIDE_NONE = 16
+HAS_PREV = 32  # head node with an explicit prev_node_id: null
+HAS_NEXT = 64  # tail node with an explicit next_node_id: null
+
+# Integers floats can hold exactly
+MAX_EXACT_INT = 2**53
+
+
+def is_packed(data):
+    return bytes(data[: len(MAGIC)]) == MAGIC
+
+
+def _number_flag(value, int_flag):
+    """Flag of a coordinate, None when it can't be packed losslessly."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if isinstance(value, int):
+        return int_flag if abs(value) <= MAX_EXACT_INT else None
+    return 0
+
+
+def pack_nodes(nodes, order):
+    """
+    Packs a valid chain of nodes, `order` being their indices from head to
+    tail, as:
+
+        header | left float64[n] | top float64[n] | bside float64[n]
+               | flags uint8[n] | node ids, utf-8 joined by NUL
+
+    The nodes are stored in chain order, the prev/next links follow from it.
+    Returns None when the nodes carry anything the format can't give back
+    as is (other keys, non string ids, ...), they are then stored as JSON.
+    """
+    count = len(order)
+    if not count or count != len(nodes):
+        return None
+
+    left = np.empty(count, dtype="<f8")
+    top = np.empty(count, dtype="<f8")
+    bside = np.zeros(count, dtype="<f8")
+    flags = np.zeros(count, dtype=np.uint8)
+    ids = []
+
+    for position, i in enumerate(order):
+        node = nodes[i]
+        if not set(node).issubset(NODE_KEYS):
+            return None
+
+        node_id = node["node_id"]
+        if not isinstance(node_id, str) or "\x00" in node_id:
+            return None
+        ids.append(node_id)
+
+        flag = 0
+        for field, array, int_flag in (("left", left, LEFT_INT), ("top", top, TOP_INT)):
+            number_flag = _number_flag(node[field], int_flag)
+            if number_flag is None:
+                return None
+            array[position] = node[field]
+            flag |= number_flag
+
+        if "next_line_bside_length" in node:
+            value = node["next_line_bside_length"]
+            flag |= HAS_BSIDE
+            if value is None:
+                flag |= BSIDE_NONE
+            else:
+                number_flag = _number_flag(value, BSIDE_INT)
+                if number_flag is None:
+                    return None
+                bside[position] = value
+                flag |= number_flag
+
+        # The chain ends must hold a plain null (or nothing) to be rebuilt
+        if position == 0 and "prev_node_id" in node:
+            if node["prev_node_id"] is not None:
+                return None
+            flag |= HAS_PREV
+        if position == count - 1 and "next_node_id" in node:
+            if node["next_node_id"] is not None:
+                return None
+            flag |= HAS_NEXT
+
+        flags[position] = flag
+
+    return b"".join(
+        (
+            HEADER.pack(MAGIC, VERSION, count),
+            left.tobytes(),
+            top.tobytes(),
+            bside.tobytes(),
+            flags.tobytes(),
+            "\x00".join(ids).encode(),
+        )
+    )
+
+
+class PackedNodes:
+    """
+    Read-only nodes of a flashing as stored in the packed format.
+
+    Length, coordinates and girth come straight from the buffer. The JSON
+    shape (a list of node dicts in chain order) is only built on first
+    access to the items, or by tolist() when the response is rendered.
+    """
+
+    __hash__ = None
+
+    def __init__(self, data):
+        self.data = bytes(data)
+        magic, version, self._count = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not packed nodes")
+        self._nodes = None
+
+    def _array(self, slot):
+        offset = HEADER.size + slot * self._count * 8
+        return np.frombuffer(self.data, dtype="<f8", count=self._count, offset=offset)
+
+    @property
+    def left(self):
+        return self._array(0)
+
+    @property
+    def top(self):
+        return self._array(1)
+
+    def coordinates(self):
+        """(n, 2) array of the node positions from head to tail."""
+        return np.column_stack((self.left, self.top))
+
+    def girth(self):
+        return float(np.hypot(np.diff(self.left), np.diff(self.top)).sum())
+
+    def tolist(self):
+        if self._nodes is None:
+            self._nodes = self._decode()
+        return self._nodes
+
+    def _decode(self):
+        count = self._count
+        left, top, bside = self.left.tolist(), self.top.tolist(), self._array(2).tolist()
+
+        flags_offset = HEADER.size + 3 * count * 8
+        flags = self.data[flags_offset : flags_offset + count]
+        ids = self.data[flags_offset + count :].decode().split("\x00")
+
+        nodes = []
+        for i, (node_id, flag) in enumerate(zip(ids, flags)):
+            node = {
+                "node_id": node_id,
+                "left": int(left[i]) if flag & LEFT_INT else left[i],
+                "top": int(top[i]) if flag & TOP_INT else top[i],
+            }
+            if i or flag & HAS_PREV:
+                node["prev_node_id"] = ids[i - 1] if i else None
+            if i < count - 1 or flag & HAS_NEXT:
+                node["next_node_id"] = ids[i + 1] if i < count - 1 else None
+            if flag & HAS_BSIDE:
+                if flag & BSIDE_NONE:
+                    node["next_line_bside_length"] = None
+                elif flag & BSIDE_INT:
+                    node["next_line_bside_length"] = int(bside[i])
+                else:
+                    node["next_line_bside_length"] = bside[i]
+            nodes.append(node)
+
+        return nodes
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def __getitem__(self, index):
+        return self.tolist()[index]
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, PackedNodes):
+            return self.data == other.data
+        if isinstance(other, list):
+            return len(other) == self._count and self.tolist() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"<PackedNodes: {self._count} nodes>"
@@ -0,0 +1,146 @@
+import asyncio
+import math
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BASE_URL = "https://api.openrouteservice.org"
+GEOCODE_PATH = "/geocode/search"
+ROUTE_PATH = "/v2/directions/driving-car"
+MATRIX_PATH = "/v2/matrix/driving-car"
+
+# ORS rejects matrix requests with too many locations, origin included
+MATRIX_MAX_LOCATIONS = getattr(settings, "ORS_MATRIX_MAX_LOCATIONS", 50)
+
+
+class ORSClient:
+    """
+    OpenRouteService client on a pooled session: connections (and their TLS
+    handshakes) are reused, every call has a timeout and transient errors
+    (429/5xx) are retried with a backoff.
+    """
+
+    def __init__(self, api_key=None, timeout=None, pool_size=None, retries=2):
+        self.api_key = api_key or settings.ORS_API_KEY
+        self.timeout = timeout or getattr(settings, "ORS_TIMEOUT", (3.05, 15))
+
+        pool_size = pool_size or getattr(settings, "ORS_POOL_SIZE", 10)
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None,
+        )
+
+        self.session = requests.Session()
+        self.session.mount(
+            "https://",
+            HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry),
+        )
+        self.session.headers.update({"Authorization": self.api_key or ""})
+
+    def _get(self, path, **params):
+        resp = self.session.get(BASE_URL + path, params=params, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _post(self, path, body):
+        resp = self.session.post(BASE_URL + path, json=body, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def geocode(self, query):
+        """Return (lon, lat) from a postcode or partial address."""
+        data = self._get(GEOCODE_PATH, api_key=self.api_key, text=query, size=1)
+
+        features = data.get("features")
+        if not features:
+            raise ValueError(f"Could not geocode: {query}")
+
+        coords = features[0]["geometry"]["coordinates"]
+        return coords[0], coords[1]  # (lon, lat)
+
+    def route_distance_km(self, start, end):
+        """Driving distance in kilometers between two (lon, lat) points."""
+        data = self._post(
+            ROUTE_PATH, {"coordinates": [[start[0], start[1]], [end[0], end[1]]]}
+        )
+        return math.ceil(data["routes"][0]["summary"]["distance"] / 1000)
+
+    def matrix_distances_km(self, origin, destinations):
+        """
+        Driving distances in kilometers from one (lon, lat) origin to many
+        destinations, one request per MATRIX_MAX_LOCATIONS - 1 destinations.
+        Unreachable destinations get None.
+        """
+        distances = []
+        chunk_size = MATRIX_MAX_LOCATIONS - 1
+
+        for i in range(0, len(destinations), chunk_size):
+            chunk = destinations[i : i + chunk_size]
+            data = self._post(
+                MATRIX_PATH,
+                {
+                    "locations": [list(origin)] + [list(d) for d in chunk],
+                    "sources": [0],
+                    "destinations": list(range(1, len(chunk) + 1)),
+                    "metrics": ["distance"],
+                    "units": "km",
+                },
+            )
+            distances.extend(
+                math.ceil(d) if d is not None else None for d in data["distances"][0]
+            )
+
+        return distances
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncORSClient:
+    """
+    Asyncio front for ORSClient. Calls run on worker threads sharing the
+    pooled session, at most `concurrency` of them at once.
+    """
+
+    def __init__(self, client=None, concurrency=8):
+        self.client = client or get_client()
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run(self, fn, *args):
+        async with self.semaphore:
+            return await asyncio.to_thread(fn, *args)
+
+    async def geocode(self, query):
+        return await self._run(self.client.geocode, query)
+
+    async def geocode_many(self, queries):
+        """
+        Geocodes all queries concurrently. Results keep the order of the
+        queries; a failed lookup gives its exception instead of a point.
+        """
+        return await asyncio.gather(
+            *(self._run(self.client.geocode, q) for q in queries),
+            return_exceptions=True,
+        )
+
+    async def matrix_distances_km(self, origin, destinations):
+        return await self._run(self.client.matrix_distances_km, origin, destinations)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process wide ORSClient, so every caller shares the same pool."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ORSClient()
+    return _client
@@ -0,0 +1,114 @@
+import math
+
+import numpy as np
+from django.conf import settings
+
+from .geodata import PostcodeCentroid, FactoryPostcodeDistance
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Road distance is longer than the great circle one, how much longer depends
+# mostly on the state the destination is in
+DEFAULT_DETOUR_FACTORS = {
+    "NSW": 1.25,
+    "VIC": 1.2,
+    "QLD": 1.3,
+    "WA": 1.3,
+    "SA": 1.25,
+    "TAS": 1.35,
+    "ACT": 1.2,
+    "NT": 1.35,
+}
+DETOUR_FACTORS = {
+    **DEFAULT_DETOUR_FACTORS,
+    **getattr(settings, "ROAD_DETOUR_FACTORS", {}),
+}
+FALLBACK_DETOUR_FACTOR = 1.3
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great circle distance in km, works on scalars and NumPy arrays alike."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def road_distance_km(lat1, lon1, lat2, lon2, state):
+    direct = float(haversine_km(lat1, lon1, lat2, lon2))
+    return math.ceil(direct * DETOUR_FACTORS.get(state, FALLBACK_DETOUR_FACTOR))
+
+
+def factory_centroid(factory):
+    return PostcodeCentroid.objects.filter(postcode=factory.postcode).first()
+
+
+def precompute_factory_distances(factory):
+    """
+    Rebuilds the distance table from a factory to every known postcode in
+    one vectorized pass. Returns the number of rows written, 0 when the
+    factory's own postcode has no centroid.
+    """
+    origin = factory_centroid(factory)
+    if origin is None:
+        return 0
+
+    rows = list(
+        PostcodeCentroid.objects.values_list("postcode", "state", "latitude", "longitude")
+    )
+    if not rows:
+        return 0
+
+    postcodes, states, lats, lons = zip(*rows)
+
+    direct = haversine_km(
+        origin.latitude, origin.longitude, np.array(lats), np.array(lons)
+    )
+    factors = np.array(
+        [DETOUR_FACTORS.get(s, FALLBACK_DETOUR_FACTOR) for s in states]
+    )
+    distances = np.ceil(direct * factors).astype(np.int64)
+
+    FactoryPostcodeDistance.objects.bulk_create(
+        [
+            FactoryPostcodeDistance(factory=factory, postcode=p, distance_km=d)
+            for p, d in zip(postcodes, distances.tolist())
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["factory", "postcode"],
+        update_fields=["distance_km"],
+    )
+    return len(rows)
+
+
+def estimate_distance_km(factory, postcode):
+    """
+    Offline estimate of the road distance from a factory to a postcode.
+
+    Uses the precomputed table first, then the postcode centroids. Returns
+    None when either postcode is unknown.
+    """
+    distance = (
+        FactoryPostcodeDistance.objects.filter(factory=factory, postcode=postcode)
+        .values_list("distance_km", flat=True)
+        .first()
+    )
+    if distance is not None:
+        return distance
+
+    origin = factory_centroid(factory)
+    destination = PostcodeCentroid.objects.filter(postcode=postcode).first()
+    if origin is None or destination is None:
+        return None
+
+    return road_distance_km(
+        origin.latitude,
+        origin.longitude,
+        destination.latitude,
+        destination.longitude,
+        destination.state,
+    )
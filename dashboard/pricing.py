@@ -0,0 +1,300 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from django.core.exceptions import ValidationError
+
+from .nodepack import PackedNodes
+from .utils import node_chain
+
+
+def chain_coordinates(nodes):
+    """
+    Returns the (left, top) pairs of the nodes in chain order, starting at
+    the head node (the one without prev_node_id).
+    """
+    if isinstance(nodes, PackedNodes):
+        return nodes.coordinates()
+
+    try:
+        order = node_chain(nodes)
+    except ValidationError:
+        return []
+
+    return [(nodes[i]["left"], nodes[i]["top"]) for i in order]
+
+
+def pack_coordinates(chains):
+    """
+    Packs a list of coordinate chains into a zero padded (F, N, 2) array and
+    a (F, N - 1) mask of the segments that actually exist.
+    """
+    width = max((len(c) for c in chains), default=0)
+    width = max(width, 2)
+
+    coords = np.zeros((len(chains), width, 2), dtype=np.float64)
+    lengths = np.zeros(len(chains), dtype=np.int64)
+
+    for i, chain in enumerate(chains):
+        if len(chain):
+            coords[i, : len(chain)] = chain
+            lengths[i] = len(chain)
+
+    segments = np.arange(width - 1)
+    mask = segments[None, :] < (lengths[:, None] - 1)
+
+    return coords, mask
+
+
+def girths(chains):
+    """Total girth of every chain, computed in one vectorized pass."""
+    if not chains:
+        return np.zeros(0, dtype=np.float64)
+
+    coords, mask = pack_coordinates(chains)
+    deltas = np.diff(coords, axis=1)
+    segment_lengths = np.hypot(deltas[..., 0], deltas[..., 1])
+
+    return (segment_lengths * mask).sum(axis=1)
+
+
+# Money is handled in integer cents and lengths in integer hundredths of a
+# millimetre (the precision snapshots keep them with), so sums are exact.
+# Rounding is half up, once per specification cost, per delivery cost and
+# on the GST.
+LENGTH_SCALE = 100
+METRE = 1000 * LENGTH_SCALE
+
+
+def _round_half_up(amount):
+    """A Decimal rounded half up to an integer."""
+    return int(amount.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_cents(amount):
+    """An amount of dollars (Decimal, float or str) in integer cents."""
+    return _round_half_up(Decimal(str(amount)) * 100)
+
+
+def from_cents(cents):
+    """Integer cents as a Decimal amount of dollars, for DecimalFields."""
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def to_length_units(length_mm):
+    """A length in millimetres in integer LENGTH_SCALE units."""
+    return _round_half_up(Decimal(str(length_mm)) * LENGTH_SCALE)
+
+
+def _divide_half_up(numerator, denominator):
+    """Integer division of non negative int64 arrays, rounding half up."""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def price_kernel(girth, folds, crushes, has_nodes, prices, sample, owners, lengths, quantities):
+    """
+    The pricing arithmetic on plain arrays, shared by carts, checkout and
+    quotes. Per flashing: girth (mm), folds, crushes, has_nodes, prices in
+    cents (base, per fold, per 100 girth, per crush fold, all per metre) and
+    sample weight. Per specification: owner (flashing index), length in
+    LENGTH_SCALE units and quantity, all int64.
+
+    Returns every specification's cost in integer cents and weight in kg.
+    """
+    girth_units = np.ceil(girth / 100.0).astype(np.int64)
+    unit_price = (
+        prices[:, 0]
+        + prices[:, 1] * folds
+        + prices[:, 2] * girth_units
+        + prices[:, 3] * crushes
+    )
+    # A flashing without nodes has no price
+    unit_price = np.where(has_nodes, unit_price, 0)
+
+    spec_costs = _divide_half_up(unit_price[owners] * lengths * quantities, METRE)
+    spec_weights = sample[owners] * girth[owners] * (lengths / METRE) / 1000 * quantities
+
+    return spec_costs, spec_weights
+
+
+def price_flashings(flashings):
+    """
+    Calculates the cost and weight of many flashings and all of their
+    specifications at once.
+
+    The flashings should come with `material__group` selected and
+    `specifications` prefetched, otherwise every row costs extra queries.
+
+    Returns a dict keyed by flashing id:
+        {
+            "girth": float,
+            "cost_cents": int,
+            "cost": float,
+            "weight": float,
+            "specs": {spec_id: {"cost_cents": int, "cost": float, "weight": float}},
+        }
+    """
+    flashings = list(flashings)
+    if not flashings:
+        return {}
+
+    count = len(flashings)
+
+    # Stored flashings carry their derived geometry, only drafts without it
+    # need their node chains walked
+    stored = [getattr(f, "girth", None) is not None for f in flashings]
+
+    girth = np.array(
+        [f.girth if s else 0.0 for f, s in zip(flashings, stored)], dtype=np.float64
+    )
+    folds = np.array(
+        [f.fold_count if s else len(f.nodes or []) - 2 for f, s in zip(flashings, stored)],
+        dtype=np.int64,
+    )
+    has_nodes = np.array(stored)
+
+    drafts = [i for i, f in enumerate(flashings) if not stored[i] and f.nodes]
+    if drafts:
+        girth[drafts] = girths([chain_coordinates(flashings[i].nodes) for i in drafts])
+        has_nodes[drafts] = True
+
+    crushes = np.array(
+        [int(f.start_crush_fold) + int(f.end_crush_fold) for f in flashings],
+        dtype=np.int64,
+    )
+
+    # Group price columns
+    prices = np.zeros((count, 4), dtype=np.int64)
+    sample = np.zeros(count, dtype=np.float64)
+    for i, f in enumerate(flashings):
+        g = f.material.group
+        prices[i] = (
+            to_cents(g.base_price),
+            to_cents(g.price_per_fold),
+            to_cents(g.price_per_100girth),
+            to_cents(g.price_per_crush_fold),
+        )
+        sample[i] = float(g.sample_weight) / float(g.sample_weight_sq_meter)
+
+    # Flattened specifications
+    spec_ids = []
+    owners = []
+    lengths = []
+    quantities = []
+    for i, f in enumerate(flashings):
+        for spec in f.specifications.all():
+            spec_ids.append(spec.id)
+            owners.append(i)
+            lengths.append(to_length_units(spec.length))
+            quantities.append(spec.quantity)
+
+    owners = np.array(owners, dtype=np.int64)
+    lengths = np.array(lengths, dtype=np.int64)
+    quantities = np.array(quantities, dtype=np.int64)
+
+    spec_costs, spec_weights = price_kernel(
+        girth, folds, crushes, has_nodes, prices, sample, owners, lengths, quantities
+    )
+
+    result = {
+        f.id: {
+            "girth": float(girth[i]) if has_nodes[i] else None,
+            "cost_cents": 0,
+            "weight": 0.0,
+            "specs": {},
+        }
+        for i, f in enumerate(flashings)
+    }
+
+    for spec_id, owner, cents, weight in zip(
+        spec_ids, owners.tolist(), spec_costs.tolist(), spec_weights.tolist()
+    ):
+        entry = result[flashings[owner].id]
+        weight = round(weight, 2)
+        entry["specs"][spec_id] = {"cost_cents": cents, "cost": cents / 100, "weight": weight}
+        entry["cost_cents"] += cents
+        entry["weight"] += weight
+
+    for entry in result.values():
+        entry["cost"] = entry["cost_cents"] / 100
+        entry["weight"] = round(entry["weight"], 2)
+
+    return result
+
+
+def with_pricing_relations(queryset):
+    """Loads everything `price_flashings` touches in a fixed number of queries."""
+    return queryset.select_related(
+        "material__group__material", "profile"
+    ).prefetch_related(
+        "specifications"
+    )
+
+
+class CartPricingContext:
+    """
+    All the aggregates of a cart, computed from a single load of its
+    flashings, specifications and materials.
+
+    Build it once per request (Cart.pricing does) and read every total from
+    it instead of walking cart.flashings for each of them.
+    """
+
+    def __init__(self, cart):
+        self.cart = cart
+
+        self.flashings = list(with_pricing_relations(cart.flashings.all()))
+        self.prices = price_flashings(self.flashings)
+
+        self.flashings_cost_cents = sum(p["cost_cents"] for p in self.prices.values())
+        self.flashings_cost = self.flashings_cost_cents / 100
+        self.total_delivery_weight = round(
+            sum(p["weight"] for p in self.prices.values()), 2
+        )
+
+        self.gst_ratio = cart.client.factory.gst_ratio
+
+        self.delivery_method = None
+        self.delivery_cost_cents = None
+        self.delivery_cost = None
+        if cart.delivery_type == cart.DeliveryTypeChoices.DELIVERY and cart.address:
+            self.delivery_method = cart.address.delivery_method_for(
+                self.total_delivery_weight, factory_id=cart.client.factory_id
+            )
+
+            d = self.delivery_method
+            if d is not None:
+                self.delivery_cost_cents = _round_half_up(
+                    (
+                        d.base_cost
+                        + d.cost_per_kg * Decimal(str(self.total_delivery_weight))
+                        + d.cost_per_km * Decimal(str(cart.address.distance_to_factory))
+                    )
+                    * 100
+                )
+                self.delivery_cost = self.delivery_cost_cents / 100
+
+        # GST is worked out on the subtotal and rounded once
+        subtotal_cents = self.flashings_cost_cents + (self.delivery_cost_cents or 0)
+        self.gst_cents = _round_half_up(subtotal_cents * Decimal(str(self.gst_ratio)))
+        self.total_amount_cents = subtotal_cents + self.gst_cents
+        self.total_amount = self.total_amount_cents / 100
+
+    # TODO The address should not be checked when pickup
+    @property
+    def is_complete(self):
+        if not self.flashings:
+            return False
+
+        if not self.cart.address:
+            return False
+
+        if not self.cart.delivery_date:
+            return False
+
+        if self.flashings_cost <= 0:
+            return False
+
+        if not (0 <= self.gst_ratio <= 1):
+            return False
+
+        return True
@@ -0,0 +1,189 @@
+import hashlib
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils import timezone
+
+from .fields import NodesField
+from .utils import node_chain, calculate_total_girth, validate_nodes
+
+
+def profile_digest(nodes, start_crush_fold, end_crush_fold):
+    """
+    Key of a shape: the nodes in chain order (so the same chain listed in
+    another order, or packed, hashes the same) and its crush folds.
+    """
+    try:
+        chain = [nodes[i] for i in node_chain(nodes)]
+    except ValidationError:
+        chain = nodes
+
+    data = json.dumps(
+        [chain, bool(start_crush_fold), bool(end_crush_fold)],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def shape_geometry(nodes, start_crush_fold, end_crush_fold):
+    """The derived fields (FlashingProfile.DERIVED_FIELDS) of a shape."""
+    try:
+        validate_nodes(nodes)
+        is_valid = True
+    except ValidationError:
+        is_valid = False
+
+    return {
+        "girth": calculate_total_girth(nodes),
+        "fold_count": len(nodes) - 2,
+        "crush_count": int(start_crush_fold) + int(end_crush_fold),
+        "is_valid": is_valid,
+    }
+
+
+class FlashingProfile(models.Model):
+    """
+    One unique flashing shape, its nodes and crush folds, stored once and
+    referenced by every flashing, template and order snapshot drawn with it.
+    Profiles never change, the derived geometry and validity are computed
+    on creation.
+    """
+
+    digest = models.CharField(max_length=64, unique=True, editable=False)
+
+    nodes = NodesField(validators=[validate_nodes])
+    start_crush_fold = models.BooleanField(default=False)
+    end_crush_fold = models.BooleanField(default=False)
+
+    girth = models.FloatField(null=True, editable=False)
+    fold_count = models.IntegerField(default=0, editable=False)
+    crush_count = models.PositiveSmallIntegerField(default=0, editable=False)
+    is_valid = models.BooleanField(default=False, editable=False)
+
+    DERIVED_FIELDS = ("girth", "fold_count", "crush_count", "is_valid")
+
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    @classmethod
+    def for_shape(cls, nodes, start_crush_fold=False, end_crush_fold=False):
+        """The profile of a shape, created the first time it's seen."""
+        if not nodes:
+            return None
+
+        digest = profile_digest(nodes, start_crush_fold, end_crush_fold)
+        profile = cls.objects.filter(digest=digest).first()
+        if profile is None:
+            profile = cls(
+                digest=digest,
+                nodes=nodes,
+                start_crush_fold=start_crush_fold,
+                end_crush_fold=end_crush_fold,
+            )
+            profile.refresh_derived()
+
+            # Another request may be creating the same shape
+            cls.objects.bulk_create([profile], ignore_conflicts=True)
+            profile = cls.objects.get(digest=digest)
+
+        return profile
+
+    def refresh_derived(self):
+        derived = shape_geometry(self.nodes, self.start_crush_fold, self.end_crush_fold)
+        for name, value in derived.items():
+            setattr(self, name, value)
+
+    def __str__(self):
+        return f"Profile {self.digest[:12]} ({len(self.nodes)} nodes)"
+
+
+class ProfiledShape(models.Model):
+    """
+    Base of the models drawn with a flashing shape.
+
+    `nodes` is read from the shared profile. Assigning it (or changing the
+    crush folds) only takes effect on save, which looks the new shape's
+    profile up. Until then the assigned nodes are what `nodes` returns and
+    the geometry reads None, so they are measured like a draft.
+    """
+
+    profile = models.ForeignKey(
+        FlashingProfile,
+        on_delete=models.PROTECT,
+        null=True,
+        editable=False,
+        related_name="%(class)ss",
+    )
+
+    class Meta:
+        abstract = True
+
+    @property
+    def nodes(self):
+        if "_nodes" in self.__dict__:
+            return self._nodes
+        if self.profile_id is None:
+            return None
+        return self.profile.nodes
+
+    @nodes.setter
+    def nodes(self, value):
+        self._nodes = value
+
+    @property
+    def girth(self):
+        if "_nodes" in self.__dict__ or self.profile_id is None:
+            return None
+        return self.profile.girth
+
+    @property
+    def fold_count(self):
+        if "_nodes" in self.__dict__ or self.profile_id is None:
+            return len(self.nodes) - 2 if self.nodes else 0
+        return self.profile.fold_count
+
+    @property
+    def crush_count(self):
+        return int(self.start_crush_fold) + int(self.end_crush_fold)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_crush_folds = instance._crush_folds()
+        return instance
+
+    def _crush_folds(self):
+        # Read through __dict__ so deferred fields aren't loaded just for this
+        return (self.__dict__.get("start_crush_fold"), self.__dict__.get("end_crush_fold"))
+
+    def _resolve_profile(self):
+        """Points at the profile of the current shape, True when it changed."""
+        crush_folds = self._crush_folds()
+
+        if "_nodes" not in self.__dict__:
+            if self.profile_id is None:
+                return False
+            if crush_folds == getattr(self, "_loaded_crush_folds", None):
+                return False
+            profile = self.profile
+            if (profile.start_crush_fold, profile.end_crush_fold) == crush_folds:
+                return False
+
+        profile = FlashingProfile.for_shape(self.nodes, *crush_folds)
+        self.__dict__.pop("_nodes", None)
+
+        if profile is None and self.profile_id is None:
+            return False
+        if profile is not None and profile.pk == self.profile_id:
+            return False
+        self.profile = profile
+        return True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if self._resolve_profile() and update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {"profile"}
+
+        super().save(*args, **kwargs)
+        self._loaded_crush_folds = self._crush_folds()
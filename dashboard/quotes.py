@@ -0,0 +1,107 @@
+from typing import NamedTuple
+
+from .pricing import price_flashings
+
+
+class PriceGroup(NamedTuple):
+    """The price columns of a MaterialGroup, without the model."""
+
+    base_price: object
+    price_per_fold: object
+    price_per_100girth: object
+    price_per_crush_fold: object
+    sample_weight: object
+    sample_weight_sq_meter: object
+
+    @classmethod
+    def of(cls, group):
+        return cls(*(getattr(group, field) for field in cls._fields))
+
+
+class DraftMaterial(NamedTuple):
+    group: PriceGroup
+
+
+class DraftSpecification(NamedTuple):
+    id: int
+    length: float
+    quantity: int
+
+
+class DraftSpecifications(list):
+    def all(self):
+        return self
+
+
+class FlashingDraft:
+    """
+    An unsaved flashing with what price_flashings reads of a StoredFlashing.
+    """
+
+    girth = None
+
+    def __init__(self, id, material, nodes, start_crush_fold, end_crush_fold, specifications):
+        self.id = id
+        self.material = material
+        self.nodes = nodes
+        self.start_crush_fold = start_crush_fold
+        self.end_crush_fold = end_crush_fold
+        self.specifications = specifications
+
+
+def quote_flashings(drafts, variants):
+    """
+    Prices flashing drafts without saving anything.
+
+    `drafts` are validated QuoteSerializer items, `variants` the material
+    variants they use by id (with their group). Returns the girth, cost and
+    weight of every draft and of each of its specifications, plus totals.
+    """
+    groups = {pk: DraftMaterial(PriceGroup.of(v.group)) for pk, v in variants.items()}
+
+    flashings = []
+    spec_id = 0
+    for i, draft in enumerate(drafts):
+        specifications = DraftSpecifications()
+        for spec in draft["specifications"]:
+            specifications.append(DraftSpecification(spec_id, spec["length"], spec["quantity"]))
+            spec_id += 1
+
+        flashings.append(
+            FlashingDraft(
+                id=i,
+                material=groups[draft["material"]],
+                nodes=draft["nodes"],
+                start_crush_fold=draft["start_crush_fold"],
+                end_crush_fold=draft["end_crush_fold"],
+                specifications=specifications,
+            )
+        )
+
+    # Vectorised over the whole batch, fast enough in the request itself
+    prices = price_flashings(flashings)
+
+    quoted = []
+    for flashing in flashings:
+        price = prices[flashing.id]
+        quoted.append(
+            {
+                "girth": price["girth"],
+                "cost": price["cost"],
+                "weight": price["weight"],
+                "specifications": [
+                    {
+                        "length": spec.length,
+                        "quantity": spec.quantity,
+                        **price["specs"][spec.id],
+                    }
+                    for spec in flashing.specifications
+                ],
+            }
+        )
+
+    return {
+        "flashings": quoted,
+        "total_cost": sum(prices[f.id]["cost_cents"] for f in flashings) / 100,
+        "total_weight": round(sum(q["weight"] for q in quoted), 2),
+    }
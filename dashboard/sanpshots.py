@@ -3,7 +3,9 @@ from django.utils import timezone
 from django.utils.functional import cached_property
 import uuid
 
-from .utils import validate_nodes, generate_six_digit_id, AustraliaStateChoices
+from .utils import AustraliaStateChoices
+from .profiles import ProfiledShape
+from .ids import allocate_id
 from .models import Order
 
 
@@ -68,7 +70,7 @@ class MaterialSnapshot(models.Model):
         return f"Material snapshot {self.id} for Flashing snapshot {self.flashing.id}"
 
 
-class StoredFlashingSnapshot(models.Model):
+class StoredFlashingSnapshot(ProfiledShape):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="flashings")
     
     code = models.CharField(max_length=50, editable=False)
@@ -79,8 +81,6 @@ class StoredFlashingSnapshot(models.Model):
     color_side_dir = models.BooleanField()
     tapered = models.BooleanField()
 
-    nodes = models.JSONField(validators=[validate_nodes])
-
     total_girth = models.FloatField()
 
     @cached_property
@@ -217,9 +217,7 @@ class DeliveryInfoSnapshot(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.id:
-            self.id = generate_six_digit_id()
-            while Order.objects.filter(id=self.id).exists():
-                self.id = generate_six_digit_id()
+            self.id = allocate_id(type(self))
 
         else:
             raise ValueError(
@@ -242,11 +240,9 @@ class DriverInfoSnapshot(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.id:
-            self.id = generate_six_digit_id()
-            while Order.objects.filter(id=self.id).exists():
-                self.id = generate_six_digit_id()
+            self.id = allocate_id(type(self))
 
-        if self.id:
+        else:
             raise ValueError(
                 "DriverInfoSnapshot is immutable and cannot be updated once created."
             )
@@ -284,8 +280,6 @@ class PickupInfoSnapshot(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.id:
-            self.id = generate_six_digit_id()
-            while Order.objects.filter(id=self.id).exists():
-                self.id = generate_six_digit_id()
+            self.id = allocate_id(type(self))
 
         super().save(*args, **kwargs)
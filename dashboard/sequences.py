@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class IdSequence(models.Model):
+    """Counter behind the public IDs of one model, see ids.allocate_id."""
+
+    # app_label.model_name of the model the IDs are for
+    name = models.CharField(max_length=100, unique=True)
+    next_value = models.PositiveBigIntegerField(default=0)
+
+    # The table already held random IDs when the sequence started, blocks
+    # are checked against it
+    legacy = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator, ValidationError
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import models
 
 from .models import (
     StoredFlashing,
@@ -10,9 +12,14 @@ from .models import (
     Order,
     Cart,
     Template,
+    deferred_completeness,
 )
 from .drafts import JobReferenceDraft
 from .sanpshots import StoredFlashingSnapshot
+from .pricing import price_flashings, with_pricing_relations
+from .utils import validate_nodes
+from factory.catalog import catalog_groups
+from factory.serializers import CatalogListSerializer
 from factory.models import (
     Factory,
     Staff,
@@ -54,7 +61,7 @@ class FactorySerializer(serializers.ModelSerializer):
             "name",
             "email",
             "phone",
-            "address",
+            "full_address",
             "description",
             "working_hours_start",
             "working_hours_end",
@@ -64,14 +71,54 @@ class FactorySerializer(serializers.ModelSerializer):
 
 
 class SpecificationSerializer(serializers.ModelSerializer):
+    cost = serializers.SerializerMethodField()
+    weight = serializers.SerializerMethodField()
+
     class Meta:
         model = Specification
         fields = ["quantity", "length", "cost", "weight"]
 
+    def _price(self, obj):
+        # Outside a priced list the flashing is priced once for all its specs
+        prices = self.context.setdefault("flashing_prices", {})
+        if obj.flashing_id not in prices and obj.pk is not None:
+            prices.update(price_flashings([obj.flashing]))
+        return prices.get(obj.flashing_id, {}).get("specs", {}).get(obj.id)
+
+    def get_cost(self, obj):
+        price = self._price(obj)
+        return price["cost"] if price else None
+
+    def get_weight(self, obj):
+        price = self._price(obj)
+        return price["weight"] if price else None
+
+
+class PricedFlashingListSerializer(serializers.ListSerializer):
+    """
+    Prices every flashing of the list in one batch before serializing them,
+    the results are shared with the children through the context.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        if isinstance(iterable, models.QuerySet):
+            iterable = with_pricing_relations(iterable)
+
+        flashings = list(iterable)
+        prices = self.context.setdefault("flashing_prices", {})
+        prices.update(price_flashings(f for f in flashings if f.id not in prices))
+
+        return super().to_representation(flashings)
+
 
 class StoredFlashingSerializer(serializers.ModelSerializer):
     material_data = serializers.SerializerMethodField()
     specifications = SpecificationSerializer(many=True, required=True)
+    nodes = serializers.JSONField(validators=[validate_nodes])
+    total_girth = serializers.SerializerMethodField()
+    total_weight = serializers.SerializerMethodField()
+    total_cost = serializers.SerializerMethodField()
 
     class Meta:
         model = StoredFlashing
@@ -92,6 +139,22 @@ class StoredFlashingSerializer(serializers.ModelSerializer):
             "is_complete",
         ]
         read_only_fields = ["id"]
+        list_serializer_class = PricedFlashingListSerializer
+
+    def _price(self, obj):
+        prices = self.context.setdefault("flashing_prices", {})
+        if obj.id not in prices:
+            prices.update(price_flashings([obj]))
+        return prices[obj.id]
+
+    def get_total_girth(self, obj):
+        return self._price(obj)["girth"]
+
+    def get_total_weight(self, obj):
+        return self._price(obj)["weight"]
+
+    def get_total_cost(self, obj):
+        return self._price(obj)["cost"]
 
     def get_material_data(self, obj):
         m = obj.material
@@ -119,8 +182,11 @@ class StoredFlashingSerializer(serializers.ModelSerializer):
         stored_flashing = super().create(validated_data)
 
         if specs_data is not None:
-            for spec in specs_data:
-                Specification.objects.create(flashing=stored_flashing, **spec)
+            Specification.objects.bulk_create(
+                [Specification(flashing=stored_flashing, **spec) for spec in specs_data]
+            )
+            # bulk_create sends no signals
+            stored_flashing.update_is_complete()
 
         self._add_to_cart_if_complete(stored_flashing)
 
@@ -132,14 +198,58 @@ class StoredFlashingSerializer(serializers.ModelSerializer):
         instance = super().update(instance, validated_data)
 
         if specs_data is not None:
-            instance.specifications.all().delete()
+            # Refreshed once below instead of for every deleted row
+            with deferred_completeness():
+                Specification.objects.filter(flashing=instance).delete()
 
-            for spec in specs_data:
-                Specification.objects.create(flashing=instance, **spec)
+            Specification.objects.bulk_create(
+                [Specification(flashing=instance, **spec) for spec in specs_data]
+            )
+            instance.update_is_complete()
 
         return instance
 
 
+class QuoteSpecificationSerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=1)
+    length = serializers.FloatField(min_value=0)
+
+
+class QuoteFlashingSerializer(serializers.Serializer):
+    material = serializers.IntegerField()
+    nodes = serializers.JSONField(validators=[validate_nodes])
+    start_crush_fold = serializers.BooleanField(default=False)
+    end_crush_fold = serializers.BooleanField(default=False)
+    specifications = QuoteSpecificationSerializer(many=True)
+
+
+class QuoteSerializer(serializers.Serializer):
+    """A batch of flashing drafts to price, nothing is saved."""
+
+    flashings = QuoteFlashingSerializer(many=True, allow_empty=False)
+
+    def validate_flashings(self, flashings):
+        max_flashings = getattr(settings, "QUOTE_MAX_FLASHINGS", 10000)
+        if len(flashings) > max_flashings:
+            raise ValidationError(f"At most {max_flashings} flashings can be quoted at once.")
+
+        # Every variant of the batch in one query, only the user's factory
+        # prices can be quoted
+        ids = {f["material"] for f in flashings}
+        user = self.context["request"].user
+        self.variants = (
+            MaterialVariant.objects.select_related("group")
+            .filter(group__material__factory_id=user.factory_id)
+            .in_bulk(ids)
+        )
+
+        missing = sorted(ids - set(self.variants))
+        if missing:
+            raise ValidationError(f"Unknown material variants: {missing}")
+
+        return flashings
+
+
 class StoredFlashingSnapshotSerializer(serializers.ModelSerializer):
     material = serializers.SerializerMethodField()
     specifications = serializers.SerializerMethodField()
@@ -185,11 +295,19 @@ class MaterialVariantSerializer(serializers.ModelSerializer):
 
 
 class MaterialSerializer(serializers.ModelSerializer):
-    variants = MaterialVariantSerializer(many=True, read_only=True)
+    variants_count = serializers.SerializerMethodField()
+    variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Material
         fields = ["id", "name", "variant_type", "variants_count", "variants"]
+        list_serializer_class = CatalogListSerializer
+
+    def get_variants_count(self, obj):
+        return sum(len(g["variants"]) for g in catalog_groups(self.context, obj))
+
+    def get_variants(self, obj):
+        return [v for g in catalog_groups(self.context, obj) for v in g["variants"]]
 
 
 class AddressSerializer(serializers.ModelSerializer):
@@ -397,14 +515,17 @@ class OrderSerializer(serializers.ModelSerializer):
 
 
 class TemplateSerializer(serializers.ModelSerializer):
+    nodes = serializers.JSONField(validators=[validate_nodes])
+
     class Meta:
         model = Template
-        fields = "__all__"
+        exclude = ["profile"]
 
 
 class CartSerializer(serializers.ModelSerializer):
 
     flashings = StoredFlashingSerializer(
+        source="pricing.flashings",
         many=True,
         required=True,
     )
@@ -426,3 +547,8 @@ class CartSerializer(serializers.ModelSerializer):
             "delivery_date",
             "total_amount",
         ]
+
+    def to_representation(self, instance):
+        # The cart is already priced, let the nested flashings reuse it
+        self.context.setdefault("flashing_prices", {}).update(instance.pricing.prices)
+        return super().to_representation(instance)
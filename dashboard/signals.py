@@ -1,12 +1,43 @@
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from django_q.tasks import async_task
-from .models import Cart
+from .models import Cart, Address, StoredFlashing, Specification, completeness_deferred
+from .ledger import CapacityReservation
+from .tasks import enqueue_address_distance
+from . import capacity
 
 User = get_user_model()
 
 @receiver(post_save, sender=User)
 def create_cart_for_user(sender, instance, created, **kwargs):
     if created:
-        Cart.objects.create(client=instance)
\ No newline at end of file
+        Cart.objects.create(client=instance)
+
+
+@receiver(post_save, sender=Address)
+def compute_distance_for_address(sender, instance, created, **kwargs):
+    # Without an ORS key (offline, load tests) the postcode estimate is kept
+    if not settings.ORS_API_KEY:
+        return
+
+    # Queue after commit so the worker can always see the new row
+    if created:
+        transaction.on_commit(lambda: enqueue_address_distance(instance.pk))
+
+
+@receiver(post_delete, sender=CapacityReservation)
+def release_order_capacity(sender, instance, **kwargs):
+    if capacity.releases_suspended():
+        return
+    # Also runs when the order itself is deleted (cascade)
+    capacity.release(instance)
+
+
+@receiver([post_save, post_delete], sender=Specification)
+def refresh_flashing_completeness(sender, instance, **kwargs):
+    if completeness_deferred():
+        return
+    # A flashing is only complete with at least one specification
+    StoredFlashing.refresh_completeness([instance.flashing_id])
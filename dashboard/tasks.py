@@ -1,20 +1,70 @@
-import threading
-from .utils import geocode_text, driving_distance_km
-
-def geocode_async(address):
-    factory_address = address.job_reference.client.factory.full_address
-    # lon, lat = geocode_text(address.full_address)
-    distance = driving_distance_km(factory_address, address.full_address)
-
-    # print(f"Address: {address.full_address}\nFactory address: {factory_address}\nDistance to factory: {distance} km")
-
-    # address.latitude = lat
-    # address.longitude = lon
-    address.distance_to_factory = distance
-    address.save(update_fields=["distance_to_factory"])
-
-def trigger_async_geocode_distance(instance):
-    t = threading.Thread(target=geocode_async, args=[instance])
-    t.daemon = True
-    print("Address lat/lon thread started\n")
-    t.start()
\ No newline at end of file
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django_q.models import Schedule
+from django_q.tasks import async_task, schedule
+
+from .geocoding import driving_distance_km
+
+DISTANCE_TASK = "dashboard.tasks.compute_address_distance"
+
+MAX_ATTEMPTS = getattr(settings, "ADDRESS_DISTANCE_MAX_ATTEMPTS", 5)
+RETRY_BASE_DELAY = getattr(settings, "ADDRESS_DISTANCE_RETRY_DELAY", 30)
+
+
+def enqueue_address_distance(address_id):
+    """Queue the distance computation of an address on the django-q broker."""
+    return async_task(DISTANCE_TASK, address_id, 1, group="address-distance")
+
+
+def compute_address_distance(address_id, attempt=1):
+    """
+    Fills Address.distance_to_factory from the (cached) ORS route.
+
+    Idempotent: an address that is gone or already has an exact distance is
+    left alone, so duplicated or replayed jobs are harmless, as is one of a
+    client without a factory to measure from. An offline
+    postcode estimate is replaced by the exact route distance. Failures are
+    retried with an exponential backoff up to MAX_ATTEMPTS, after that the
+    error is raised and recorded as a failed task.
+    """
+    from .models import Address
+
+    address = (
+        Address.objects.select_related("job_reference__client__factory")
+        .filter(pk=address_id)
+        .first()
+    )
+    if address is None:
+        return None
+    if address.distance_to_factory and not address.distance_is_estimate:
+        return None
+
+    factory = address.job_reference.client.factory
+    if factory is None:
+        return None
+
+    try:
+        distance = driving_distance_km(factory.full_address, address.full_address)
+    except Exception:
+        if attempt >= MAX_ATTEMPTS:
+            raise
+
+        delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+        schedule(
+            DISTANCE_TASK,
+            address_id,
+            attempt + 1,
+            schedule_type=Schedule.ONCE,
+            repeats=1,
+            next_run=timezone.now() + timedelta(seconds=delay),
+        )
+        return None
+
+    # Only fill an empty or estimated distance, a concurrent run may have been first
+    Address.objects.filter(
+        Q(distance_to_factory=0) | Q(distance_is_estimate=True), pk=address_id
+    ).update(distance_to_factory=distance, distance_is_estimate=False)
+    return distance
@@ -1,3 +1,1103 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, connection, connections
+from django.db.models import ProtectedError
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from yar_ff_django import db, routers
+from factory.models import Material, MaterialGroup, MaterialVariant
+from factory.tests import make_factory, make_delivery_method
+from . import capacity, fields, geocoding, ids, ors, postcodes, tasks, utils
+from .caches import GeocodeCache
+from .geodata import FactoryPostcodeDistance, PostcodeCentroid
+from .ledger import CapacityReservation, FactoryDayLoad, FactoryLoad
+from .nodepack import PackedNodes, is_packed
+from .profiles import FlashingProfile
+from .checkout import OrderSnapshotBuilder
+from .models import (
+    Address,
+    Cart,
+    JobReference,
+    Order,
+    Specification,
+    StoredFlashing,
+    Template,
+)
+from .sanpshots import StoredFlashingSnapshot
+from .pricing import (
+    from_cents,
+    price_flashings,
+    price_kernel,
+    to_cents,
+    to_length_units,
+    with_pricing_relations,
+)
+
+User = get_user_model()
+
+
+def make_nodes(*points):
+    """A chain of nodes through `points`, listed in order."""
+    ids = [f"n{i}" for i in range(len(points))]
+    return [
+        {
+            "node_id": ids[i],
+            "left": left,
+            "top": top,
+            "prev_node_id": ids[i - 1] if i else None,
+            "next_node_id": ids[i + 1] if i < len(points) - 1 else None,
+        }
+        for i, (left, top) in enumerate(points)
+    ]
+
+
+def make_variant(factory, name="Steel", **prices):
+    material = Material.objects.create(name=name, factory=factory, variant_type="thickness")
+    group = MaterialGroup.objects.create(
+        material=material,
+        base_price=prices.get("base_price", Decimal("10.00")),
+        price_per_fold=prices.get("price_per_fold", Decimal("1.50")),
+        price_per_100girth=prices.get("price_per_100girth", Decimal("2.25")),
+        price_per_crush_fold=prices.get("price_per_crush_fold", Decimal("0.75")),
+        sample_weight=Decimal("7.85"),
+    )
+    return MaterialVariant.objects.create(group=group, label="0.55", value="0.55")
+
+
+def make_user(factory, email="client@example.com"):
+    return User.objects.create_user(email=email, password="password", factory=factory)
+
+
+def make_address(user, **kwargs):
+    job_reference = JobReference.objects.create(client=user, code=1, project_name="Job")
+    return Address.objects.create(
+        job_reference=job_reference,
+        title="Site",
+        street_address="2 Side St",
+        suburb="Sydney",
+        state="NSW",
+        postcode=kwargs.pop("postcode", 2000),
+        recipient_name="Recipient",
+        recipient_phone=400000000,
+        **kwargs,
+    )
+
+
+def make_flashing(user, variant, code="A", nodes=None, **kwargs):
+    """A complete flashing with two specifications."""
+    flashing = StoredFlashing.objects.create(
+        client=user,
+        material=variant,
+        code=code,
+        nodes=make_nodes((0, 0), (100, 0), (100, 50)) if nodes is None else nodes,
+        **kwargs,
+    )
+    Specification.objects.create(flashing=flashing, quantity=2, length=2400)
+    Specification.objects.create(flashing=flashing, quantity=1, length=1200)
+    return flashing
+
+
+class QuoteTests(TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+        self.variant = make_variant(self.factory)
+        self.client = APIClient()
+        self.client.force_authenticate(make_user(self.factory))
+
+    def quote(self, variant, nodes=None):
+        flashing = {
+            "material": variant.pk,
+            "nodes": nodes or make_nodes((0, 0), (100, 0)),
+            "specifications": [{"quantity": 1, "length": 1000}],
+        }
+        return self.client.post("/api/d/quote/", {"flashings": [flashing]}, format="json")
+
+    def test_quotes_own_factory_variants(self):
+        response = self.quote(self.variant)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["flashings"]), 1)
+
+    def test_rejects_other_factory_variants(self):
+        other = make_variant(make_factory(name="Other"), name="Other steel")
+
+        response = self.quote(other)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Unknown material variants", str(response.data))
+
+    def test_rejects_non_numeric_coordinates(self):
+        nodes = make_nodes((0, 0), ("abc", 0))
+
+        response = self.quote(self.variant, nodes)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("left for node 'n1' must be a number", str(response.data))
+
+
+class CapacityLedgerTests(TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+        self.user = make_user(self.factory)
+        self.date = datetime.date(2030, 1, 7)
+
+    def book(self):
+        order = Order.objects.create(client=self.user)
+        capacity.reserve(order, self.factory, self.date, flashings=3, weight_kg=12.5)
+        return order
+
+    def loads(self):
+        day = FactoryDayLoad.objects.get(factory=self.factory, date=self.date)
+        load = FactoryLoad.objects.get(factory=self.factory)
+        return day.orders, day.flashings, day.weight_kg, load.active_orders
+
+    def test_reserve_books_the_day_and_the_factory(self):
+        self.book()
+        self.book()
+        self.assertEqual(self.loads(), (2, 6, 25.0, 2))
+
+    def test_cancelling_a_new_order_releases_it(self):
+        order = self.book()
+
+        order.status = Order.OrderStatus.CANCELLED
+        order.save()
+        self.assertEqual(self.loads(), (0, 0, 0.0, 0))
+
+    def test_completed_order_keeps_its_day(self):
+        order = Order.objects.get(pk=self.book().pk)
+
+        order.status = Order.OrderStatus.COMPLETE
+        order.save()
+        self.assertEqual(self.loads(), (1, 3, 12.5, 0))
+
+    def test_deleting_the_order_releases_it(self):
+        self.book().delete()
+        self.assertEqual(self.loads(), (0, 0, 0.0, 0))
+
+    def test_suspended_releases_keep_the_counters(self):
+        self.book()
+        with capacity.suspended_releases():
+            CapacityReservation.objects.all().delete()
+        self.assertEqual(self.loads(), (1, 3, 12.5, 1))
+
+
+class AvailableDatesTests(TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+        make_delivery_method(self.factory)
+        self.user = make_user(self.factory)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.address = make_address(self.user, distance_to_factory=150)
+
+    def available_dates(self, **params):
+        response = self.client.get("/api/d/cart/available-dates/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.data["dates"]
+
+    def test_dates_for_an_address_are_accepted_by_update(self):
+        first = self.available_dates(address_id=self.address.pk)[0]
+        self.assertGreater(first, self.available_dates()[0])
+
+        response = self.client.post(
+            "/api/d/cart/update/",
+            {
+                "address_id": self.address.pk,
+                "delivery_date": first.isoformat(),
+                "delivery_type": "delivery",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_address(self):
+        response = self.client.get("/api/d/cart/available-dates/", {"address_id": 0})
+        self.assertEqual(response.status_code, 404)
+
+
+class CentPricingTests(TestCase):
+    def test_to_cents_rounds_half_up(self):
+        self.assertEqual(to_cents("0.125"), 13)
+        self.assertEqual(to_cents("0.124"), 12)
+        # 2.675 is 2.67499999... as a float, rounded from its decimal text
+        self.assertEqual(to_cents(2.675), 268)
+        self.assertEqual(to_cents(Decimal("10")), 1000)
+
+    def test_from_cents(self):
+        self.assertEqual(from_cents(54507), Decimal("545.07"))
+        self.assertEqual(from_cents(5), Decimal("0.05"))
+
+    def test_kernel_rounds_spec_costs_half_up(self):
+        one = np.array([1], dtype=np.int64)
+        costs, _ = price_kernel(
+            girth=np.array([100.0]),
+            folds=np.array([0], dtype=np.int64),
+            crushes=np.array([0], dtype=np.int64),
+            has_nodes=np.array([True]),
+            # 10.01 per metre
+            prices=np.array([[1001, 0, 0, 0]], dtype=np.int64),
+            sample=np.array([0.0]),
+            owners=np.array([0, 0], dtype=np.int64),
+            # 0.5 m is 500.5 cents, 0.4995 m is 499.9995 cents
+            lengths=np.array([to_length_units(500), to_length_units(499.5)], dtype=np.int64),
+            quantities=np.array([1, 1], dtype=np.int64),
+        )
+        self.assertEqual(costs.tolist(), [501, 500])
+
+    def test_specification_cost(self):
+        factory = make_factory()
+        flashing = StoredFlashing.objects.create(
+            client=make_user(factory),
+            material=make_variant(factory),
+            code="A",
+            nodes=make_nodes((0, 0), (100, 0)),
+        )
+        spec = Specification(flashing=flashing, quantity=2, length=1000)
+        self.assertIsNone(spec.cost)
+        self.assertIsNone(spec.weight)
+
+        spec.save()
+        # (10.00 base + 2.25 per 100 mm of girth) per metre, 2 x 1 m
+        self.assertEqual(spec.cost, 24.5)
+
+
+class BatchPricingTests(TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+        self.user = make_user(self.factory)
+        self.variant = make_variant(self.factory)
+
+    def price_all(self):
+        return price_flashings(with_pricing_relations(StoredFlashing.objects.order_by("pk")))
+
+    def test_prices_flashings_and_specifications(self):
+        flashing = make_flashing(self.user, self.variant, start_crush_fold=True)
+        long_spec, short_spec = flashing.specifications.order_by("-length")
+
+        price = self.price_all()[flashing.pk]
+        # 150 mm girth is 2 started 100s: 10.00 + 1.50 fold + 2 x 2.25 + 0.75 crush
+        # = 16.75 per metre, 2 x 2.4 m and 1 x 1.2 m
+        self.assertEqual(price["girth"], 150)
+        self.assertEqual(price["specs"][long_spec.pk]["cost_cents"], 8040)
+        self.assertEqual(price["specs"][short_spec.pk]["cost_cents"], 2010)
+        self.assertEqual(price["cost"], 100.5)
+        # 7.85 kg/m2 x 0.15 m x 4.8 m and x 1.2 m
+        self.assertEqual(price["specs"][long_spec.pk]["weight"], 5.65)
+        self.assertEqual(price["weight"], 7.06)
+
+    def test_flashing_without_nodes_costs_nothing(self):
+        flashing = make_flashing(self.user, self.variant, nodes=[])
+        make_flashing(self.user, self.variant, code="B")
+
+        price = self.price_all()[flashing.pk]
+        self.assertIsNone(price["girth"])
+        self.assertEqual(price["cost_cents"], 0)
+
+    def test_query_count_doesnt_grow_with_the_flashings(self):
+        for total in (1, 5):
+            while StoredFlashing.objects.count() < total:
+                make_flashing(self.user, self.variant, code=f"C{StoredFlashing.objects.count()}")
+            with self.assertNumQueries(2):
+                self.assertEqual(len(self.price_all()), total)
+
+
+class FlashingGeometryTests(TestCase):
+    def setUp(self):
+        factory = make_factory()
+        self.flashing = make_flashing(make_user(factory), make_variant(factory))
+
+    def test_geometry_is_read_without_walking_the_nodes(self):
+        flashing = StoredFlashing.objects.select_related("profile").get(pk=self.flashing.pk)
+
+        with self.assertNumQueries(0), mock.patch("dashboard.models.calculate_total_girth") as walk:
+            self.assertEqual((flashing.girth, flashing.fold_count), (150, 1))
+            self.assertEqual(flashing.total_girth, 150)
+        walk.assert_not_called()
+
+    def test_new_nodes_are_measured_on_save(self):
+        self.flashing.nodes = make_nodes((0, 0), (300, 0))
+        # Unsaved nodes are measured like a draft
+        self.assertIsNone(self.flashing.girth)
+        self.assertEqual(self.flashing.total_girth, 300)
+
+        self.flashing.save()
+        flashing = StoredFlashing.objects.get(pk=self.flashing.pk)
+        self.assertEqual((flashing.girth, flashing.fold_count), (300, 0))
+
+    def test_crush_count(self):
+        self.flashing.start_crush_fold = True
+        self.flashing.end_crush_fold = True
+        self.flashing.save()
+
+        self.assertEqual(StoredFlashing.objects.get(pk=self.flashing.pk).crush_count, 2)
+
+
+class CartPricingTests(TestCase):
+    def setUp(self):
+        factory = make_factory()
+        self.user = make_user(factory)
+        self.variant = make_variant(factory)
+        for code in ("A", "B"):
+            self.user.cart.flashings.add(make_flashing(self.user, self.variant, code=code))
+
+    def get_cart(self):
+        return Cart.objects.select_related("client__factory").get(client=self.user)
+
+    def test_totals(self):
+        cart = self.get_cart()
+        # 16.00 per metre, 2 x 2.4 m and 1 x 1.2 m a flashing, then 10% GST
+        self.assertEqual(cart.flashings_cost, 192.0)
+        self.assertEqual(cart.total_amount_cents, 21120)
+        self.assertEqual(cart.total_delivery_weight, 14.12)
+
+    def test_cart_is_priced_once(self):
+        cart = self.get_cart()
+        cart.pricing
+
+        with self.assertNumQueries(0):
+            cart.flashings_cost
+            cart.total_amount
+            cart.total_delivery_weight
+            cart.gst_ratio
+            cart.is_complete
+
+    def test_save_prices_the_cart_again(self):
+        cart = self.get_cart()
+        self.assertEqual(cart.flashings_cost, 192.0)
+
+        cart.flashings.add(make_flashing(self.user, self.variant, code="C"))
+        cart.save()
+        self.assertEqual(cart.flashings_cost, 288.0)
+
+
+class StoredFlashingUpdateTests(TestCase):
+    def setUp(self):
+        factory = make_factory()
+        self.user = make_user(factory)
+        self.flashing = StoredFlashing.objects.create(
+            client=self.user,
+            material=make_variant(factory),
+            code="A",
+            nodes=make_nodes((0, 0), (100, 0)),
+        )
+        Specification.objects.bulk_create(
+            [Specification(flashing=self.flashing, quantity=1, length=1000) for _ in range(5)]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_replacing_specifications_refreshes_completeness_once(self):
+        url = f"/api/d/flashing/{self.flashing.pk}/"
+        specs = [{"quantity": 2, "length": 500}, {"quantity": 1, "length": 800}]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {"specifications": specs}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        completeness_updates = [
+            q["sql"] for q in queries
+            if q["sql"].startswith('UPDATE "dashboard_storedflashing" SET "is_complete"')
+        ]
+        self.assertEqual(len(completeness_updates), 1)
+        self.assertEqual(self.flashing.specifications.count(), 2)
+        self.flashing.refresh_from_db()
+        self.assertTrue(self.flashing.is_complete)
+
+    def test_deleting_specifications_refreshes_completeness(self):
+        self.flashing.update_is_complete()
+        for spec in self.flashing.specifications.all():
+            spec.delete()
+
+        self.flashing.refresh_from_db()
+        self.assertFalse(self.flashing.is_complete)
+
+
+class ListQueryCountTests(TestCase):
+    """The list endpoints take the same number of queries however long the list is."""
+
+    def setUp(self):
+        self.factory = make_factory()
+        self.variant = make_variant(self.factory)
+        make_delivery_method(self.factory)
+        self.user = make_user(self.factory)
+        self.address = make_address(self.user, distance_to_factory=50)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_flashings(self, count):
+        cart = self.user.cart
+        start = cart.flashings.count()
+        for i in range(start, start + count):
+            cart.flashings.add(make_flashing(self.user, self.variant, code=f"C{i}"))
+
+    def place_order(self):
+        cart = Cart.objects.get(client=self.user)
+        cart.delivery_type = "delivery"
+        cart.delivery_date = datetime.date(2030, 1, 7)
+        cart.address = self.address
+        number = self.user.orders.count()
+        session = SimpleNamespace(id=f"cs_{number}")
+        payment_intent = SimpleNamespace(id=f"pi_{number}", amount=cart.total_amount_cents)
+        OrderSnapshotBuilder(cart, session, payment_intent).build()
+
+    def get(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_flashing_list(self):
+        for total in (2, 6):
+            self.add_flashings(total - self.user.flashings.count())
+            self.assertEqual(self.get("/api/d/flashing/", 3)["count"], total)
+
+    def test_order_list(self):
+        for total in (1, 3):
+            while self.user.orders.count() < total:
+                self.add_flashings(2)
+                self.place_order()
+            self.assertEqual(self.get("/api/d/order/", 4)["count"], total)
+
+    def test_cart(self):
+        for total in (2, 6):
+            self.add_flashings(total - self.user.cart.flashings.count())
+            self.assertEqual(len(self.get("/api/d/cart/", 3)["flashings"]), total)
+
+
+class OrderSnapshotBuilderTests(TestCase):
+    def setUp(self):
+        factory = make_factory()
+        make_delivery_method(factory)
+        self.user = make_user(factory)
+        self.variant = make_variant(factory)
+        self.address = make_address(self.user, distance_to_factory=50)
+
+    def build(self, flashings=2):
+        cart = self.user.cart
+        for i in range(flashings):
+            cart.flashings.add(make_flashing(self.user, self.variant, code=f"C{i}"))
+
+        cart = Cart.objects.get(pk=cart.pk)
+        cart.delivery_type = "delivery"
+        cart.delivery_date = datetime.date(2030, 1, 7)
+        cart.address = self.address
+        number = self.user.orders.count()
+        session = SimpleNamespace(id=f"cs_{number}")
+        payment_intent = SimpleNamespace(id=f"pi_{number}", amount=cart.total_amount_cents)
+        return cart, OrderSnapshotBuilder(cart, session, payment_intent)
+
+    def test_snapshots_follow_the_cart(self):
+        cart, builder = self.build()
+        order = builder.build()
+
+        snapshots = order.flashings.order_by("code")
+        self.assertEqual(
+            [(s.code, s.profile_id) for s in snapshots],
+            [(f.code, f.profile_id) for f in cart.flashings.order_by("code")],
+        )
+        spec_costs = [spec.cost for s in snapshots for spec in s.specifications.all()]
+        self.assertEqual(sum(spec_costs), Decimal(str(cart.flashings_cost)))
+        self.assertEqual(order.payment_history.total_amount, from_cents(cart.total_amount_cents))
+        self.assertEqual(order.delivery.date, cart.delivery_date)
+
+    def test_query_count_doesnt_grow_with_the_flashings(self):
+        # The first order also seeds the id sequences
+        self.build()[1].build()
+
+        counts = []
+        for flashings in (1, 4):
+            cart, builder = self.build(flashings)
+            with CaptureQueriesContext(connection) as queries:
+                builder.build()
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_failure_leaves_no_partial_order(self):
+        cart, builder = self.build()
+
+        with mock.patch.object(capacity, "reserve", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                builder.build()
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StoredFlashingSnapshot.objects.exists())
+
+
+class GeocodingCacheTests(TestCase):
+    @mock.patch.object(utils, "geocode_text", return_value=(151.2, -33.8))
+    def test_geocodes_are_cached_by_normalized_address(self, geocode_text):
+        self.assertEqual(geocoding.geocode("1 Main St, Sydney"), (151.2, -33.8))
+        self.assertEqual(geocoding.geocode("1 main st  sydney"), (151.2, -33.8))
+        geocode_text.assert_called_once()
+
+    @mock.patch.object(utils, "geocode_text", return_value=(151.2, -33.8))
+    def test_expired_geocodes_are_fetched_again(self, geocode_text):
+        geocoding.geocode("1 Main St, Sydney")
+        GeocodeCache.objects.update(
+            created_at=timezone.now() - geocoding.GEOCODE_CACHE_TTL - datetime.timedelta(days=1)
+        )
+
+        geocoding.geocode("1 Main St, Sydney")
+        self.assertEqual(geocode_text.call_count, 2)
+        self.assertEqual(GeocodeCache.objects.count(), 1)
+
+    @mock.patch.object(utils, "route_distance_km", return_value=42)
+    def test_routes_are_cached_by_rounded_points(self, route_distance_km):
+        start, end = (151.2, -33.8), (150.9, -33.7)
+        self.assertEqual(geocoding.route_distance_km(start, end), 42)
+        self.assertEqual(geocoding.route_distance_km((151.200001, -33.8), end), 42)
+        route_distance_km.assert_called_once()
+
+        # Distances are directed
+        geocoding.route_distance_km(end, start)
+        self.assertEqual(route_distance_km.call_count, 2)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flight = geocoding.SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return "point"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("key", fetch)))
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=lambda: results.append(flight.do("key", fetch)))
+        follower.start()
+        # Let the follower reach the wait before the leader finishes
+        time.sleep(0.05)
+        release.set()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(results, ["point", "point"])
+        self.assertEqual(len(calls), 1)
+
+    def test_a_failed_call_frees_the_key(self):
+        flight = geocoding.SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do("key", mock.Mock(side_effect=ValueError))
+        # The key is free again
+        self.assertEqual(flight.do("key", lambda: 1), 1)
+
+
+class PostcodeEstimateTests(TestCase):
+    def setUp(self):
+        PostcodeCentroid.objects.bulk_create(
+            [
+                PostcodeCentroid(postcode=2000, state="NSW", latitude=-33.8688, longitude=151.2093),
+                PostcodeCentroid(postcode=2300, state="NSW", latitude=-32.9283, longitude=151.7817),
+                PostcodeCentroid(postcode=3000, state="VIC", latitude=-37.8136, longitude=144.9631),
+            ]
+        )
+        self.factory = make_factory()
+
+    def test_haversine(self):
+        # Sydney to Melbourne
+        self.assertAlmostEqual(
+            float(postcodes.haversine_km(-33.8688, 151.2093, -37.8136, 144.9631)), 714, delta=2
+        )
+
+    def test_estimate_adds_the_detour_of_the_state(self):
+        direct = float(postcodes.haversine_km(-33.8688, 151.2093, -32.9283, 151.7817))
+        self.assertEqual(
+            postcodes.estimate_distance_km(self.factory, 2300), math.ceil(direct * 1.25)
+        )
+        self.assertIsNone(postcodes.estimate_distance_km(self.factory, 4000))
+
+    def test_precomputed_table_matches_and_wins(self):
+        expected = {pc: postcodes.estimate_distance_km(self.factory, pc) for pc in (2000, 2300, 3000)}
+
+        self.assertEqual(postcodes.precompute_factory_distances(self.factory), 3)
+        self.assertEqual(
+            dict(FactoryPostcodeDistance.objects.values_list("postcode", "distance_km")), expected
+        )
+
+        FactoryPostcodeDistance.objects.filter(postcode=2300).update(distance_km=99)
+        self.assertEqual(postcodes.estimate_distance_km(self.factory, 2300), 99)
+
+    def test_new_addresses_start_with_the_estimate(self):
+        address = make_address(make_user(self.factory), postcode=2300)
+        self.assertEqual(
+            address.distance_to_factory, postcodes.estimate_distance_km(self.factory, 2300)
+        )
+        self.assertTrue(address.distance_is_estimate)
+
+
+class ORSClientTests(SimpleTestCase):
+    def setUp(self):
+        self.client = ors.ORSClient(api_key="key", timeout=5, pool_size=4)
+        self.addCleanup(self.client.close)
+
+    def respond(self, method, *payloads):
+        response = mock.patch.object(self.client.session, method).start()
+        self.addCleanup(mock.patch.stopall)
+        response.return_value.json.side_effect = payloads
+        return response
+
+    def test_session_is_pooled_and_retries(self):
+        adapter = self.client.session.get_adapter(ors.BASE_URL)
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertIn(429, adapter.max_retries.status_forcelist)
+
+    def test_geocode_has_a_timeout(self):
+        get = self.respond("get", {"features": [{"geometry": {"coordinates": [151.2, -33.8]}}]})
+
+        self.assertEqual(self.client.geocode("2000"), (151.2, -33.8))
+        self.assertEqual(get.call_args.kwargs["timeout"], 5)
+
+    def test_matrix_is_split_into_requests(self):
+        post = self.respond(
+            "post",
+            {"distances": [[1.2, None]]},
+            {"distances": [[3.0, 4.5]]},
+            {"distances": [[10.1]]},
+        )
+
+        with mock.patch.object(ors, "MATRIX_MAX_LOCATIONS", 3):
+            distances = self.client.matrix_distances_km((0, 0), [(i, i) for i in range(1, 6)])
+
+        self.assertEqual(distances, [2, None, 3, 5, 11])
+        self.assertEqual(post.call_count, 3)
+        self.assertEqual(post.call_args.kwargs["json"]["locations"], [[0, 0], [5, 5]])
+
+    def test_async_geocode_many_keeps_failures_in_place(self):
+        def geocode(query):
+            if query == "b":
+                raise ValueError("unknown")
+            return {"a": (1, 1), "c": (3, 3)}[query]
+
+        sync_client = mock.Mock()
+        sync_client.geocode.side_effect = geocode
+
+        results = asyncio.run(ors.AsyncORSClient(sync_client).geocode_many(["a", "b", "c"]))
+        self.assertEqual(results[0], (1, 1))
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], (3, 3))
+
+    def test_get_client_is_shared(self):
+        self.assertIs(ors.get_client(), ors.get_client())
+
+
+class AddressDistanceTaskTests(TestCase):
+    @mock.patch.object(tasks, "driving_distance_km", return_value=42)
+    def test_fills_the_distance(self, driving_distance_km):
+        address = make_address(make_user(make_factory()))
+
+        self.assertEqual(tasks.compute_address_distance(address.pk), 42)
+        address.refresh_from_db()
+        self.assertEqual(address.distance_to_factory, 42)
+
+    @mock.patch.object(tasks, "driving_distance_km")
+    def test_client_without_factory_is_skipped(self, driving_distance_km):
+        address = make_address(make_user(None))
+
+        self.assertIsNone(tasks.compute_address_distance(address.pk))
+        driving_distance_km.assert_not_called()
+
+
+class IdAllocationTests(TestCase):
+    key = ids._key("tests")
+
+    def test_permutation_is_a_bijection_of_the_space(self):
+        space, bits = 1000, 10
+        values = [ids.permute(v, space, bits, self.key) for v in range(space)]
+        self.assertEqual(sorted(values), list(range(space)))
+
+    def test_numeric_ids_are_unique_and_six_digits(self):
+        formatted = [ids.format_id(c, self.key) for c in range(5000)]
+        self.assertEqual(len(set(formatted)), len(formatted))
+        for value in formatted:
+            self.assertTrue(100000 <= int(value) <= 999999)
+
+    def test_alphanumeric_ids_follow_the_numeric_space(self):
+        start = ids.NUMERIC_SPACE
+        formatted = [ids.format_id(c, self.key) for c in range(start, start + 5000)]
+        self.assertEqual(len(set(formatted)), len(formatted))
+        for value in formatted:
+            self.assertEqual(len(value), 6)
+            self.assertTrue(value[0].isalpha())
+            self.assertTrue(all(c in ids.ALPHABET for c in value[1:]))
+
+    def test_exhausted_space_raises(self):
+        with self.assertRaises(RuntimeError):
+            ids.format_id(ids.NUMERIC_SPACE + ids.ALPHANUMERIC_SPACE, self.key)
+
+    def test_allocated_ids_are_unique(self):
+        allocated = [ids.allocate_id(Order) for _ in range(3 * ids.BLOCK_SIZE)]
+        self.assertEqual(len(set(allocated)), len(allocated))
+
+    def test_legacy_ids_are_skipped(self):
+        user = make_user(make_factory())
+        taken = ids.format_id(0, ids._key(Order._meta.label_lower))
+        Order.objects.create(id=taken, client=user)
+
+        allocated = [ids.allocate_id(Order) for _ in range(ids.BLOCK_SIZE)]
+        self.assertNotIn(taken, allocated)
+
+
+class NodesFieldTests(TestCase):
+    def stored_nodes(self, profile):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nodes FROM dashboard_flashingprofile WHERE id = %s", [profile.pk])
+            return bytes(cursor.fetchone()[0])
+
+    def test_nodes_are_stored_as_json_by_default(self):
+        nodes = make_nodes((0, 0), (100, 0))
+        profile = FlashingProfile.for_shape(nodes)
+
+        self.assertFalse(is_packed(self.stored_nodes(profile)))
+        self.assertEqual(FlashingProfile.objects.get(pk=profile.pk).nodes, nodes)
+
+    @mock.patch.object(fields, "PACK_NODES", True)
+    def test_valid_chain_round_trips_packed(self):
+        nodes = make_nodes((0, 0), (50, 30.5), (100, 0))
+        # Listed out of chain order, as the frontend may send them
+        nodes.reverse()
+        profile = FlashingProfile.for_shape(nodes)
+
+        self.assertTrue(is_packed(self.stored_nodes(profile)))
+
+        loaded = FlashingProfile.objects.get(pk=profile.pk).nodes
+        self.assertIsInstance(loaded, PackedNodes)
+        self.assertEqual(loaded, list(reversed(nodes)))
+        self.assertEqual(loaded.girth(), profile.girth)
+
+    @mock.patch.object(fields, "PACK_NODES", True)
+    def test_nodes_the_format_cant_hold_stay_json(self):
+        nodes = make_nodes((0, 0), (100, 0))
+        nodes[0]["color"] = "red"
+        profile = FlashingProfile.for_shape(nodes)
+
+        self.assertFalse(is_packed(self.stored_nodes(profile)))
+        self.assertEqual(FlashingProfile.objects.get(pk=profile.pk).nodes, nodes)
+
+    @mock.patch.object(fields, "PACK_NODES", True)
+    def test_packed_rows_stay_readable_with_packing_off(self):
+        nodes = make_nodes((0, 0), (100, 0))
+        profile = FlashingProfile.for_shape(nodes)
+
+        with mock.patch.object(fields, "PACK_NODES", False):
+            self.assertEqual(FlashingProfile.objects.get(pk=profile.pk).nodes, nodes)
+
+    @mock.patch.object(fields, "PACK_NODES", True)
+    def test_fixtures_hold_nodes_as_json(self):
+        nodes = make_nodes((0, 0), (100, 0))
+        profile = FlashingProfile.objects.get(pk=FlashingProfile.for_shape(nodes).pk)
+        field = FlashingProfile._meta.get_field("nodes")
+
+        dumped = field.value_to_string(profile)
+        self.assertEqual(json.loads(dumped), nodes)
+        self.assertEqual(field.to_python(dumped), nodes)
+
+    @mock.patch.object(fields, "PACK_NODES", True)
+    def test_packed_nodes_serialize_as_json(self):
+        factory = make_factory()
+        nodes = make_nodes((0, 0), (100, 0))
+        flashing = StoredFlashing.objects.create(
+            client=make_user(factory), material=make_variant(factory), code="A", nodes=nodes
+        )
+
+        client = APIClient()
+        client.force_authenticate(flashing.client)
+        response = client.get(f"/api/d/flashing/{flashing.pk}/")
+        self.assertEqual(response.json()["nodes"], nodes)
+
+
+class FlashingProfileTests(TestCase):
+    def setUp(self):
+        factory = make_factory()
+        self.user = make_user(factory)
+        self.variant = make_variant(factory)
+        self.nodes = make_nodes((0, 0), (100, 0), (100, 50))
+
+    def test_same_shape_shares_a_profile(self):
+        first = make_flashing(self.user, self.variant, nodes=self.nodes)
+        second = make_flashing(self.user, self.variant, code="B", nodes=self.nodes[::-1])
+        template = Template.objects.create(client=self.user, name="Gutter", nodes=self.nodes)
+
+        self.assertEqual(first.profile_id, second.profile_id)
+        self.assertEqual(first.profile_id, template.profile_id)
+        self.assertEqual(FlashingProfile.objects.count(), 1)
+
+    def test_crush_folds_are_part_of_the_shape(self):
+        flashing = make_flashing(self.user, self.variant, nodes=self.nodes)
+        plain = flashing.profile_id
+
+        flashing.end_crush_fold = True
+        flashing.save()
+        self.assertNotEqual(flashing.profile_id, plain)
+        self.assertEqual(flashing.profile.crush_count, 1)
+        self.assertEqual(flashing.nodes, self.nodes)
+
+    def test_invalid_shapes_are_stored_invalid(self):
+        nodes = make_nodes((0, 0), (100, 0))
+        nodes[0]["next_node_id"] = None
+
+        flashing = make_flashing(self.user, self.variant, nodes=nodes)
+        self.assertFalse(flashing.profile.is_valid)
+        flashing.refresh_from_db()
+        self.assertFalse(flashing.is_complete)
+
+    def test_used_profiles_cant_be_deleted(self):
+        flashing = make_flashing(self.user, self.variant)
+        with self.assertRaises(ProtectedError):
+            flashing.profile.delete()
+
+
+class NodeChainCacheTests(SimpleTestCase):
+    def setUp(self):
+        utils._chain_cache.clear()
+        self.addCleanup(utils._chain_cache.clear)
+        patcher = mock.patch.object(utils, "_chain_order", wraps=utils._chain_order)
+        self.chain_order = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_returns_the_chain_order(self):
+        nodes = make_nodes((0, 0), (100, 0), (100, 50))
+        self.assertEqual(utils.node_chain(nodes[::-1]), (2, 1, 0))
+
+    def test_equal_nodes_hit_the_cache(self):
+        utils.node_chain(make_nodes((0, 0), (100, 0)))
+        utils.node_chain(make_nodes((0, 0), (100, 0)))
+        self.chain_order.assert_called_once()
+
+    def test_invalid_nodes_are_cached_too(self):
+        nodes = make_nodes((0, 0), (100, 0))
+        nodes[1]["prev_node_id"] = "missing"
+
+        for _ in range(2):
+            with self.assertRaisesMessage(ValidationError, "reference to unknown node_id 'missing'"):
+                utils.node_chain(nodes)
+        self.chain_order.assert_called_once()
+
+    def test_least_recently_used_is_evicted(self):
+        first, second, third = (make_nodes((0, 0), (i, 0)) for i in (1, 2, 3))
+
+        with mock.patch.object(utils, "NODE_CHAIN_CACHE_SIZE", 2):
+            utils.node_chain(first)
+            utils.node_chain(second)
+            utils.node_chain(first)
+            utils.node_chain(third)
+            self.assertEqual(self.chain_order.call_count, 3)
+
+            utils.node_chain(first)
+            self.assertEqual(self.chain_order.call_count, 3)
+            utils.node_chain(second)
+            self.assertEqual(self.chain_order.call_count, 4)
+
+
+class NodesToProfilesMigrationTests(TransactionTestCase):
+    before = [("dashboard", "0002_flashing_profiles_and_caches")]
+    after = [("dashboard", "0004_remove_flashing_nodes")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_moves_nodes_to_profiles(self):
+        apps = self.migrate(self.before)
+        factory = apps.get_model("factory", "Factory").objects.create(
+            name="Factory",
+            email="factory@example.com",
+            phone="0400000000",
+            description="",
+            street_address="1 Main St",
+            suburb="Sydney",
+            state="NSW",
+            postcode=2000,
+            working_hours_start="08:00",
+            working_hours_end="17:00",
+        )
+        material = apps.get_model("factory", "Material").objects.create(
+            name="Steel", factory=factory, variant_type="thickness"
+        )
+        group = apps.get_model("factory", "MaterialGroup").objects.create(
+            material=material,
+            base_price=Decimal("10.00"),
+            price_per_fold=Decimal("1.50"),
+            price_per_100girth=Decimal("2.25"),
+            price_per_crush_fold=Decimal("0.75"),
+            sample_weight=Decimal("7.85"),
+        )
+        variant = apps.get_model("factory", "MaterialVariant").objects.create(
+            group=group, label="0.55", value="0.55"
+        )
+        client = apps.get_model("base", "CustomUser").objects.create(
+            email="client@example.com"
+        )
+
+        nodes = make_nodes((0, 0), (100, 0), (100, 50))
+        flashings = [
+            apps.get_model("dashboard", "StoredFlashing").objects.create(client=client, material=variant, code=code, nodes=shape)
+            for code, shape in [("A", nodes), ("B", nodes[::-1]), ("C", [])]
+        ]
+        for flashing in flashings:
+            apps.get_model("dashboard", "Specification").objects.create(
+                flashing=flashing, quantity=1, length=1000
+            )
+        apps.get_model("dashboard", "Template").objects.create(
+            client=client, name="Gutter", nodes=nodes, end_crush_fold=True
+        )
+
+        self.migrate(self.after)
+
+        a, b, c = (StoredFlashing.objects.get(pk=flashing.pk) for flashing in flashings)
+        self.assertEqual(a.profile_id, b.profile_id)
+        self.assertEqual(a.nodes, nodes)
+        self.assertEqual(a.girth, 150)
+        self.assertTrue(a.is_complete and b.is_complete)
+        self.assertIsNone(c.profile_id)
+        self.assertFalse(c.is_complete)
+
+        template = Template.objects.get()
+        self.assertNotEqual(template.profile_id, a.profile_id)
+        self.assertTrue(template.profile.end_crush_fold)
+        self.assertEqual(FlashingProfile.objects.count(), 2)
+
+
+class SQLiteSetupTests(SimpleTestCase):
+    def test_database_config_from_the_environment(self):
+        env = {"SQLITE_PATH": "/srv/app.sqlite3", "CONN_MAX_AGE": "0", "CONN_HEALTH_CHECKS": "no"}
+        with mock.patch.dict(os.environ, env):
+            config = db.database_config(Path("/app"))
+
+        self.assertEqual(config["NAME"], "/srv/app.sqlite3")
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+        self.assertFalse(config["CONN_HEALTH_CHECKS"])
+        self.assertEqual(config["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+
+    def test_replica_configs(self):
+        with mock.patch.dict(os.environ, {"SQLITE_REPLICAS": "r1.sqlite3, ,r2.sqlite3"}):
+            replicas = db.replica_configs(Path("/app"))
+
+        self.assertEqual(list(replicas), ["replica1", "replica2"])
+        self.assertEqual(replicas["replica2"]["NAME"], "/app/r2.sqlite3")
+        self.assertEqual(replicas["replica1"]["TEST"], {"MIRROR": "default"})
+
+    def test_new_connections_get_the_pragmas(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            wrapper = type(connections["default"])(
+                {**connection.settings_dict, "NAME": os.path.join(tmp, "db.sqlite3")},
+                alias="pragmas",
+            )
+            try:
+                with wrapper.cursor() as cursor:
+                    pragmas = {}
+                    for name in ("journal_mode", "synchronous", "busy_timeout", "temp_store"):
+                        cursor.execute(f"PRAGMA {name}")
+                        pragmas[name] = cursor.fetchone()[0]
+            finally:
+                wrapper.close()
+
+        # synchronous NORMAL is 1, temp_store MEMORY is 2
+        self.assertEqual(
+            pragmas,
+            {"journal_mode": "wal", "synchronous": 1, "busy_timeout": db.BUSY_TIMEOUT, "temp_store": 2},
+        )
+
+
+class ReadAliasView(routers.ReplicaReadMixin, APIView):
+    """Answers with the database it read from, failing on the replica when asked to."""
+
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    replica_fails = False
+
+    def get(self, request):
+        alias = routers.PrimaryReplicaRouter().db_for_read(Order)
+        if alias != "default" and self.replica_fails:
+            raise OperationalError("no such table: dashboard_order")
+        return Response({"alias": alias})
+
+
+@mock.patch.object(routers, "REPLICAS", ("replica1",))
+@mock.patch.object(routers, "replica_lag", return_value=0)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get("/")
+        # Writes of earlier tests ran outside StickyPrimaryMiddleware
+        token = routers._wrote.set(False)
+        self.addCleanup(routers._wrote.reset, token)
+
+    def read(self, **initkwargs):
+        return ReadAliasView.as_view(**initkwargs)(self.request).data["alias"]
+
+    def test_reads_go_to_a_replica(self, replica_lag):
+        self.assertEqual(self.read(), "replica1")
+
+    def test_failed_replica_read_is_retried_on_the_primary(self, replica_lag):
+        with self.assertLogs(routers.logger, "WARNING"):
+            self.assertEqual(self.read(replica_fails=True), "default")
+
+        # Left out until DB_REPLICA_RETRY_AFTER has passed
+        self.assertIsNone(routers.pick_replica())
+        self.assertEqual(self.read(), "default")
+
+    def test_stale_replica_is_skipped(self, replica_lag):
+        replica_lag.return_value = routers.MAX_LAG + 1
+        self.assertEqual(self.read(), "default")
+
+    def test_writes_pin_the_user_to_the_primary(self, replica_lag):
+        user = mock.Mock(pk=1, is_authenticated=True)
+
+        def write(request):
+            request.user = user
+            routers.PrimaryReplicaRouter().db_for_write(Order)
+            return Response()
+
+        routers.StickyPrimaryMiddleware(write)(self.request)
+        self.assertTrue(routers.is_pinned_to_primary(user))
+
+        view = ReadAliasView()
+        self.request.user = user
+        self.assertFalse(view.reads_from_replica(self.request))
+
+        other = RequestFactory().get("/")
+        other.user = AnonymousUser()
+        self.assertTrue(view.reads_from_replica(other))
+
+    def test_reads_after_a_write_stay_on_the_primary(self, replica_lag):
+        token = routers._read_alias.set("replica1")
+        try:
+            router = routers.PrimaryReplicaRouter()
+            self.assertEqual(router.db_for_read(Order), "replica1")
+
+            router.db_for_write(Order)
+            self.assertEqual(router.db_for_read(Order), "default")
+        finally:
+            routers._read_alias.reset(token)
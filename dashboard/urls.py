@@ -13,6 +13,7 @@ from .views import (
     TemplateView,
     NewJobReferenceView,
     UserProfileView,
+    QuoteView,
 )
 
 
@@ -42,6 +43,7 @@ urlpatterns = (
         path("factory/", UserFactoryView.as_view(), name="user-factory"),
         path("materials/", MaterialsView.as_view(), name="user-material"),
         path("profile/", UserProfileView.as_view(), name="user-profile"),
+        path("quote/", QuoteView.as_view(), name="user-quote"),
         # path("cart/", CartView.as_view({'get': 'retrieve'}), name="user-cart"),
         # path("job-reference/", JobReferenceView.as_view(), name='user-job-reference'),
     ]
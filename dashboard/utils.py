@@ -1,17 +1,17 @@
 from django.core.exceptions import ValidationError
+import hashlib
 import math
-from random import randint
+import pickle
+import threading
+from collections import OrderedDict
 from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
 from django.db import models
-import requests
 import stripe
 
-ORS_API_KEY = settings.ORS_API_KEY
-
-GEOCODE_URL = "https://api.openrouteservice.org/geocode/search"
-ROUTE_URL = "https://api.openrouteservice.org/v2/directions/driving-car"
+from . import ors
+from .nodepack import PackedNodes
 
 stripe.api_key = settings.STRIPE_KEY
 
@@ -25,7 +25,7 @@ class AustraliaStateChoices(models.TextChoices):
         ACT = "ACT", "Australian Capital Territory"
         NT = "NT", "Northern Territory"
 
-def create_stripe_session(amount, name="Test Order Pay"):
+def create_stripe_session(amount_cents, name="Test Order Pay"):
     DOMAIN = "http://localhost:8000"
 
     session = stripe.checkout.Session.create(
@@ -36,7 +36,7 @@ def create_stripe_session(amount, name="Test Order Pay"):
                 "price_data": {
                     "currency": "aud",
                     "product_data": {"name": name},
-                    "unit_amount": int(amount * 100),  # $10.00
+                    "unit_amount": amount_cents,
                 },
                 "quantity": 1,
             }
@@ -55,67 +55,36 @@ def get_stripe_session_payment_intent(session_id):
 
 def geocode_text(query):
     """Return (lon, lat) from a postcode or partial address."""
-    params = {
-        "api_key": ORS_API_KEY,
-        "text": query,
-        "size": 1
-    }
-
-    resp = requests.get(GEOCODE_URL, params=params)
-    resp.raise_for_status()
-    data = resp.json()
+    return ors.get_client().geocode(query)
 
-    features = data.get("features")
-    if not features:
-        raise ValueError(f"Could not geocode: {query}")
-
-    coords = features[0]["geometry"]["coordinates"]
-    return coords[0], coords[1]  # (lon, lat)
+def route_distance_km(start, end):
+    """Return driving distance in kilometers between two (lon, lat) points."""
+    return ors.get_client().route_distance_km(start, end)
 
 def driving_distance_km(from_address, to_address):
     """Return driving distance in kilometers between two postcodes or addresses."""
     start = geocode_text(from_address)
     end = geocode_text(to_address)
 
-    body = {
-        "coordinates": [
-            [start[0], start[1]],
-            [end[0], end[1]]
-        ]
-    }
-
-    headers = {
-        "Authorization": ORS_API_KEY,
-        "Content-Type": "application/json"
-    }
-
-    resp = requests.post(ROUTE_URL, json=body, headers=headers)
-    resp.raise_for_status()
-    data = resp.json()
-
-    summary = data["routes"][0]["summary"]
-    distance_meters = summary["distance"]
-
-    return math.ceil(distance_meters / 1000)
-
-def generate_six_digit_id():
-    return str(randint(100000, 999999))
-
-def validate_nodes(nodes):
-    if not nodes:
-        return
+    return route_distance_km(start, end)
 
+def _chain_order(nodes):
+    """
+    Checks the nodes and returns their indices in chain order (head to tail),
+    in a single walk over the list.
+    """
     if not isinstance(nodes, list):
         raise ValidationError("nodes must be a list")
 
     # required fields
     required_fields = {"node_id", "left", "top"}
 
-    node_ids = set()
-    next_refs = set()
-    prev_refs = set()
+    index = {}
+    refs = []
+    heads = []
+    tails = 0
 
-    for node in nodes:
+    for i, node in enumerate(nodes):
         if not isinstance(node, dict):
             raise ValidationError("each node must be an object")
 
@@ -124,9 +93,13 @@ def validate_nodes(nodes):
 
         node_id = node["node_id"]
 
-        if node_id in node_ids:
+        if node_id in index:
             raise ValidationError(f"duplicate node_id '{node_id}' found")
-        node_ids.add(node_id)
+        index[node_id] = i
+
+        for key in ("left", "top"):
+            if not isinstance(node[key], (int, float)):
+                raise ValidationError(f"{key} for node '{node_id}' must be a number")
 
         # optional numeric field
         if "next_line_bside_length" in node:
@@ -136,33 +109,30 @@ def validate_nodes(nodes):
                     f"next_line_bside_length for node '{node_id}' must be a number"
                 )
 
-        # collect references
-        if "next_node_id" in node and node["next_node_id"]:
-            next_refs.add(node["next_node_id"])
-
-        if "prev_node_id" in node and node["prev_node_id"]:
-            prev_refs.add(node["prev_node_id"])
+        next_id, prev_id = node.get("next_node_id"), node.get("prev_node_id")
+        if next_id:
+            refs.append(next_id)
+        else:
+            tails += 1
+        if prev_id:
+            refs.append(prev_id)
+        else:
+            heads.append(node_id)
 
     # references must exist
-    for ref in next_refs.union(prev_refs):
-        if ref not in node_ids:
+    for ref in refs:
+        if ref not in index:
             raise ValidationError(f"reference to unknown node_id '{ref}'")
 
-    # build maps
-    prev_map = {n.get("node_id"): n.get("prev_node_id") for n in nodes}
-    next_map = {n.get("node_id"): n.get("next_node_id") for n in nodes}
-
     # head and tail checks
-    heads = [nid for nid, prev in prev_map.items() if not prev]
-    tails = [nid for nid, nxt in next_map.items() if not nxt]
-
     if len(heads) != 1:
         raise ValidationError("there must be exactly one head (prev_node_id=None)")
 
-    if len(tails) != 1:
+    if tails != 1:
         raise ValidationError("there must be exactly one tail (next_node_id=None)")
 
     # walk through the chain, detect cycles
+    order = []
     visited = set()
     current = heads[0]
 
@@ -170,45 +140,90 @@ def validate_nodes(nodes):
         if current in visited:
             raise ValidationError("node chain contains a cycle")
         visited.add(current)
-        current = next_map.get(current)
+        order.append(index[current])
+        current = nodes[index[current]].get("next_node_id")
 
-    if len(visited) != len(nodes):
+    if len(order) != len(nodes):
         raise ValidationError("node chain is broken or incomplete")
 
+    return tuple(order)
+
+
+# Results of _chain_order by content hash of the nodes, least recently used
+# first. Holds the order tuple, or the message of the validation error.
+NODE_CHAIN_CACHE_SIZE = getattr(settings, "NODE_CHAIN_CACHE_SIZE", 2048)
+
+_chain_cache = OrderedDict()
+_chain_lock = threading.Lock()
+
+
+def _nodes_digest(nodes):
+    # pickle is lossless and several times faster than json.dumps here, equal
+    # nodes pickled differently (key order, shared strings) only miss the cache
+    data = pickle.dumps(nodes, protocol=pickle.HIGHEST_PROTOCOL)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def node_chain(nodes):
+    """
+    Indices of the nodes in chain order, raises ValidationError when the
+    nodes aren't a valid chain. Memoized on the content of the nodes, so
+    validating and measuring the same flashing again is one hash away.
+    """
+    if not nodes:
+        return ()
+
+    # Only valid chains are packed, and in chain order
+    if isinstance(nodes, PackedNodes):
+        return tuple(range(len(nodes)))
+
+    key = _nodes_digest(nodes)
+    with _chain_lock:
+        result = _chain_cache.get(key)
+        if result is not None:
+            _chain_cache.move_to_end(key)
+
+    if result is None:
+        try:
+            result = _chain_order(nodes)
+        except ValidationError as e:
+            result = e.messages[0]
+
+        with _chain_lock:
+            _chain_cache[key] = result
+            while len(_chain_cache) > NODE_CHAIN_CACHE_SIZE:
+                _chain_cache.popitem(last=False)
+
+    if isinstance(result, str):
+        raise ValidationError(result)
+    return result
+
+
+def validate_nodes(nodes):
+    node_chain(nodes)
+
 def calculate_total_girth(nodes):
         """
         Walks through the linked nodes in order and returns the sum
         of distances between each pair.
         """
-        if not nodes:
-            return 0
-
-        # Build quick lookup by node_id
-        node_map = {n["node_id"]: n for n in nodes}
-
-        # Find the head node
-        head = None
-        for n in nodes:
-            if not n.get("prev_node_id"):
-                head = n
-                break
+        if isinstance(nodes, PackedNodes):
+            return nodes.girth()
 
-        if not head:
-            return 0  # invalid or empty chain
+        try:
+            order = node_chain(nodes)
+        except ValidationError:
+            return 0  # invalid chain
 
         total = 0.0
-        current = head
-
-        while current.get("next_node_id"):
-            nxt = node_map[current["next_node_id"]]
+        for a, b in zip(order, order[1:]):
+            current, nxt = nodes[a], nodes[b]
 
             dx = nxt["left"] - current["left"]
             dy = nxt["top"] - current["top"]
 
             total += math.hypot(dx, dy)
 
-            current = nxt
-
         return total
 
 def validate_material_snapshot(data):
@@ -6,8 +6,12 @@ from rest_framework import status
 from datetime import datetime
 from django.utils import timezone
 from datetime import timedelta
+from django.db.models import Prefetch
 
+from yar_ff_django.routers import ReplicaReadMixin
 from factory.models import DeliveryMethod
+from factory.calendar import get_calendar
+from factory.catalog_cache import cached_catalog_response, catalog_version
 from .serializers import (
     FactorySerializer,
     MaterialSerializer,
@@ -21,19 +25,34 @@ from .serializers import (
     TemplateSerializer,
     NewJobReferenceSerializer,
     UserSerializer,
+    QuoteSerializer,
 )
 from .drafts import JobReferenceDraft
 from .models import Cart, Order, JobReference
-from .sanpshots import (
-    StoredFlashingSnapshot,
-    MaterialSnapshot,
-    SpecificationSnapshot,
-    JobReferenceSnapshot,
-    PaymentSnapshot,
-    DeliveryInfoSnapshot,
-    PickupInfoSnapshot,
-)
+from .sanpshots import StoredFlashingSnapshot
+from .checkout import OrderSnapshotBuilder
 from .utils import create_stripe_session, get_stripe_session_payment_intent
+from .pricing import with_pricing_relations
+from .quotes import quote_flashings
+from . import capacity
+
+
+def with_order_relations(queryset):
+    """
+    Loads every relation OrderSerializer reads in a fixed number of queries:
+    one for the orders and their one-to-one snapshots, then one each for
+    the flashings (with their material) and their specifications.
+    """
+    flashings = StoredFlashingSnapshot.objects.select_related(
+        "material", "profile"
+    ).prefetch_related("specifications")
+
+    return queryset.select_related(
+        "job_reference",
+        "payment_history",
+        "delivery__driver",
+        "pickup",
+    ).prefetch_related(Prefetch("flashings", queryset=flashings))
 
 
 class UserProfileView(generics.RetrieveUpdateAPIView):
@@ -44,7 +63,7 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
-class UserFactoryView(generics.RetrieveAPIView):
+class UserFactoryView(ReplicaReadMixin, generics.RetrieveAPIView):
     serializer_class = FactorySerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -53,8 +72,17 @@ class UserFactoryView(generics.RetrieveAPIView):
     def get_object(self):
         return self.request.user.factory
 
+    def retrieve(self, request, *args, **kwargs):
+        factory_id = request.user.factory_id
+        return cached_catalog_response(
+            request,
+            f"user-factory:{factory_id}",
+            catalog_version(factory_id),
+            lambda: super(UserFactoryView, self).retrieve(request, *args, **kwargs),
+        )
+
 
-class MaterialsView(generics.ListAPIView):
+class MaterialsView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = MaterialSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -63,6 +91,36 @@ class MaterialsView(generics.ListAPIView):
     def get_queryset(self):
         return self.request.user.factory.materials.all()
 
+    def list(self, request, *args, **kwargs):
+        factory_id = request.user.factory_id
+        return cached_catalog_response(
+            request,
+            f"materials:{factory_id}",
+            catalog_version(factory_id),
+            lambda: super(MaterialsView, self).list(request, *args, **kwargs),
+        )
+
+
+class QuoteView(generics.GenericAPIView):
+    """
+    Prices a batch of flashing drafts (material variant, nodes, crush folds
+    and specifications) the way they'd be priced once stored, without
+    writing anything.
+    """
+
+    serializer_class = QuoteSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    http_method_names = ["post", "options"]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        return Response(
+            quote_flashings(serializer.validated_data["flashings"], serializer.variants)
+        )
+
 
 class StoredFlashingView(viewsets.ModelViewSet):
     serializer_class = StoredFlashingSerializer
@@ -71,7 +129,9 @@ class StoredFlashingView(viewsets.ModelViewSet):
     http_method_names = ["get", "post", "delete", "patch", "options"]
 
     def get_queryset(self):
-        return self.request.user.flashings.all()
+        # Material, group, specifications are loaded up front so a page
+        # costs the same number of queries whatever its size
+        return with_pricing_relations(self.request.user.flashings.all())
 
     def perform_create(self, serializer):
         serializer.save(client_id=self.request.user.id)
@@ -84,7 +144,7 @@ class JobReferenceView(viewsets.ModelViewSet):
     http_method_names = ["get", "patch", "post", "delete", "options"]
 
     def get_queryset(self):
-        return self.request.user.job_references.all()
+        return self.request.user.job_references.prefetch_related("addresses")
 
     def perform_create(self, serializer):
         serializer.save(client_id=self.request.user.id)
@@ -123,27 +183,29 @@ class AddressView(viewsets.ModelViewSet):
         serializer.save(job_reference_id=self.kwargs["job_ref_pk"])
 
 
-class OrderView(viewsets.ModelViewSet):
+class OrderView(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     http_method_names = ["get"]
 
     def get_queryset(self):
-        return self.request.user.orders.all()
+        return with_order_relations(self.request.user.orders.all())
 
     def perform_create(self, serializer):
         serializer.save(client_id=self.request.user.id)
 
 
-class TemplateView(viewsets.ModelViewSet):
+class TemplateView(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = TemplateSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    replica_actions = {"list"}
+
     http_method_names = ["get", "post", "options", "patch"]
 
     def get_queryset(self):
-        return self.request.user.templates.all()
+        return self.request.user.templates.select_related("profile")
 
     def perform_create(self, serializer):
         serializer.save(client_id=self.request.user.id)
@@ -152,11 +214,33 @@ class TemplateView(viewsets.ModelViewSet):
 class CartView(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
+    cart_related = ["client__factory", "address__job_reference"]
+
+    def get_cart(self, **lookup):
+        return Cart.objects.select_related(*self.cart_related).get(**lookup)
+
+    def set_delivery_address(self, cart, address_id):
+        """
+        Points the cart (not saved) at one of the user's addresses for
+        delivery, so its earliest date includes the delivery days. False
+        when the user has no such address.
+        """
+        try:
+            address = Address.objects.get(
+                id=address_id, job_reference__client=cart.client
+            )
+        except (Address.DoesNotExist, ValueError):
+            return False
+
+        cart.delivery_type = "delivery"
+        cart.address = address
+        return True
+
     def list(self, request):
         """
         Retrieve the authenticated user's cart
         """
-        cart = request.user.cart
+        cart = self.get_cart(client=request.user)
         serializer = CartSerializer(cart, context={"request": request})
         return Response(serializer.data)
 
@@ -164,7 +248,7 @@ class CartView(viewsets.ViewSet):
     def estimate_delivery_date(self, request):
         # TODO Should recieve an address_id and should estimate delivery date
         # TODO Should return the estimated delivery date
-        cart = request.user.cart
+        cart = self.get_cart(client=request.user)
 
         address_id = request.data.get("address_id")
 
@@ -178,18 +262,24 @@ class CartView(viewsets.ViewSet):
         distance = float(address.distance_to_factory)
         weight = float(cart.total_delivery_weight)
 
-        # print(distance, weight, address.best_delivery_method.estimate_delivery_days(distance, weight))
-        d_method = address.best_delivery_method
-        if d_method.method_type == "factory":
-            best_date = (
-                address.best_delivery_method.estimate_delivery_days(distance, weight) + 2
+        d_method = address.delivery_method_for(
+            weight, factory_id=cart.client.factory_id
+        )
+        if d_method is None:
+            return Response(
+                {"error": "No delivery method available for this address"},
+                status=400,
             )
 
+        if d_method.method_type == "factory":
+            calendar = get_calendar(cart.client.factory)
+            delivery_days = d_method.estimate_delivery_days(distance, weight)
+
             return Response(
                 {
-                    "estimated_delivery_date": (
-                        timezone.now() + timedelta(days=best_date)
-                    ).date()
+                    "estimated_delivery_date": calendar.earliest_delivery_date(
+                        delivery_days
+                    )
                 },
                 status=200,
             )
@@ -203,13 +293,42 @@ class CartView(viewsets.ViewSet):
             )
             
 
+    @action(detail=False, methods=["get"], url_path="available-dates")
+    def available_dates(self, request):
+        cart = self.get_cart(client=request.user)
+        factory = cart.client.factory
+
+        try:
+            count = min(int(request.query_params.get("count", 5)), 30)
+        except ValueError:
+            return Response({"error": "count must be a number"}, status=400)
+
+        # Dates for an address not chosen yet start where update_cart's do
+        address_id = request.query_params.get("address_id")
+        if address_id and not self.set_delivery_address(cart, address_id):
+            return Response({"error": "Address not found"}, status=404)
+
+        return Response(
+            {
+                "accepting_orders": capacity.accepts_orders(factory),
+                "dates": capacity.feasible_dates(
+                    factory,
+                    cart.estimated_delivery_date,
+                    len(cart.pricing.flashings),
+                    cart.total_delivery_weight,
+                    count=count,
+                ),
+            },
+            status=200,
+        )
+
     @action(detail=False, methods=["post"], url_path="update")
     def update_cart(self, request):
         address_id = request.data.get("address_id")
         delivery_date_str = request.data.get("delivery_date")
         delivery_type = request.data.get("delivery_type")
 
-        cart = request.user.cart
+        cart = self.get_cart(client=request.user)
 
         if not delivery_date_str:
             return Response({"error": "delivery_date is required"}, status=400)
@@ -222,36 +341,48 @@ class CartView(viewsets.ViewSet):
         if not delivery_type:
             return Response({"error": "delivery_type is required"}, status=400)
 
-        # Setting delivery date
-        # TODO Should check the estimated delivery date based on delivery method (.estimate_dalivery_date method in methods model)
+        if not self.set_delivery_address(cart, address_id):
+            return Response({"error": "Address not found"}, status=404)
+
+        # Setting delivery date, checked against the new address' delivery method
         try:
             delivery_date = datetime.strptime(delivery_date_str, "%Y-%m-%d").date()
-            if delivery_date < cart.estimated_delivery_date:
-                return Response(
-                    {
-                        "error": (
-                            f"delivery_date must be greater than or equal to "
-                            f"{cart.estimated_delivery_date}"
-                        )
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            cart.delivery_date = delivery_date
         except ValueError:
             return Response(
                 {"error": "delivery_date must be a valid date in YYYY-MM-DD format"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-            
-        try:
-            address = Address.objects.get(
-                id=address_id, job_reference__client=request.user
+
+        estimated_delivery_date = cart.estimated_delivery_date
+        if delivery_date < estimated_delivery_date:
+            return Response(
+                {
+                    "error": (
+                        f"delivery_date must be greater than or equal to "
+                        f"{estimated_delivery_date}"
+                    )
+                },
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            cart.delivery_type = "delivery"
-            cart.address = address
-        except Address.DoesNotExist:
-            return Response({"error": "Address not found"}, status=404)
+
+        if not get_calendar(cart.client.factory).is_working_day(delivery_date):
+            return Response(
+                {"error": "The factory is closed on delivery_date"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not capacity.is_feasible(
+            cart.client.factory,
+            delivery_date,
+            len(cart.pricing.flashings),
+            cart.total_delivery_weight,
+        ):
+            return Response(
+                {"error": "The factory is fully booked on delivery_date"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cart.delivery_date = delivery_date
 
         # return Response(
         #     {
@@ -269,16 +400,29 @@ class CartView(viewsets.ViewSet):
 
     @action(detail=False, methods=["post"], url_path="pay")
     def pay(self, request):
-        cart = request.user.cart
+        cart = self.get_cart(client=request.user)
         if not cart.is_complete:
             return Response(
                 {"error": "Cart isn't complete"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        amount = cart.total_amount
+        # The date may have filled up since it was picked
+        factory = cart.client.factory
+        if not capacity.accepts_orders(factory) or not capacity.is_feasible(
+            factory,
+            cart.delivery_date,
+            len(cart.pricing.flashings),
+            cart.total_delivery_weight,
+        ):
+            return Response(
+                {"error": "The factory can't take this order on the delivery date"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        amount_cents = cart.total_amount_cents
         try:
-            stripe_session = create_stripe_session(amount, f"Payment for client")
+            stripe_session = create_stripe_session(amount_cents, f"Payment for client")
             cart.stripe_session_id = stripe_session.id
             cart.save()
             print(cart.stripe_session_id)
@@ -303,125 +447,20 @@ class CartView(viewsets.ViewSet):
 
         try:
             session, payment_intent = get_stripe_session_payment_intent(session_id)
-            cart = Cart.objects.get(stripe_session_id=session.id)
+            cart = self.get_cart(stripe_session_id=session.id)
         except Cart.DoesNotExist:
             return Response({"error": "Cart or stripe session not found"}, status=404)
 
-        # try:
-        if True:
-
-            order_snapshot = Order.objects.create(
-                client=cart.client,
-            )
-            PaymentSnapshot.objects.create(
-                order=order_snapshot,
-                method="stripe",
-                transaction_id=payment_intent.id,
-                stripe_session_id=session.id,
-                total_amount=payment_intent.amount / 100.0,
-                gst_ratio=cart.gst_ratio,
-            )
-
-            JobReferenceSnapshot.objects.create(
-                order=order_snapshot,
-                code=cart.job_reference.code,
-                project_name=cart.job_reference.project_name,
-                # title=cart.address.title,
-                # street_address=cart.address.street_address,
-                # suburb=cart.address.suburb,
-                # state=cart.address.state,
-                # postcode=cart.address.postcode,
-                # distance_to_factory=cart.address.distance_to_factory,
-                # recipient_name=cart.address.recipient_name,
-                # recipient_phone=cart.address.recipient_phone,
+        try:
+            order_snapshot = OrderSnapshotBuilder(cart, session, payment_intent).build()
+        except Exception as e:
+            return Response(
+                {"error": f"Couldn't create snapshots: {str(e)}"}, status=500
             )
 
-            for flash in cart.flashings.all():
-                flash_snapshot = StoredFlashingSnapshot.objects.create(
-                    order=order_snapshot,
-                    code=flash.code,
-                    position=flash.position,
-                    start_crush_fold=flash.start_crush_fold,
-                    end_crush_fold=flash.end_crush_fold,
-                    color_side_dir=flash.color_side_dir,
-                    tapered=flash.tapered,
-                    nodes=flash.nodes,
-                    total_girth=flash.total_girth,
-                )
-
-                original_variant = flash.material
-                original_material = flash.material.group.material
-                original_group = flash.material.group
-
-                MaterialSnapshot.objects.create(
-                    flashing=flash_snapshot,
-                    variant_type=original_material.variant_type,
-                    name=original_material.name,
-                    variant_label=original_variant.label,
-                    variant_value=original_variant.value,
-                    base_price=original_group.base_price,
-                    price_per_fold=original_group.price_per_fold,
-                    price_per_100girth=original_group.price_per_100girth,
-                    price_per_crush_fold=original_group.price_per_crush_fold,
-                    sample_weight=original_group.sample_weight,
-                    sample_weight_sq_meter=original_group.sample_weight_sq_meter,
-                )
-
-                for spec in flash.specifications.all():
-                    SpecificationSnapshot.objects.create(
-                        flashing=flash_snapshot,
-                        quantity=spec.quantity,
-                        length=spec.length,
-                        weight=spec.weight,
-                        cost=spec.cost,
-                    )
+        # TODO: Here first of all the cart should be empty. Then the stored flashings should be removed
 
-            # TODO: Here first of all the cart should be empty. Then the stored flashings should be removed
-
-            if cart.delivery_type == "delivery":
-                addr = cart.address
-                del_m = addr.best_delivery_method
-                DeliveryInfoSnapshot.objects.create(
-                    order=order_snapshot,
-                    cost=cart.delivery_cost,
-                    date=cart.delivery_date,
-                    title=addr.title,
-                    street_address=addr.street_address,
-                    suburb=addr.suburb,
-                    state=addr.state,
-                    postcode=addr.postcode,
-                    distance_to_factory=addr.distance_to_factory,
-                    recipient_name=addr.recipient_name,
-                    recipient_phone=addr.recipient_phone,
-                    _dm_type=del_m.method_type,
-                    _dm_name=del_m.name,
-                    _dm_description=del_m.description,
-                    _dm_base_cost=del_m.base_cost,
-                    _dm_cost_per_kg=del_m.cost_per_kg,
-                    _dm_cost_per_km=del_m.cost_per_km,
-                )
-
-            elif cart.delivery_type == "pickup":
-                PickupInfoSnapshot.objects.create(
-                    order=order_snapshot, date=cart.delivery_date
-                )
-            else:
-                Response(
-                    {
-                        "error": "Something went wrong, not your fault but you better not pay this order!"
-                    }
-                )
-
-            # for flash in cart.flashings.all():
-            #     flash.delete()
-
-            # cart.delete()
-
-        # except Exception as e:
-        #     order_snapshot.delete()
-        #     return Response(
-        #         {"error": f"Couldn't create snapshots: {str(e)}"}, status=500
-        #     )
+        order_snapshot = with_order_relations(Order.objects).get(pk=order_snapshot.pk)
 
         serializer = CartSerializer(cart, context={"request": request})
         order_serializer = OrderSerializer(order_snapshot, context={"request": request})
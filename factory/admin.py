@@ -13,7 +13,9 @@ class FactoryAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'email', 'phone']
     ordering = ['name']
-    readonly_fields = ['id', 'created_at', 'updated_at']
+    readonly_fields = [
+        'id', 'created_at', 'updated_at', 'catalog_version', 'delivery_priority_seq'
+    ]
 
     # fieldsets = (
     #     ('Basic Information', {
@@ -5,5 +5,5 @@ class FactoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'factory'
     
-    # def ready(self):
-    #     import factory.signals
+    def ready(self):
+        import factory.signals
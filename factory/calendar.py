@@ -0,0 +1,174 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+
+# Working days ahead of today kept in the array, a lookup past the end
+# extends it
+HORIZON_DAYS = getattr(settings, "WORKING_CALENDAR_HORIZON_DAYS", 730)
+
+# Working days the factory needs to produce an order before it can leave
+PRODUCTION_LEAD_DAYS = getattr(settings, "PRODUCTION_LEAD_DAYS", 2)
+
+STATE_TIME_ZONES = {
+    "NSW": "Australia/Sydney",
+    "VIC": "Australia/Melbourne",
+    "QLD": "Australia/Brisbane",
+    "WA": "Australia/Perth",
+    "SA": "Australia/Adelaide",
+    "TAS": "Australia/Hobart",
+    "ACT": "Australia/Sydney",
+    "NT": "Australia/Darwin",
+}
+
+
+def factory_time_zone(factory):
+    name = STATE_TIME_ZONES.get(factory.state)
+    return ZoneInfo(name) if name else timezone.get_current_timezone()
+
+
+def _as_time(value):
+    # Unsaved instances can still hold the "HH:MM" strings they were built with
+    return parse_time(value) if isinstance(value, str) else value
+
+
+def calendar_key(factory):
+    """Everything the calendar is built from, a change means a rebuild."""
+    return (
+        tuple(factory.weekly_off_days or ()),
+        tuple(sorted(str(d) for d in factory.specific_off_days or ())),
+        factory.working_hours_start,
+        factory.working_hours_end,
+        factory.state,
+    )
+
+
+class WorkingCalendar:
+    """
+    Working days of a factory as a sorted array of date ordinals, so moving
+    N working days or finding the next open day is a bisect plus an index.
+    """
+
+    def __init__(self, factory, start=None, horizon_days=HORIZON_DAYS):
+        self.key = calendar_key(factory)
+        self.tz = factory_time_zone(factory)
+        self.hours_start = _as_time(factory.working_hours_start)
+        self.hours_end = _as_time(factory.working_hours_end)
+
+        self.weekly_off = {int(d) for d in factory.weekly_off_days or ()}
+        if len(self.weekly_off) >= 7:
+            raise ValueError(f"Factory {factory} has no working weekdays")
+
+        self.specific_off = {
+            parsed
+            for parsed in (parse_date(str(d)) for d in factory.specific_off_days or ())
+            if parsed is not None
+        }
+
+        self.start = start or timezone.now().astimezone(self.tz).date()
+        self.end = self.start - timedelta(days=1)
+        self.days = []
+        self._lock = threading.Lock()
+        self._ensure(self.start + timedelta(days=horizon_days))
+
+    def _working_ordinals(self, first, last):
+        day, ordinals = first, []
+        while day <= last:
+            if day.weekday() not in self.weekly_off and day not in self.specific_off:
+                ordinals.append(day.toordinal())
+            day += timedelta(days=1)
+        return ordinals
+
+    def _ensure(self, day):
+        """Grow the array so it covers `day` (plus a horizon when growing forward)."""
+        if self.start <= day <= self.end:
+            return
+
+        with self._lock:
+            if day > self.end:
+                until = day + timedelta(days=HORIZON_DAYS)
+                self.days = self.days + self._working_ordinals(
+                    self.end + timedelta(days=1), until
+                )
+                self.end = until
+            if day < self.start:
+                self.days = (
+                    self._working_ordinals(day, self.start - timedelta(days=1))
+                    + self.days
+                )
+                self.start = day
+
+    def is_working_day(self, day):
+        self._ensure(day)
+        days, o = self.days, day.toordinal()
+        i = bisect_left(days, o)
+        return i < len(days) and days[i] == o
+
+    def next_working_day(self, day):
+        """The day itself when the factory works that day, else the next working day."""
+        return self._nth_from(day, bisect_left, 0)
+
+    def add_working_days(self, day, n):
+        """The n-th working day after `day`, not counting `day` itself."""
+        if n <= 0:
+            return self.next_working_day(day)
+        return self._nth_from(day, bisect_right, n - 1)
+
+    def working_days_from(self, day, count):
+        """The first `count` working days on or after `day`."""
+        self.add_working_days(day, count)  # grows the array far enough
+        days = self.days
+        i = bisect_left(days, day.toordinal())
+        return [date.fromordinal(o) for o in days[i : i + count]]
+
+    def _nth_from(self, day, bisect, offset):
+        self._ensure(day)
+        while True:
+            days = self.days
+            i = bisect(days, day.toordinal()) + offset
+            if i < len(days):
+                return date.fromordinal(days[i])
+            self._ensure(self.end + timedelta(days=1))
+
+    def next_open_slot(self, now=None):
+        """
+        Earliest moment at or after `now` the factory is open, as an aware
+        datetime in the factory's time zone.
+        """
+        local = (now or timezone.now()).astimezone(self.tz)
+        today = local.date()
+
+        if self.is_working_day(today) and local.time() < self.hours_end:
+            if local.time() >= self.hours_start:
+                return local
+            return datetime.combine(today, self.hours_start, tzinfo=self.tz)
+
+        return datetime.combine(
+            self.add_working_days(today, 1), self.hours_start, tzinfo=self.tz
+        )
+
+    def earliest_delivery_date(self, delivery_days=0, now=None):
+        """First date an order placed `now` can arrive, production lead time included."""
+        opens = self.next_open_slot(now).date()
+        return self.add_working_days(opens, PRODUCTION_LEAD_DAYS + delivery_days)
+
+
+_calendars = {}
+_lock = threading.Lock()
+
+
+def get_calendar(factory):
+    """
+    Cached calendar of the factory, rebuilt when the off days or working
+    hours differ from the ones it was built from.
+    """
+    calendar = _calendars.get(factory.pk)
+    if calendar is None or calendar.key != calendar_key(factory):
+        calendar = WorkingCalendar(factory)
+        with _lock:
+            _calendars[factory.pk] = calendar
+    return calendar
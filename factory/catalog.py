@@ -0,0 +1,182 @@
+from decimal import Decimal
+
+from .models import MaterialGroup, MaterialVariant
+
+GROUP_FIELDS = (
+    "name",
+    "base_price",
+    "price_per_fold",
+    "price_per_100girth",
+    "price_per_crush_fold",
+    "sample_weight",
+    "sample_weight_sq_meter",
+)
+
+
+def build_catalog(material_ids):
+    """
+    Groups and variants of the materials, read in one joined query and
+    nested in Python:
+
+        {material_id: [{**group fields, "variants": [{id, label, value}]}]}
+    """
+    material_ids = list(material_ids)
+    catalog = {material_id: [] for material_id in material_ids}
+    if not material_ids:
+        return catalog
+
+    rows = (
+        MaterialGroup.objects.filter(material_id__in=material_ids)
+        .order_by("material_id", "id", "variants__id")
+        .values(
+            "id",
+            "material_id",
+            *GROUP_FIELDS,
+            "variants__id",
+            "variants__label",
+            "variants__value",
+        )
+    )
+
+    groups = {}
+    for row in rows:
+        group = groups.get(row["id"])
+        if group is None:
+            group = {field: row[field] for field in GROUP_FIELDS}
+            group["variants"] = []
+            groups[row["id"]] = group
+            catalog[row["material_id"]].append(group)
+
+        # Groups without variants come back once with empty variant columns
+        if row["variants__id"] is not None:
+            group["variants"].append(
+                {
+                    "id": row["variants__id"],
+                    "label": row["variants__label"],
+                    "value": row["variants__value"],
+                }
+            )
+
+    return catalog
+
+
+def catalog_groups(context, material):
+    """
+    Groups of a material from the catalog shared through the serializer
+    context, built for this material alone when a list didn't build it.
+    """
+    catalog = context.setdefault("material_catalog", {})
+    if material.id not in catalog:
+        catalog.update(build_catalog([material.id]))
+    return catalog[material.id]
+
+
+def _group_default(field):
+    default = MaterialGroup._meta.get_field(field).get_default()
+    return 0 if default is None else default
+
+
+def _group_values(data):
+    return {
+        "name": data.get("name", "Default Group"),
+        **{
+            field: Decimal(str(data.get(field, _group_default(field))))
+            for field in GROUP_FIELDS
+            if field != "name"
+        },
+    }
+
+
+def sync_material_groups(material, groups_data):
+    """
+    Makes the groups and variants of the material match `groups_data` (the
+    nested payload of MaterialSerializer) with as few writes as possible.
+
+    Groups are matched by name, then by position. Variants keep their row
+    when the same label and value exist anywhere in the material (moving it
+    between groups if needed), else when their group had the same label.
+    Only what changed is bulk created, updated or deleted, so variants that
+    flashings point to keep their primary keys. Run inside a transaction.
+    """
+    existing_groups = list(material.groups.all())
+    existing_variants = list(MaterialVariant.objects.filter(group__material=material))
+
+    # Groups
+    by_name = {}
+    for group in existing_groups:
+        by_name.setdefault(group.name, []).append(group)
+
+    matched = [None] * len(groups_data)
+    for i, data in enumerate(groups_data):
+        candidates = by_name.get(data.get("name", "Default Group"))
+        if candidates:
+            matched[i] = candidates.pop(0)
+
+    used = {g.pk for g in matched if g is not None}
+    leftover = [g for g in existing_groups if g.pk not in used]
+    for i in range(len(groups_data)):
+        if matched[i] is None and leftover:
+            matched[i] = leftover.pop(0)
+
+    new_groups, changed_groups = [], []
+    for i, data in enumerate(groups_data):
+        values = _group_values(data)
+        group = matched[i]
+        if group is None:
+            matched[i] = MaterialGroup(material=material, **values)
+            new_groups.append(matched[i])
+        elif any(getattr(group, f) != v for f, v in values.items()):
+            for field, value in values.items():
+                setattr(group, field, value)
+            changed_groups.append(group)
+
+    MaterialGroup.objects.bulk_create(new_groups)
+    if changed_groups:
+        MaterialGroup.objects.bulk_update(changed_groups, GROUP_FIELDS)
+
+    # Variants
+    by_pair, by_group_label = {}, {}
+    for variant in existing_variants:
+        by_pair.setdefault((variant.label, variant.value), []).append(variant)
+        by_group_label.setdefault((variant.group_id, variant.label), []).append(variant)
+
+    kept = set()
+
+    def take(candidates):
+        while candidates:
+            variant = candidates.pop(0)
+            if variant.pk not in kept:
+                kept.add(variant.pk)
+                return variant
+        return None
+
+    wanted = [
+        (group, variant.get("label", ""), variant.get("value", ""))
+        for group, data in zip(matched, groups_data)
+        for variant in data.get("label_values", [])
+    ]
+
+    # Exact matches first, so a relabelled variant can't take their row
+    reused = [take(by_pair.get((label, value), [])) for _, label, value in wanted]
+
+    new_variants, changed_variants = [], []
+    for (group, label, value), variant in zip(wanted, reused):
+        if variant is None:
+            variant = take(by_group_label.get((group.pk, label), []))
+        if variant is None:
+            new_variants.append(MaterialVariant(group=group, label=label, value=value))
+            continue
+
+        if (variant.group_id, variant.label, variant.value) != (group.pk, label, value):
+            variant.group, variant.label, variant.value = group, label, value
+            changed_variants.append(variant)
+
+    MaterialVariant.objects.bulk_create(new_variants)
+    if changed_variants:
+        MaterialVariant.objects.bulk_update(changed_variants, ["group", "label", "value"])
+
+    stale_variants = [v.pk for v in existing_variants if v.pk not in kept]
+    if stale_variants:
+        MaterialVariant.objects.filter(pk__in=stale_variants).delete()
+    if leftover:
+        MaterialGroup.objects.filter(pk__in=[g.pk for g in leftover]).delete()
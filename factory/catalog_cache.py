@@ -0,0 +1,151 @@
+import gzip
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from .models import Factory
+
+# How long a process may keep reading a version from the cache. With a
+# shared cache (Redis, Memcached) bumps are seen at once, with the default
+# per-process LocMemCache other workers see them within this many seconds.
+VERSION_TTL = getattr(settings, "CATALOG_VERSION_TTL", 60)
+
+# Entries of an old version are never read again, they only age out
+RESPONSE_TTL = getattr(settings, "CATALOG_CACHE_TTL", 60 * 60 * 24)
+
+
+def _version_key(factory_id):
+    return f"catalog-version:{factory_id}"
+
+
+def catalog_version(factory_id):
+    """Current catalog version of the factory, from the cache when possible."""
+    key = _version_key(factory_id)
+    version = cache.get(key)
+    if version is None:
+        version = (
+            Factory.objects.filter(pk=factory_id)
+            .values_list("catalog_version", flat=True)
+            .first()
+        ) or 0
+        cache.set(key, version, VERSION_TTL)
+    return version
+
+
+def catalog_versions(factory_ids=None):
+    """Version token covering several factories (all of them by default)."""
+    factories = Factory.objects.all()
+    if factory_ids is not None:
+        factories = factories.filter(pk__in=factory_ids)
+
+    rows = sorted(
+        (str(pk), version)
+        for pk, version in factories.values_list("id", "catalog_version")
+    )
+    return hashlib.sha1(repr(rows).encode()).hexdigest()
+
+
+def bump_catalog_version(factory_id):
+    """Makes every cached response of the factory stale."""
+    factories = Factory.objects.filter(pk=factory_id)
+    factories.update(catalog_version=F("catalog_version") + 1)
+
+    version = factories.values_list("catalog_version", flat=True).first()
+    if version is None:
+        cache.delete(_version_key(factory_id))
+    else:
+        cache.set(_version_key(factory_id), version, VERSION_TTL)
+
+
+_local = threading.local()
+
+
+@contextmanager
+def batched_bumps(factory_id):
+    """
+    Signals sent inside the block don't bump on their own (or look up their
+    factory), the factory is bumped once after commit instead.
+    """
+    previous = getattr(_local, "batched", False)
+    _local.batched = True
+    try:
+        yield
+    finally:
+        _local.batched = previous
+
+    transaction.on_commit(lambda: bump_catalog_version(factory_id))
+
+
+def bumps_batched():
+    return getattr(_local, "batched", False)
+
+
+def _accepts_gzip(request):
+    return "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+
+
+def _not_modified(request, etags):
+    sent = request.META.get("HTTP_IF_NONE_MATCH", "")
+    return any(etag in sent for etag in etags) or sent.strip() == "*"
+
+
+def cached_catalog_response(request, scope, version, build):
+    """
+    Serves a JSON response of the catalog from the cache.
+
+    `build` returns the DRF response to cache. The rendered body, its gzipped
+    bytes and a strong ETag are stored under the scope, the version and the
+    full URL (pagination links carry it). A matching If-None-Match gets a 304
+    without touching the body. Other renderers (the browsable API) and non
+    200 responses are not cached.
+    """
+    if getattr(request, "accepted_renderer", None) is None or (
+        request.accepted_renderer.format != "json"
+    ):
+        return build()
+
+    url_hash = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    key = f"catalog:{scope}:{version}:{url_hash}"
+
+    entry = cache.get(key)
+    if entry is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+
+        body = JSONRenderer().render(response.data)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        entry = {
+            "body": body,
+            "gzip": gzip.compress(body, mtime=0),
+            "etag": f'"{digest}"',
+            "gzip_etag": f'"{digest}-gzip"',
+        }
+        cache.set(key, entry, RESPONSE_TTL)
+
+    use_gzip = _accepts_gzip(request)
+    etag = entry["gzip_etag"] if use_gzip else entry["etag"]
+
+    if _not_modified(request, (entry["etag"], entry["gzip_etag"])):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            entry["gzip"] if use_gzip else entry["body"],
+            content_type="application/json",
+        )
+        if use_gzip:
+            response["Content-Encoding"] = "gzip"
+
+    response["ETag"] = etag
+    # Authenticated data, let clients keep it but always revalidate
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
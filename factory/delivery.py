@@ -0,0 +1,104 @@
+import threading
+import time
+from bisect import bisect_right
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When, Value
+from django.utils import timezone
+
+from .models import DeliveryMethod
+
+# Signals keep the index of this process fresh, the TTL bounds how long the
+# other worker processes can serve a stale one
+INDEX_TTL = getattr(settings, "DELIVERY_METHOD_INDEX_TTL", 300)
+
+
+class DeliveryMethodIndex:
+    """
+    Active delivery methods of one factory, ordered by max_distance_km.
+
+    For every distance bound the methods that reach further are kept sorted
+    by priority, so a selection is one bisect plus a walk that stops at the
+    first method carrying the weight.
+    """
+
+    def __init__(self, methods):
+        methods = sorted(methods, key=lambda m: m.max_distance_km)
+        self.distances = [m.max_distance_km for m in methods]
+
+        # _by_priority[i]: methods[i:] (everything reaching past distances[i - 1])
+        # sorted by priority, paired with their weight limit
+        self._by_priority = [
+            [
+                (float(m.max_weight_kg), m)
+                for m in sorted(methods[i:], key=lambda m: m.priority)
+            ]
+            for i in range(len(methods) + 1)
+        ]
+        self.built_at = time.monotonic()
+
+    def best(self, distance_km, weight_kg=0):
+        """Highest priority method with max_distance_km > distance and room for the weight."""
+        i = bisect_right(self.distances, distance_km)
+        for max_weight, method in self._by_priority[i]:
+            if weight_kg <= max_weight:
+                return method
+        return None
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_index(factory_id):
+    # UUIDs from instances, strings from URL kwargs
+    key = str(factory_id)
+    index = _indexes.get(key)
+    if index is None or time.monotonic() - index.built_at > INDEX_TTL:
+        index = DeliveryMethodIndex(
+            DeliveryMethod.objects.filter(factory_id=factory_id, is_active=True)
+        )
+        with _lock:
+            _indexes[key] = index
+    return index
+
+
+def invalidate(factory_id):
+    with _lock:
+        _indexes.pop(str(factory_id), None)
+
+
+def best_delivery_method(factory_id, distance_km, weight_kg=0):
+    """
+    Delivery method of the factory for a distance and weight, None when the
+    distance is unknown or no active method can take it.
+    """
+    if not distance_km or factory_id is None:
+        return None
+    return get_index(factory_id).best(distance_km, weight_kg)
+
+
+def reorder_methods(factory_id, method_ids):
+    """
+    Gives the factory's methods the order of `method_ids` (highest priority
+    first) in one UPDATE. The new priorities are fresh ones from the factory
+    sequence, so no row ever collides with another on the way.
+    """
+    if not method_ids:
+        return 0
+
+    with transaction.atomic():
+        first = DeliveryMethod.allocate_priorities(factory_id, len(method_ids))
+        updated = DeliveryMethod.objects.filter(
+            factory_id=factory_id, pk__in=method_ids
+        ).update(
+            priority=Case(
+                *(When(pk=pk, then=Value(first + i)) for i, pk in enumerate(method_ids))
+            ),
+            updated_at=timezone.now(),
+        )
+        # update() sends no post_save, drop the index here
+        transaction.on_commit(lambda: invalidate(factory_id))
+
+    return updated
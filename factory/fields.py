@@ -0,0 +1,27 @@
+from django.db import models
+from django.db.models import F
+
+
+class CounterField(models.PositiveIntegerField):
+    """
+    A counter only ever changed by its own `update(field=F(field) + n)`.
+
+    Saving an instance leaves the column as it is in the database, so an
+    instance loaded before the last bump can't write an older value back.
+    The value is only written when the row is inserted.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("editable", False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get("editable") is False:
+            del kwargs["editable"]
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        if add:
+            return super().pre_save(model_instance, add)
+        return F(self.attname)
@@ -0,0 +1,328 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:32
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Factory",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("email", models.EmailField(max_length=254)),
+                ("phone", models.CharField(max_length=20)),
+                ("description", models.TextField()),
+                ("street_address", models.CharField(max_length=200)),
+                ("suburb", models.CharField(max_length=100)),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("NSW", "New South Wales"),
+                            ("VIC", "Victoria"),
+                            ("QLD", "Queensland"),
+                            ("WA", "Western Australia"),
+                            ("SA", "South Australia"),
+                            ("TAS", "Tasmania"),
+                            ("ACT", "Australian Capital Territory"),
+                            ("NT", "Northern Territory"),
+                        ],
+                        max_length=3,
+                    ),
+                ),
+                ("postcode", models.PositiveIntegerField()),
+                ("working_hours_start", models.TimeField()),
+                ("working_hours_end", models.TimeField()),
+                ("gst_ratio", models.FloatField(default=0.1)),
+                ("is_active", models.BooleanField(default=True)),
+                ("max_concurrent_orders", models.PositiveIntegerField(default=50)),
+                ("daily_order_limit", models.PositiveIntegerField(default=100)),
+                (
+                    "weekly_off_days",
+                    models.JSONField(blank=True, default=list, null=True),
+                ),
+                (
+                    "specific_off_days",
+                    models.JSONField(blank=True, default=list, null=True),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["name"],
+                "indexes": [
+                    models.Index(fields=["name"], name="factory_fac_name_48b700_idx"),
+                    models.Index(
+                        fields=["is_active"], name="factory_fac_is_acti_3ae9a5_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="Material",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50)),
+                (
+                    "variant_type",
+                    models.CharField(
+                        choices=[("color", "Color"), ("thickness", "Thickness")],
+                        default="color",
+                        max_length=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "factory",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="materials",
+                        to="factory.factory",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("name",)},
+            },
+        ),
+        migrations.CreateModel(
+            name="MaterialGroup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(default="Base Group", max_length=50)),
+                ("base_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "price_per_fold",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                (
+                    "price_per_100girth",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                (
+                    "price_per_crush_fold",
+                    models.DecimalField(decimal_places=2, max_digits=10),
+                ),
+                ("sample_weight", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "sample_weight_sq_meter",
+                    models.DecimalField(decimal_places=2, default=1.0, max_digits=5),
+                ),
+                (
+                    "material",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="groups",
+                        to="factory.material",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="MaterialVariant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("label", models.CharField(max_length=100)),
+                ("value", models.CharField(max_length=100)),
+                (
+                    "group",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="variants",
+                        to="factory.materialgroup",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DeliveryMethod",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "method_type",
+                    models.CharField(
+                        choices=[
+                            ("factory", "Factory Delivery"),
+                            ("freight", "Freight"),
+                        ],
+                        editable=False,
+                        max_length=20,
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("description", models.TextField(blank=True, null=True)),
+                ("is_active", models.BooleanField(default=True)),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("priority", models.IntegerField(default=1)),
+                (
+                    "base_cost",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=8),
+                ),
+                (
+                    "cost_per_kg",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=6),
+                ),
+                (
+                    "cost_per_km",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=6),
+                ),
+                ("max_weight_kg", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("max_distance_km", models.PositiveIntegerField()),
+                (
+                    "factory",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="delivery_methods",
+                        to="factory.factory",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["name", "priority"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("priority",), name="unique_priorities"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="Staff",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "employee_id",
+                    models.CharField(editable=False, max_length=50, unique=True),
+                ),
+                (
+                    "role",
+                    models.CharField(
+                        choices=[
+                            ("operator", "Operator"),
+                            ("supervisor", "Supervisor"),
+                            ("manager", "Manager"),
+                            ("qa", "Quality Assurance"),
+                        ],
+                        default="operator",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("active", "Active"),
+                            ("inactive", "Inactive"),
+                            ("terminated", "Terminated"),
+                        ],
+                        default="active",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "factory",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="staff",
+                        to="factory.factory",
+                    ),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="staff_profile",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("factory", "employee_id")},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("factory", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="deliverymethod",
+            name="unique_priorities",
+        ),
+        migrations.AddField(
+            model_name="factory",
+            name="catalog_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="factory",
+            name="daily_flashing_limit",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="factory",
+            name="daily_weight_limit_kg",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="factory",
+            name="delivery_priority_seq",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="deliverymethod",
+            constraint=models.UniqueConstraint(
+                fields=("factory", "priority"), name="unique_factory_priorities"
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:50
+
+import factory.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("factory", "0002_capacity_and_counters"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="factory",
+            name="catalog_version",
+            field=factory.fields.CounterField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="factory",
+            name="delivery_priority_seq",
+            field=factory.fields.CounterField(blank=True, null=True),
+        ),
+    ]
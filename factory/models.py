@@ -1,11 +1,14 @@
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Q, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 import uuid
 import math
 
+from .fields import CounterField
+
 
 User = get_user_model()
 
@@ -71,6 +74,18 @@ class Factory(models.Model):
     # Capacity settings
     max_concurrent_orders = models.PositiveIntegerField(default=50)
     daily_order_limit = models.PositiveIntegerField(default=100)
+    # Empty means no limit
+    daily_flashing_limit = models.PositiveIntegerField(blank=True, null=True)
+    daily_weight_limit_kg = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True
+    )
+
+    # Bumped on every change of the factory or its catalog, see catalog_cache
+    catalog_version = CounterField(default=0)
+
+    # Last priority handed to one of the factory's delivery methods, see
+    # DeliveryMethod.allocate_priorities
+    delivery_priority_seq = CounterField(blank=True, null=True)
 
     # weekly off days: 0=Monday ... 6=Sunday
     weekly_off_days = models.JSONField(default=list, blank=True, null=True)
@@ -299,28 +314,49 @@ class DeliveryMethod(models.Model):
         else:
             raise ValueError(f"Unknown delivery method type: {self.method_type}")
 
+    @classmethod
+    def allocate_priorities(cls, factory_id, count=1):
+        """
+        Reserves `count` unused priorities of the factory and returns the
+        first one. The sequence is bumped in a single UPDATE, concurrent
+        callers always get disjoint ranges.
+        """
+        last_priority = (
+            cls.objects.filter(factory_id=OuterRef("pk"))
+            .values("factory")
+            .annotate(largest=models.Max("priority"))
+            .values("largest")
+        )
+
+        with transaction.atomic():
+            factories = Factory.objects.filter(pk=factory_id)
+            # The first allocation starts above the existing methods
+            factories.update(
+                delivery_priority_seq=Coalesce(
+                    F("delivery_priority_seq"), Subquery(last_priority), 0
+                )
+                + count
+            )
+            last = factories.values_list("delivery_priority_seq", flat=True).get()
+
+        return last - count + 1
+
     def save(self, *args, **kwargs):
         if hasattr(self, "METHOD_TYPE"):
             self.method_type = self.METHOD_TYPE
 
         # This means that the model isn't saved to the database yet
         if self._state.adding:
-            # Get the maximum display_id value from the database
-            last_priority = self.__class__.objects.all().aggregate(
-                largest=models.Max("priority")
-            )["largest"]
-
-            # aggregate can return None! Check it first.
-            # If it isn't none, just use the last ID specified (which should be the greatest) and add one to it
-            if last_priority is not None:
-                self.priority = last_priority + 1
+            self.priority = self.allocate_priorities(self.factory_id)
 
         super().save(*args, **kwargs)
 
     class Meta:
         ordering = ["name", "priority"]
         constraints = [
-            models.UniqueConstraint(fields=["priority"], name="unique_priorities")
+            models.UniqueConstraint(
+                fields=["factory", "priority"], name="unique_factory_priorities"
+            )
         ]
 
     def __str__(self):
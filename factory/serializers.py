@@ -1,5 +1,9 @@
 from rest_framework import serializers
+from django.db import models, transaction
+from django.db.models import ProtectedError
 from .models import Factory, Staff, Material, MaterialVariant, MaterialGroup, DeliveryMethod
+from .catalog import build_catalog, catalog_groups, sync_material_groups
+from .catalog_cache import batched_bumps
 
 
 class StaffSerializer(serializers.ModelSerializer):
@@ -39,6 +43,7 @@ class DeliveryMethodSerializer(serializers.ModelSerializer):
 
 class FactorySerializer(serializers.ModelSerializer):
     staff = StaffSerializer(many=True, read_only=True)
+    address = serializers.CharField(source="full_address", read_only=True)
 
     class Meta:
         model = Factory
@@ -80,6 +85,23 @@ class MaterialGroupSerializer(serializers.ModelSerializer):
             'label_values',
         ]
 
+class CatalogListSerializer(serializers.ListSerializer):
+    """
+    Builds the groups and variants of every material of the list in one
+    query before serializing them, shared with the children through the
+    context.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+
+        materials = list(iterable)
+        catalog = self.context.setdefault("material_catalog", {})
+        catalog.update(build_catalog(m.id for m in materials if m.id not in catalog))
+
+        return super().to_representation(materials)
+
+
 class MaterialSerializer(serializers.ModelSerializer):
     variants = serializers.ListField(write_only=True)  # accept nested groups/variants for create
     groups_detail = serializers.SerializerMethodField(read_only=True)  # for reading nested groups
@@ -87,18 +109,22 @@ class MaterialSerializer(serializers.ModelSerializer):
     class Meta:
         model = Material
         fields = ['id', 'name', 'variant_type', 'variants', 'groups_detail']
+        list_serializer_class = CatalogListSerializer
 
     def get_groups_detail(self, obj):
-        groups = obj.groups.all()
+        groups = catalog_groups(self.context, obj)
         return [
             {
-                "name": g.name or "Default Group",
-                "base_price": str(g.base_price),
-                "price_per_fold": str(g.price_per_fold),
-                "price_per_100girth": str(g.price_per_100girth),
-                "price_per_crush_fold": str(g.price_per_crush_fold),
-                "sample_weight": str(g.sample_weight),
-                "label_values": [{"label": v.label, "value": v.value} for v in g.variants.all()]
+                "name": g["name"] or "Default Group",
+                "base_price": str(g["base_price"]),
+                "price_per_fold": str(g["price_per_fold"]),
+                "price_per_100girth": str(g["price_per_100girth"]),
+                "price_per_crush_fold": str(g["price_per_crush_fold"]),
+                "sample_weight": str(g["sample_weight"]),
+                "sample_weight_sq_meter": str(g["sample_weight_sq_meter"]),
+                "label_values": [
+                    {"label": v["label"], "value": v["value"]} for v in g["variants"]
+                ],
             }
             for g in groups
         ]
@@ -106,53 +132,32 @@ class MaterialSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         variants_data = validated_data.pop('variants', [])
         factory = self.context.get('factory')
-        material = Material.objects.create(factory=factory, **validated_data)
-
-        for group_data in variants_data:
-            group = MaterialGroup.objects.create(
-                material=material,
-                name=group_data.get('name', 'Default Group'),
-                base_price=group_data.get('base_price', 0),
-                price_per_fold=group_data.get('price_per_fold', 0),
-                price_per_100girth=group_data.get('price_per_100girth', 0),
-                price_per_crush_fold=group_data.get('price_per_crush_fold', 0),
-                sample_weight=group_data.get('sample_weight', 0),
-            )
-            for variant in group_data.get('label_values', []):
-                MaterialVariant.objects.create(
-                    group=group,
-                    label=variant.get('label', ''),
-                    value=variant.get('value', '')
-                )
+        factory_id = validated_data.get('factory_id') or getattr(factory, 'pk', None)
+
+        # One catalog bump after commit instead of one per group and variant
+        with transaction.atomic(), batched_bumps(factory_id):
+            material = Material.objects.create(factory=factory, **validated_data)
+            self._sync_groups(material, variants_data)
 
         return material
 
     def update(self, instance, validated_data):
         variants_data = validated_data.pop('variants', None)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
-        if variants_data:
-            # Delete old groups and variants (or handle smart updating)
-            instance.groups.all().delete()
-
-            for group_data in variants_data:
-                group = MaterialGroup.objects.create(
-                    material=instance,
-                    name=group_data.get('name', 'Default Group'),
-                    base_price=group_data.get('base_price', 0),
-                    price_per_fold=group_data.get('price_per_fold', 0),
-                    price_per_100girth=group_data.get('price_per_100girth', 0),
-                    price_per_crush_fold=group_data.get('price_per_crush_fold', 0),
-                    sample_weight=group_data.get('sample_weight', 0),
-                )
-                for variant in group_data.get('label_values', []):
-                    MaterialVariant.objects.create(
-                        group=group,
-                        label=variant.get('label', ''),
-                        value=variant.get('value', '')
-                    )
+        with transaction.atomic(), batched_bumps(instance.factory_id):
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            if variants_data:
+                self._sync_groups(instance, variants_data)
 
         return instance
+
+    def _sync_groups(self, material, variants_data):
+        try:
+            sync_material_groups(material, variants_data)
+        except ProtectedError:
+            raise serializers.ValidationError(
+                {"variants": "Variants used by stored flashings can't be removed."}
+            )
@@ -0,0 +1,49 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Factory, Staff, Material, MaterialGroup, MaterialVariant, DeliveryMethod
+from .catalog_cache import bump_catalog_version, bumps_batched
+from . import delivery
+
+
+@receiver([post_save, post_delete], sender=DeliveryMethod)
+def invalidate_delivery_method_index(sender, instance, **kwargs):
+    # After commit, so a rebuild in between can't pick up the old rows again
+    factory_id = instance.factory_id
+    transaction.on_commit(lambda: delivery.invalidate(factory_id))
+
+
+def _catalog_factory_id(instance):
+    if isinstance(instance, Factory):
+        return instance.pk
+    if isinstance(instance, MaterialGroup):
+        return (
+            Material.objects.filter(pk=instance.material_id)
+            .values_list("factory_id", flat=True)
+            .first()
+        )
+    if isinstance(instance, MaterialVariant):
+        return (
+            MaterialGroup.objects.filter(pk=instance.group_id)
+            .values_list("material__factory_id", flat=True)
+            .first()
+        )
+    return instance.factory_id
+
+
+@receiver([post_save, post_delete], sender=Factory)
+@receiver([post_save, post_delete], sender=Staff)
+@receiver([post_save, post_delete], sender=Material)
+@receiver([post_save, post_delete], sender=MaterialGroup)
+@receiver([post_save, post_delete], sender=MaterialVariant)
+@receiver([post_save, post_delete], sender=DeliveryMethod)
+def bump_factory_catalog(sender, instance, **kwargs):
+    if bumps_batched():
+        return
+
+    # Rows deleted along with their material (cascade) may not resolve any
+    # more, the material's own signal covers them
+    factory_id = _catalog_factory_id(instance)
+    if factory_id is not None:
+        transaction.on_commit(lambda: bump_catalog_version(factory_id))
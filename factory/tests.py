@@ -1,3 +1,317 @@
+import datetime
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from . import delivery
+from .calendar import WorkingCalendar, get_calendar
+from .catalog import build_catalog, sync_material_groups
+from .models import Factory, DeliveryMethod, Material, MaterialGroup, MaterialVariant
+from .serializers import MaterialSerializer
+
+
+def make_factory(**kwargs):
+    return Factory.objects.create(
+        name=kwargs.pop("name", "Factory"),
+        email="factory@example.com",
+        phone="0400000000",
+        description="",
+        street_address="1 Main St",
+        suburb="Sydney",
+        state="NSW",
+        postcode=2000,
+        working_hours_start="08:00",
+        working_hours_end="17:00",
+        **kwargs,
+    )
+
+
+def make_delivery_method(factory, **kwargs):
+    return DeliveryMethod.objects.create(
+        factory=factory,
+        method_type="factory",
+        name=kwargs.pop("name", "Ute"),
+        max_weight_kg=kwargs.pop("max_weight_kg", Decimal("500")),
+        max_distance_km=kwargs.pop("max_distance_km", 200),
+        **kwargs,
+    )
+
+
+class DeliveryPriorityTests(TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+
+    def test_new_methods_get_increasing_priorities(self):
+        priorities = [make_delivery_method(self.factory).priority for _ in range(3)]
+        self.assertEqual(priorities, [1, 2, 3])
+
+    def test_allocation_starts_above_existing_methods(self):
+        method = make_delivery_method(self.factory)
+        DeliveryMethod.objects.filter(pk=method.pk).update(priority=7)
+        Factory.objects.filter(pk=self.factory.pk).update(delivery_priority_seq=None)
+
+        self.assertEqual(make_delivery_method(self.factory).priority, 8)
+
+    def test_ranges_are_disjoint(self):
+        first = DeliveryMethod.allocate_priorities(self.factory.pk, count=5)
+        second = DeliveryMethod.allocate_priorities(self.factory.pk, count=5)
+        self.assertEqual(second, first + 5)
+
+    def test_stale_factory_save_keeps_the_sequence(self):
+        make_delivery_method(self.factory)
+        stale = Factory.objects.get(pk=self.factory.pk)
+        make_delivery_method(self.factory)
+
+        stale.name = "Renamed"
+        stale.save()
+
+        self.assertEqual(make_delivery_method(self.factory).priority, 3)
+        self.factory.refresh_from_db()
+        self.assertEqual(self.factory.name, "Renamed")
+
+    def test_saving_a_deleted_factory_inserts_it_again(self):
+        make_delivery_method(self.factory)
+        stale = Factory.objects.get(pk=self.factory.pk)
+        Factory.objects.filter(pk=self.factory.pk).delete()
+
+        stale.save()
+        self.assertEqual(Factory.objects.get(pk=self.factory.pk).delivery_priority_seq, 1)
+
+
+class DeliveryMethodIndexTests(TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+        # In priority order
+        self.near = make_delivery_method(self.factory, name="Near", max_distance_km=50)
+        self.far = make_delivery_method(self.factory, name="Far", max_weight_kg=Decimal("1000"))
+        self.truck = make_delivery_method(self.factory, name="Truck", max_weight_kg=Decimal("5000"))
+
+    def best(self, distance_km, weight_kg=0):
+        return delivery.best_delivery_method(self.factory.pk, distance_km, weight_kg)
+
+    def test_picks_by_distance_weight_and_priority(self):
+        self.assertEqual(self.best(30, 100), self.near)
+        # max_distance_km is exclusive
+        self.assertEqual(self.best(50, 100), self.far)
+        self.assertEqual(self.best(30, 800), self.far)
+        self.assertEqual(self.best(100, 2000), self.truck)
+        self.assertIsNone(self.best(300, 100))
+        self.assertIsNone(self.best(100, 9000))
+        self.assertIsNone(self.best(0))
+
+    def test_index_is_reused(self):
+        self.best(30)
+        with self.assertNumQueries(0):
+            self.best(30)
+
+    def test_changes_rebuild_the_index(self):
+        self.assertEqual(self.best(30), self.near)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.near.is_active = False
+            self.near.save()
+        self.assertEqual(self.best(30), self.far)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.far.delete()
+        self.assertEqual(self.best(30), self.truck)
+
+    def test_reordering_rebuilds_the_index(self):
+        self.assertEqual(self.best(100), self.far)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            delivery.reorder_methods(self.factory.pk, [self.truck.pk, self.far.pk, self.near.pk])
+        self.assertEqual(self.best(100), self.truck)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = make_factory()
+        self.url = f"/api/factory/{self.factory.pk}/"
+
+    def get(self, **headers):
+        return self.client.get(self.url, HTTP_ACCEPT="application/json", **headers)
+
+    def test_matching_etag_gets_not_modified(self):
+        etag = self.get()["ETag"]
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_change_invalidates_etag(self):
+        etag = self.get()["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.factory.phone = "0411111111"
+            self.factory.save()
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_serializes_the_address(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["address"], self.factory.full_address)
+
+    def test_malformed_id_is_not_found(self):
+        response = self.client.get("/api/factory/not-a-uuid/", HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_stale_factory_save_doesnt_reissue_a_version(self):
+        stale = Factory.objects.get(pk=self.factory.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_delivery_method(self.factory)
+        with self.captureOnCommitCallbacks(execute=True):
+            stale.name = "Renamed"
+            stale.save()
+
+        self.factory.refresh_from_db()
+        self.assertEqual(self.factory.catalog_version, 2)
+
+
+class SyncMaterialGroupsTests(TestCase):
+    def setUp(self):
+        self.material = Material.objects.create(name="Steel", factory=make_factory())
+
+    def group_data(self, **values):
+        return {
+            "name": "Base Group",
+            "base_price": "10.00",
+            "price_per_fold": "1.50",
+            "price_per_100girth": "2.25",
+            "price_per_crush_fold": "0.75",
+            "sample_weight": "7.85",
+            "label_values": [{"label": "0.55", "value": "0.55"}],
+            **values,
+        }
+
+    def test_writes_sample_weight_sq_meter(self):
+        sync_material_groups(self.material, [self.group_data(sample_weight_sq_meter="0.50")])
+        group = MaterialGroup.objects.get(material=self.material)
+        self.assertEqual(group.sample_weight_sq_meter, Decimal("0.50"))
+
+        sync_material_groups(self.material, [self.group_data(sample_weight_sq_meter="0.75")])
+        group.refresh_from_db()
+        self.assertEqual(group.sample_weight_sq_meter, Decimal("0.75"))
+
+    def test_missing_sample_weight_sq_meter_uses_the_default(self):
+        sync_material_groups(self.material, [self.group_data()])
+        group = MaterialGroup.objects.get(material=self.material)
+        self.assertEqual(group.sample_weight_sq_meter, Decimal("1.00"))
+
+    def test_unchanged_variants_keep_their_rows(self):
+        sync_material_groups(self.material, [self.group_data()])
+        variant = self.material.variants.get()
+
+        sync_material_groups(self.material, [self.group_data(base_price="12.00")])
+        self.assertEqual(self.material.variants.get().pk, variant.pk)
+
+
+class WorkingCalendarTests(TestCase):
+    # Monday, the Tuesday after is a specific off day
+    monday = datetime.date(2030, 1, 7)
+
+    def setUp(self):
+        self.factory = make_factory(weekly_off_days=[5, 6], specific_off_days=["2030-01-08"])
+        self.calendar = WorkingCalendar(self.factory, start=self.monday, horizon_days=10)
+
+    def at(self, day, hour):
+        return datetime.datetime.combine(
+            day, datetime.time(hour), tzinfo=ZoneInfo("Australia/Sydney")
+        )
+
+    def test_off_days(self):
+        self.assertTrue(self.calendar.is_working_day(self.monday))
+        self.assertFalse(self.calendar.is_working_day(datetime.date(2030, 1, 8)))
+        self.assertFalse(self.calendar.is_working_day(datetime.date(2030, 1, 12)))
+        self.assertEqual(
+            self.calendar.next_working_day(datetime.date(2030, 1, 8)), datetime.date(2030, 1, 9)
+        )
+
+    def test_add_working_days_skips_off_days(self):
+        self.assertEqual(self.calendar.add_working_days(self.monday, 1), datetime.date(2030, 1, 9))
+        # Friday to Monday
+        self.assertEqual(
+            self.calendar.add_working_days(datetime.date(2030, 1, 11), 1),
+            datetime.date(2030, 1, 14),
+        )
+
+    def test_lookups_past_the_horizon_extend_it(self):
+        # From a Sunday, 100 working days are 20 weeks of 5 ending on a Friday
+        self.assertEqual(
+            self.calendar.add_working_days(datetime.date(2030, 1, 13), 100),
+            datetime.date(2030, 5, 31),
+        )
+        self.assertEqual(
+            self.calendar.next_working_day(datetime.date(2029, 12, 29)),
+            datetime.date(2029, 12, 31),
+        )
+
+    def test_earliest_delivery_date(self):
+        # Open now, two production days (the 8th is off) then the delivery days
+        morning = self.at(self.monday, 10)
+        self.assertEqual(self.calendar.earliest_delivery_date(0, now=morning), datetime.date(2030, 1, 10))
+        self.assertEqual(self.calendar.earliest_delivery_date(1, now=morning), datetime.date(2030, 1, 11))
+
+        # After hours the order is produced from the next working day
+        evening = self.at(self.monday, 18)
+        self.assertEqual(self.calendar.earliest_delivery_date(0, now=evening), datetime.date(2030, 1, 11))
+
+    def test_get_calendar_rebuilds_when_off_days_change(self):
+        calendar = get_calendar(self.factory)
+        self.assertIs(get_calendar(self.factory), calendar)
+
+        self.factory.specific_off_days = ["2030-01-08", "2030-01-09"]
+        rebuilt = get_calendar(self.factory)
+        self.assertIsNot(rebuilt, calendar)
+        self.assertFalse(rebuilt.is_working_day(datetime.date(2030, 1, 9)))
+
+        self.factory.weekly_off_days = [0, 5, 6]
+        self.assertFalse(get_calendar(self.factory).is_working_day(datetime.date(2030, 1, 14)))
+
+
+class MaterialCatalogTests(TestCase):
+    def setUp(self):
+        self.factory = make_factory()
+
+    def make_material(self, name, groups=1, variants=2):
+        material = Material.objects.create(name=name, factory=self.factory, variant_type="thickness")
+        for g in range(groups):
+            group = MaterialGroup.objects.create(
+                material=material,
+                name=f"Group {g}",
+                base_price=Decimal("10.00"),
+                price_per_fold=Decimal("1.50"),
+                price_per_100girth=Decimal("2.25"),
+                price_per_crush_fold=Decimal("0.75"),
+                sample_weight=Decimal("7.85"),
+            )
+            for v in range(variants):
+                MaterialVariant.objects.create(group=group, label=f"0.{v}", value=f"0.{v}")
+        return material
+
+    def test_nests_groups_and_variants(self):
+        material = self.make_material("Steel", groups=2)
+        bare = self.make_material("Copper", groups=1, variants=0)
+        empty = self.make_material("Zinc", groups=0)
+
+        catalog = build_catalog([material.id, bare.id, empty.id])
+        self.assertEqual([g["name"] for g in catalog[material.id]], ["Group 0", "Group 1"])
+        self.assertEqual([v["label"] for v in catalog[material.id][1]["variants"]], ["0.0", "0.1"])
+        self.assertEqual(catalog[bare.id][0]["variants"], [])
+        self.assertEqual(catalog[empty.id], [])
+
+    def test_list_query_count_doesnt_grow_with_the_materials(self):
+        for total in (1, 4):
+            while self.factory.materials.count() < total:
+                self.make_material(f"Material {self.factory.materials.count()}", groups=2)
+
+            with self.assertNumQueries(2):
+                data = MaterialSerializer(self.factory.materials.all(), many=True).data
+            self.assertEqual(len(data), total)
+            self.assertEqual(len(data[0]["groups_detail"]), 2)
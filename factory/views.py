@@ -1,5 +1,8 @@
 from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
 from django.contrib.auth import authenticate, login, logout
+from django.core.exceptions import ValidationError
+from django.http import Http404
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
@@ -7,14 +10,38 @@ from rest_framework import status
 from .models import Factory, Staff, Material, DeliveryMethod
 from .serializers import FactorySerializer, MaterialSerializer, StaffSerializer, DeliveryMethodSerializer
 from .permissions import DjangoModelPermissionsForAll
+from .delivery import reorder_methods
+from .catalog_cache import cached_catalog_response, catalog_version, catalog_versions
 
 
 class FactoryViewSet(viewsets.ModelViewSet):
-    queryset = Factory.objects.all()
+    queryset = Factory.objects.prefetch_related("staff__user")
     serializer_class = FactorySerializer
     # permission_classes = [DjangoModelPermissionsForAll]
     permission_classes = [permissions.AllowAny]
 
+    def list(self, request, *args, **kwargs):
+        return cached_catalog_response(
+            request,
+            "factories",
+            catalog_versions(),
+            lambda: super(FactoryViewSet, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        factory_id = kwargs["pk"]
+        try:
+            version = catalog_version(factory_id)
+        except ValidationError:
+            # Not a UUID, like get_object() would
+            raise Http404
+        return cached_catalog_response(
+            request,
+            f"factory:{factory_id}",
+            version,
+            lambda: super(FactoryViewSet, self).retrieve(request, *args, **kwargs),
+        )
+
 
 class StaffViewSet(viewsets.ModelViewSet):
     queryset = Staff.objects.all()
@@ -61,3 +88,28 @@ class DeliveryMethodView(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(factory_id=self.kwargs["factory_pk"])
+
+    @action(detail=False, methods=["post"], url_path="reorder")
+    def reorder(self, request, factory_pk=None):
+        method_ids = request.data.get("ids")
+        if not isinstance(method_ids, list) or not all(
+            isinstance(pk, int) for pk in method_ids
+        ):
+            return Response(
+                {"error": "ids must be a list of delivery method ids"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        existing = set(self.get_queryset().values_list("id", flat=True))
+        if len(method_ids) != len(existing) or set(method_ids) != existing:
+            return Response(
+                {"error": "ids must list every delivery method of the factory once"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        reorder_methods(factory_pk, method_ids)
+
+        serializer = self.get_serializer(
+            self.get_queryset().order_by("priority"), many=True
+        )
+        return Response(serializer.data)
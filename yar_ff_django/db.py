@@ -0,0 +1,91 @@
+"""
+SQLite setup for production use.
+
+Every new SQLite connection gets the PRAGMAs below (WAL so readers don't
+wait for writers, relaxed fsync, memory mapped reads, a bigger page cache
+and a busy timeout), and connections are kept between requests. All of it
+can be tuned from the environment.
+
+Read replicas are listed in SQLITE_REPLICAS, comma separated paths of
+SQLite files kept as copies of the primary by the sync_sqlite_replicas
+command. They stand in for the replicas of a database server, see
+routers.py for which reads go to them.
+"""
+
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+# Bytes of the file read through mmap
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+# Negative: KiB rather than pages
+CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -64 * 1024))
+# Milliseconds a connection waits for a lock before failing
+BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))
+
+
+def database_config(base_dir):
+    """The default database, from the environment."""
+    return {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("SQLITE_PATH", str(base_dir / "db.sqlite3")),
+        "CONN_MAX_AGE": int(os.getenv("CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": _env_bool("CONN_HEALTH_CHECKS", True),
+        "OPTIONS": {
+            "timeout": BUSY_TIMEOUT / 1000,
+            # Take the write lock when a transaction starts, a deferred one
+            # failing to upgrade its lock gets no busy timeout at all
+            "transaction_mode": os.getenv("SQLITE_TRANSACTION_MODE", "IMMEDIATE"),
+        },
+    }
+
+
+def replica_configs(base_dir):
+    """Read replica databases by alias (replica1, replica2, ...)."""
+    paths = [path.strip() for path in os.getenv("SQLITE_REPLICAS", "").split(",")]
+
+    replicas = {}
+    for i, path in enumerate(filter(None, paths), start=1):
+        replicas[f"replica{i}"] = {
+            **database_config(base_dir),
+            "NAME": str(base_dir / path),
+            # Tests read the test primary through the replica aliases
+            "TEST": {"MIRROR": "default"},
+        }
+    return replicas
+
+
+def sync_stamp_path(name):
+    """File whose mtime is when the SQLite replica `name` was last synced."""
+    return Path(f"{name}.synced")
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={CACHE_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+
+        # Replicas are only written by the sync command's own connections
+        if connection.alias in getattr(settings, "DATABASE_REPLICAS", ()):
+            cursor.execute("PRAGMA query_only=ON")
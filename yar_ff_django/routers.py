@@ -0,0 +1,175 @@
+"""
+Primary/replica database routing.
+
+Writes, and every read by default, go to the primary. Views using
+ReplicaReadMixin read from a replica on GET, unless:
+
+- the user wrote anything in the last DB_PRIMARY_STICKY_SECONDS, so they
+  always see their own changes,
+- the request already wrote, or is inside a transaction,
+- no replica is fresh enough (DB_REPLICA_MAX_LAG) or up.
+
+A GET that fails on a replica is run again on the primary and the replica
+is left out for DB_REPLICA_RETRY_AFTER seconds.
+
+The sticky windows and down replicas are kept in the cache, like the
+catalog versions: with the default per-process LocMemCache other workers
+don't see them, use a shared cache (Redis, Memcached) with several workers.
+"""
+
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .db import sync_stamp_path
+
+logger = logging.getLogger(__name__)
+
+REPLICAS = tuple(getattr(settings, "DATABASE_REPLICAS", ()))
+STICKY_SECONDS = getattr(settings, "DB_PRIMARY_STICKY_SECONDS", 10)
+MAX_LAG = getattr(settings, "DB_REPLICA_MAX_LAG", 30)
+RETRY_AFTER = getattr(settings, "DB_REPLICA_RETRY_AFTER", 30)
+
+# Replica the current request reads from, None for the primary
+_read_alias = ContextVar("read_alias", default=None)
+# Whether the current request wrote to the primary
+_wrote = ContextVar("wrote", default=False)
+
+
+def _sticky_key(user_id):
+    return f"db-primary:{user_id}"
+
+
+def _down_key(alias):
+    return f"db-replica-down:{alias}"
+
+
+def replica_lag(alias):
+    """
+    Seconds since the replica was last synced. Only known for SQLite
+    replicas, None for others (their lag is left to the database server).
+    """
+    settings_dict = connections.settings[alias]
+    if not settings_dict["ENGINE"].endswith("sqlite3"):
+        return None
+
+    stamp = sync_stamp_path(settings_dict["NAME"])
+    try:
+        return time.time() - stamp.stat().st_mtime
+    except FileNotFoundError:
+        # Never synced
+        return float("inf")
+
+
+def pick_replica():
+    """A replica that's up and fresh enough, None when there's none."""
+    down = cache.get_many([_down_key(alias) for alias in REPLICAS])
+
+    available = []
+    for alias in REPLICAS:
+        if _down_key(alias) in down:
+            continue
+        lag = replica_lag(alias)
+        if lag is not None and lag > MAX_LAG:
+            continue
+        available.append(alias)
+
+    return random.choice(available) if available else None
+
+
+def is_pinned_to_primary(user):
+    return user.is_authenticated and cache.get(_sticky_key(user.pk)) is not None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or _wrote.get():
+            return DEFAULT_DB_ALIAS
+        # Reads in a transaction see what it wrote
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema with the data
+        if db in REPLICAS:
+            return False
+        return None
+
+
+class StickyPrimaryMiddleware:
+    """Keeps the reads of a user who just wrote on the primary for a while."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+
+            # DRF views authenticate the user on the request they wrap
+            user = getattr(request, "user", None)
+            if _wrote.get() and user is not None and user.is_authenticated:
+                cache.set(_sticky_key(user.pk), 1, STICKY_SECONDS)
+            return response
+        finally:
+            _wrote.reset(token)
+
+
+class ReplicaReadMixin:
+    """
+    Reads GET requests of the view from a replica. `replica_actions` limits
+    it to these actions of a viewset.
+    """
+
+    replica_actions = None
+
+    def reads_from_replica(self, request):
+        if not REPLICAS or request.method not in SAFE_METHODS:
+            return False
+        if self.replica_actions is not None:
+            if getattr(self, "action", None) not in self.replica_actions:
+                return False
+        return not is_pinned_to_primary(request.user)
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication and permissions read from the primary
+        super().initial(request, *args, **kwargs)
+        if self.reads_from_replica(request):
+            _read_alias.set(pick_replica())
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except DatabaseError:
+            alias = _read_alias.get()
+            if alias is None:
+                raise
+
+            logger.warning("Read from replica %s failed, retrying on the primary", alias, exc_info=True)
+            cache.set(_down_key(alias), 1, RETRY_AFTER)
+            _read_alias.set(None)
+            # Stays on the primary even when the cache lost the mark
+            self.reads_from_replica = lambda request: False
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
@@ -15,6 +15,8 @@ from datetime import timedelta
 from dotenv import load_dotenv
 import os
 
+from .db import database_config, replica_configs
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
@@ -53,6 +55,24 @@ ACCOUNT_EMAIL_VERIFICATION_BY_CODE_TIMEOUT = 5
 
 
 ORS_API_KEY = os.getenv('ORS_API_KEY')
+# How long geocoded addresses and route distances are reused before asking ORS again
+GEOCODE_CACHE_TTL_DAYS = int(os.getenv('GEOCODE_CACHE_TTL_DAYS', 90))
+ROUTE_CACHE_TTL_DAYS = int(os.getenv('ROUTE_CACHE_TTL_DAYS', 30))
+
+# Background jobs (django-q2) use the database as a durable broker,
+# run a local worker with `python manage.py qcluster`
+Q_CLUSTER = {
+    'name': 'yar_ff',
+    'orm': 'default',
+    'workers': int(os.getenv('Q_WORKERS', 2)),
+    'timeout': 60,
+    # Re-deliver a task if its worker died before acknowledging it
+    'retry': 120,
+    # Retries with backoff are handled by the tasks themselves
+    'max_attempts': 1,
+}
+ADDRESS_DISTANCE_MAX_ATTEMPTS = int(os.getenv('ADDRESS_DISTANCE_MAX_ATTEMPTS', 5))
+ADDRESS_DISTANCE_RETRY_DELAY = int(os.getenv('ADDRESS_DISTANCE_RETRY_DELAY', 30))
 STRIPE_KEY = os.getenv('STRIPE_KEY')
 
 # Application definition
@@ -71,6 +91,7 @@ INSTALLED_APPS = [
     'auth_kit',
     'auth_kit.mfa',
     'drf_spectacular',
+    'django_q',
     'factory.apps.FactoryConfig',
     'dashboard.apps.DashboardConfig',
     'base.apps.BaseConfig',
@@ -94,6 +115,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yar_ff_django.routers.StickyPrimaryMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -151,12 +173,19 @@ WSGI_APPLICATION = 'yar_ff_django.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuned for concurrent traffic, see db.py for the environment variables
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
+    **replica_configs(BASE_DIR),
 }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['yar_ff_django.routers.PrimaryReplicaRouter']
+# After a write, the user's reads stay on the primary for this many seconds
+DB_PRIMARY_STICKY_SECONDS = int(os.getenv('DB_PRIMARY_STICKY_SECONDS', 10))
+# Replicas synced longer ago than this are skipped
+DB_REPLICA_MAX_LAG = int(os.getenv('DB_REPLICA_MAX_LAG', 30))
+# A replica that failed a query is skipped for this many seconds
+DB_REPLICA_RETRY_AFTER = int(os.getenv('DB_REPLICA_RETRY_AFTER', 30))
 
 
 # Password validation